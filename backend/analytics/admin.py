@@ -0,0 +1,27 @@
+from django.contrib import admin
+from .models import CategorySales, DailySales, OrderStatusCount, ProductSales
+
+
+@admin.register(DailySales)
+class DailySalesAdmin(admin.ModelAdmin):
+    list_display = ["date", "orders", "paid_orders", "revenue"]
+    date_hierarchy = "date"
+
+
+@admin.register(ProductSales)
+class ProductSalesAdmin(admin.ModelAdmin):
+    list_display = ["product", "units", "revenue"]
+    list_select_related = ["product"]
+    ordering = ["-revenue"]
+
+
+@admin.register(CategorySales)
+class CategorySalesAdmin(admin.ModelAdmin):
+    list_display = ["category", "units", "revenue"]
+    list_select_related = ["category"]
+    ordering = ["-revenue"]
+
+
+@admin.register(OrderStatusCount)
+class OrderStatusCountAdmin(admin.ModelAdmin):
+    list_display = ["status", "count"]
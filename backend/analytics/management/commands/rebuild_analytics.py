@@ -0,0 +1,13 @@
+from django.core.management.base import BaseCommand
+
+from analytics.rollups import rebuild
+
+
+class Command(BaseCommand):
+    help = "Recompute the sales rollups from all orders"
+
+    def handle(self, *args, **kwargs):
+        written = rebuild()
+        for model, count in written.items():
+            self.stdout.write(f"{model._meta.verbose_name_plural}: {count} rows")
+        self.stdout.write(self.style.SUCCESS("Rebuilt analytics"))
@@ -0,0 +1,68 @@
+# analytics/models.py
+"""
+Sales rollups, kept up to date as orders change (see ``rollups.py``).
+
+Revenue and units count sales: orders that are paid and not cancelled.
+"""
+
+from django.db import models
+from products.models import Category, Product
+
+
+class DailySales(models.Model):
+    date = models.DateField(unique=True)
+    # Orders placed that day, whatever became of them
+    orders = models.IntegerField(default=0)
+    # Orders paid that day, and what they came to
+    paid_orders = models.IntegerField(default=0)
+    revenue = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+
+    class Meta:
+        verbose_name_plural = "Daily sales"
+        ordering = ["date"]
+
+    def __str__(self):
+        return f"{self.date}: {self.revenue}"
+
+
+class ProductSales(models.Model):
+    product = models.OneToOneField(
+        Product, on_delete=models.CASCADE, related_name="sales"
+    )
+    units = models.IntegerField(default=0)
+    revenue = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+
+    class Meta:
+        verbose_name_plural = "Product sales"
+        indexes = [
+            # Top products, by either measure
+            models.Index(fields=["-units", "product"], name="product_sales_units_idx"),
+            models.Index(
+                fields=["-revenue", "product"], name="product_sales_revenue_idx"
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.product}: {self.units} units"
+
+
+class CategorySales(models.Model):
+    category = models.OneToOneField(
+        Category, on_delete=models.CASCADE, related_name="sales"
+    )
+    units = models.IntegerField(default=0)
+    revenue = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+
+    class Meta:
+        verbose_name_plural = "Category sales"
+
+    def __str__(self):
+        return f"{self.category}: {self.units} units"
+
+
+class OrderStatusCount(models.Model):
+    status = models.CharField(max_length=20, unique=True)
+    count = models.IntegerField(default=0)
+
+    def __str__(self):
+        return f"{self.status}: {self.count}"
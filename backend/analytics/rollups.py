@@ -0,0 +1,198 @@
+"""
+Incrementally maintained sales rollups.
+
+Every order counts towards the rollups according to its state: once
+towards the count of its status, once towards the orders placed on the day
+it was created and, while it is a sale (paid and not cancelled), its total
+towards the revenue of the day it was paid and its items towards their
+product's and category's units and revenue.
+
+Code that creates an order or changes its status or payment calls
+``record_order`` in the same transaction, with the state the order had
+before, and the rollups move by the difference. Each rollup table takes
+two statements whatever the size of the order: an ``INSERT`` of any
+missing rows, ignoring conflicts, then one ``UPDATE ... SET n = n + CASE``.
+
+Changes made any other way (queryset updates in a shell, moving products
+between categories) leave the rollups behind until
+``manage.py rebuild_analytics`` recomputes them from the orders.
+"""
+
+from collections import Counter, defaultdict, namedtuple
+
+from django.db import transaction
+from django.db.models import Case, Count, DecimalField, F, Sum, Value, When
+from django.db.models.functions import Coalesce, TruncDate
+from django.utils import timezone
+
+from orders.models import Order, OrderItem
+from .models import CategorySales, DailySales, OrderStatusCount, ProductSales
+
+OrderState = namedtuple("OrderState", ["status", "paid", "paid_at"])
+
+# The column each rollup is keyed by
+KEYS = {
+    DailySales: "date",
+    ProductSales: "product_id",
+    CategorySales: "category_id",
+    OrderStatusCount: "status",
+}
+
+
+def order_state(order):
+    return OrderState(order.status, order.paid, order.paid_at)
+
+
+def is_sale(state):
+    return state is not None and state.paid and state.status != "cancelled"
+
+
+def sale_date(order, state):
+    # Orders marked paid by hand may have no payment time
+    return timezone.localdate(state.paid_at or order.created_at)
+
+
+def record_order(order, before=None):
+    """
+    Move the rollups from ``order``'s ``before`` state (an ``OrderState``,
+    or None for a new order) to its current one.
+    """
+    record_orders([(order, before)])
+
+
+def record_orders(changes):
+    """``record_order`` for many ``(order, before)`` pairs at once."""
+    deltas = defaultdict(lambda: defaultdict(Counter))
+    signs = {}
+    for order, before in changes:
+        after = order_state(order)
+        if before == after:
+            continue
+        if before is None:
+            deltas[DailySales][timezone.localdate(order.created_at)]["orders"] += 1
+        else:
+            deltas[OrderStatusCount][before.status]["count"] -= 1
+        deltas[OrderStatusCount][after.status]["count"] += 1
+
+        for sign, state in ((-1, before), (1, after)):
+            if is_sale(state):
+                daily = deltas[DailySales][sale_date(order, state)]
+                daily["paid_orders"] += sign
+                daily["revenue"] += sign * order.total_amount
+
+        if is_sale(before) != is_sale(after):
+            signs[order.pk] = 1 if is_sale(after) else -1
+
+    if signs:
+        items = OrderItem.objects.filter(
+            order__in=signs, product__isnull=False
+        ).values_list(
+            "order_id", "product_id", "product__category_id", "quantity", "price"
+        )
+        for order_id, product_id, category_id, quantity, price in items:
+            sign = signs[order_id]
+            rollups = [(ProductSales, product_id)]
+            if category_id is not None:
+                rollups.append((CategorySales, category_id))
+            for model, key in rollups:
+                deltas[model][key]["units"] += sign * quantity
+                deltas[model][key]["revenue"] += sign * quantity * price
+
+    with transaction.atomic():
+        for model, model_deltas in deltas.items():
+            apply_deltas(model, model_deltas)
+
+
+def apply_deltas(model, changes):
+    """Add ``{key: {field: delta}}`` to the rows of ``model``."""
+    key_field = KEYS[model]
+    changes = {
+        key: {field: delta for field, delta in fields.items() if delta}
+        for key, fields in changes.items()
+    }
+    changes = {key: fields for key, fields in changes.items() if fields}
+    if not changes:
+        return
+
+    model.objects.bulk_create(
+        [model(**{key_field: key}) for key in changes], ignore_conflicts=True
+    )
+    updates = {}
+    for field in {field for fields in changes.values() for field in fields}:
+        output_field = model._meta.get_field(field)
+        updates[field] = F(field) + Case(
+            *[
+                When(**{key_field: key}, then=Value(fields[field]))
+                for key, fields in changes.items()
+                if field in fields
+            ],
+            default=Value(0),
+            output_field=output_field,
+        )
+    model.objects.filter(**{f"{key_field}__in": changes}).update(**updates)
+
+
+def rebuild():
+    """
+    Recompute every rollup from the orders, in one transaction. Returns the
+    number of rows written per rollup model.
+    """
+    sales = Order.objects.filter(paid=True).exclude(status="cancelled")
+    items = OrderItem.objects.filter(order__in=sales, product__isnull=False)
+    line_total = Sum(
+        F("quantity") * F("price"),
+        output_field=DecimalField(max_digits=14, decimal_places=2),
+    )
+
+    with transaction.atomic():
+        daily = defaultdict(dict)
+        placed = (
+            Order.objects.annotate(day=TruncDate("created_at"))
+            .values("day")
+            .annotate(orders=Count("pk"))
+        )
+        for row in placed:
+            daily[row["day"]]["orders"] = row["orders"]
+        paid = (
+            sales.annotate(day=TruncDate(Coalesce("paid_at", "created_at")))
+            .values("day")
+            .annotate(paid_orders=Count("pk"), revenue=Sum("total_amount"))
+        )
+        for row in paid:
+            daily[row["day"]].update(
+                paid_orders=row["paid_orders"], revenue=row["revenue"]
+            )
+
+        rows = {
+            DailySales: [
+                DailySales(date=day, **values) for day, values in daily.items()
+            ],
+            OrderStatusCount: [
+                OrderStatusCount(**row)
+                for row in Order.objects.values("status").annotate(count=Count("pk"))
+            ],
+            ProductSales: [
+                ProductSales(
+                    product_id=row["product"],
+                    units=row["units"],
+                    revenue=row["revenue"],
+                )
+                for row in items.values("product").annotate(
+                    units=Sum("quantity"), revenue=line_total
+                )
+            ],
+            CategorySales: [
+                CategorySales(
+                    category_id=row["product__category"],
+                    units=row["units"],
+                    revenue=row["revenue"],
+                )
+                for row in items.filter(product__category__isnull=False)
+                .values("product__category")
+                .annotate(units=Sum("quantity"), revenue=line_total)
+            ],
+        }
+        for model, objs in rows.items():
+            model.objects.all().delete()
+            model.objects.bulk_create(objs)
+    return {model: len(objs) for model, objs in rows.items()}
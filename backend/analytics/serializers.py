@@ -0,0 +1,50 @@
+# analytics/serializers.py
+from rest_framework import serializers
+from .models import CategorySales, DailySales, OrderStatusCount, ProductSales
+
+
+class DailySalesSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = DailySales
+        fields = ["date", "orders", "paid_orders", "revenue"]
+
+
+class ProductSalesSerializer(serializers.ModelSerializer):
+    product_name = serializers.CharField(source="product.name", read_only=True)
+    product_slug = serializers.CharField(source="product.slug", read_only=True)
+    stock = serializers.IntegerField(source="product.stock", read_only=True)
+
+    class Meta:
+        model = ProductSales
+        fields = [
+            "product",
+            "product_name",
+            "product_slug",
+            "stock",
+            "units",
+            "revenue",
+        ]
+
+
+class CategorySalesSerializer(serializers.ModelSerializer):
+    category_name = serializers.CharField(source="category.name", read_only=True)
+    category_slug = serializers.CharField(source="category.slug", read_only=True)
+
+    class Meta:
+        model = CategorySales
+        fields = ["category", "category_name", "category_slug", "units", "revenue"]
+
+
+class OrderStatusCountSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = OrderStatusCount
+        fields = ["status", "count"]
+
+
+class DailySalesQuerySerializer(serializers.Serializer):
+    days = serializers.IntegerField(min_value=1, max_value=366, default=30)
+
+
+class TopProductsQuerySerializer(serializers.Serializer):
+    by = serializers.ChoiceField(choices=["revenue", "units"], default="revenue")
+    limit = serializers.IntegerField(min_value=1, max_value=100, default=10)
@@ -0,0 +1,253 @@
+from datetime import timedelta
+from decimal import Decimal
+from io import StringIO
+
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework.test import APITestCase
+
+from orders.models import Order, StockReservation
+from orders.reservations import release_expired
+from products.models import Category, Product
+from . import rollups
+from .models import CategorySales, DailySales, OrderStatusCount, ProductSales
+
+SHIPPING = {
+    "shipping_name": "Jane Doe",
+    "shipping_email": "jane@example.com",
+    "shipping_address": "1 Main St",
+    "shipping_city": "Springfield",
+    "shipping_state": "IL",
+    "shipping_zip": "62701",
+    "shipping_country": "US",
+}
+
+
+def snapshot():
+    return {
+        model: sorted(model.objects.values_list(key, *fields))
+        for model, key, fields in [
+            (DailySales, "date", ["orders", "paid_orders", "revenue"]),
+            (ProductSales, "product", ["units", "revenue"]),
+            (CategorySales, "category", ["units", "revenue"]),
+            (OrderStatusCount, "status", ["count"]),
+        ]
+    }
+
+
+class RollupTests(APITestCase):
+    def setUp(self):
+        self.staff = User.objects.create_user("staff", is_staff=True)
+        self.buyer = User.objects.create_user("buyer")
+        self.rings = Category.objects.create(name="Rings", slug="rings")
+        self.ring = Product.objects.create(
+            name="Ring",
+            slug="ring",
+            description="",
+            price=Decimal("25.00"),
+            category=self.rings,
+            stock=100,
+        )
+        self.charm = Product.objects.create(
+            name="Charm",
+            slug="charm",
+            description="",
+            price=Decimal("10.00"),
+            stock=100,
+        )
+
+    def place(self, *items):
+        self.client.force_authenticate(self.buyer)
+        response = self.client.post(
+            "/api/orders/",
+            {
+                "items": [
+                    {"product_id": product.id, "quantity": quantity}
+                    for product, quantity in items
+                ],
+                **SHIPPING,
+            },
+            format="json",
+        )
+        self.assertEqual(response.status_code, 201)
+        return Order.objects.get(pk=response.data["id"])
+
+    def pay(self, order):
+        # What verify_payment does once PayPal has captured the amount
+        before = rollups.order_state(order)
+        order.paid, order.paid_at, order.status = True, timezone.now(), "processing"
+        order.save()
+        rollups.record_order(order, before)
+
+    def set_status(self, order, status):
+        self.client.force_authenticate(self.staff)
+        response = self.client.post(
+            f"/api/orders/{order.pk}/update_status/", {"status": status}
+        )
+        self.assertEqual(response.status_code, 200)
+
+    def status_counts(self):
+        return dict(OrderStatusCount.objects.values_list("status", "count"))
+
+    def test_orders_are_counted_as_they_change(self):
+        first = self.place((self.ring, 2), (self.charm, 1))
+        self.place((self.ring, 1))
+        today = DailySales.objects.get(date=timezone.localdate())
+        self.assertEqual((today.orders, today.paid_orders, today.revenue), (2, 0, 0))
+        self.assertEqual(self.status_counts(), {"pending": 2})
+        self.assertFalse(ProductSales.objects.exists())
+
+        self.pay(first)
+        today.refresh_from_db()
+        self.assertEqual((today.paid_orders, today.revenue), (1, Decimal("60.00")))
+        self.assertEqual(
+            sorted(ProductSales.objects.values_list("product", "units", "revenue")),
+            [(self.ring.pk, 2, Decimal("50.00")), (self.charm.pk, 1, Decimal("10.00"))],
+        )
+        # The charm has no category
+        self.assertEqual(
+            list(CategorySales.objects.values_list("category", "units", "revenue")),
+            [(self.rings.pk, 2, Decimal("50.00"))],
+        )
+
+        self.set_status(first, "shipped")
+        self.assertEqual(
+            self.status_counts(), {"pending": 1, "processing": 0, "shipped": 1}
+        )
+        self.assertEqual(ProductSales.objects.get(product=self.ring).units, 2)
+
+    def test_cancelling_a_sale_takes_it_back(self):
+        order = self.place((self.ring, 2))
+        self.pay(order)
+        self.set_status(order, "cancelled")
+        self.assertEqual(ProductSales.objects.get().units, 0)
+        self.assertEqual(CategorySales.objects.get().revenue, 0)
+        today = DailySales.objects.get()
+        self.assertEqual((today.orders, today.paid_orders, today.revenue), (1, 0, 0))
+        self.assertEqual(self.status_counts()["cancelled"], 1)
+
+    def test_expired_orders_are_counted_cancelled(self):
+        self.place((self.ring, 1))
+        StockReservation.objects.update(
+            expires_at=timezone.now() - timedelta(minutes=1)
+        )
+        self.assertEqual(release_expired(), 1)
+        self.assertEqual(self.status_counts(), {"pending": 0, "cancelled": 1})
+
+    def test_query_count_is_independent_of_cart_size(self):
+        products = [
+            Product.objects.create(
+                name=f"Bead {i}",
+                slug=f"bead-{i}",
+                description="",
+                price=1,
+                category=self.rings,
+                stock=10,
+            )
+            for i in range(10)
+        ]
+        small = self.place((products[0], 1))
+        large = self.place(*[(product, 1) for product in products])
+        counts = []
+        for order in (small, large):
+            with CaptureQueriesContext(connection) as queries:
+                self.pay(order)
+            counts.append(len(queries))
+        self.assertEqual(counts[0], counts[1])
+        self.assertEqual(ProductSales.objects.get(product=products[0]).units, 2)
+
+    def test_rebuild_matches_the_incremental_rollups(self):
+        paid = self.place((self.ring, 2), (self.charm, 3))
+        self.pay(paid)
+        cancelled = self.place((self.ring, 1))
+        self.pay(cancelled)
+        self.set_status(cancelled, "cancelled")
+        self.place((self.charm, 1))
+        expected = snapshot()
+
+        for model in rollups.KEYS:
+            model.objects.all().delete()
+        out = StringIO()
+        call_command("rebuild_analytics", stdout=out)
+        self.assertIn("Rebuilt analytics", out.getvalue())
+        self.assertEqual(snapshot(), expected)
+
+    def test_rebuild_forgets_drift(self):
+        self.pay(self.place((self.ring, 2)))
+        ProductSales.objects.update(units=99)
+        rollups.rebuild()
+        self.assertEqual(ProductSales.objects.get().units, 2)
+
+
+class AnalyticsEndpointTests(APITestCase):
+    def setUp(self):
+        self.staff = User.objects.create_user("staff", is_staff=True)
+        self.client.force_authenticate(self.staff)
+        category = Category.objects.create(name="Rings", slug="rings")
+        products = [
+            Product.objects.create(
+                name=f"Ring {i}",
+                slug=f"ring-{i}",
+                description="",
+                price=10,
+                category=category,
+            )
+            for i in range(3)
+        ]
+        today = timezone.localdate()
+        DailySales.objects.bulk_create(
+            DailySales(date=today - timedelta(days=n), orders=n, revenue=n * 10)
+            for n in range(40)
+        )
+        ProductSales.objects.bulk_create(
+            ProductSales(product=product, units=10 - i, revenue=(i + 1) * 100)
+            for i, product in enumerate(products)
+        )
+        CategorySales.objects.create(category=category, units=27, revenue=600)
+        OrderStatusCount.objects.create(status="pending", count=4)
+
+    def test_staff_only(self):
+        self.client.force_authenticate(User.objects.create_user("buyer"))
+        for path in ["daily-sales", "top-products", "categories", "order-statuses"]:
+            response = self.client.get(f"/api/analytics/{path}/")
+            self.assertEqual(response.status_code, 403)
+
+    def test_daily_sales(self):
+        with self.assertNumQueries(1):
+            response = self.client.get("/api/analytics/daily-sales/")
+        self.assertEqual(len(response.data), 30)
+        self.assertEqual(response.data[-1]["date"], str(timezone.localdate()))
+        response = self.client.get("/api/analytics/daily-sales/?days=7")
+        self.assertEqual(
+            [row["orders"] for row in response.data], [6, 5, 4, 3, 2, 1, 0]
+        )
+        response = self.client.get("/api/analytics/daily-sales/?days=0")
+        self.assertEqual(response.status_code, 400)
+
+    def test_top_products(self):
+        with self.assertNumQueries(1):
+            response = self.client.get("/api/analytics/top-products/?limit=2")
+        self.assertEqual(
+            [row["product_slug"] for row in response.data], ["ring-2", "ring-1"]
+        )
+        response = self.client.get("/api/analytics/top-products/?by=units")
+        self.assertEqual([row["units"] for row in response.data], [10, 9, 8])
+        response = self.client.get("/api/analytics/top-products/?by=stock")
+        self.assertEqual(response.status_code, 400)
+
+    def test_top_products_read_the_index(self):
+        plan = ProductSales.objects.order_by("-revenue", "product_id")[:10].explain()
+        self.assertIn("product_sales_revenue_idx", plan)
+        self.assertNotIn("TEMP B-TREE", plan)
+
+    def test_categories_and_statuses(self):
+        with self.assertNumQueries(1):
+            response = self.client.get("/api/analytics/categories/")
+        self.assertEqual(response.data[0]["category_slug"], "rings")
+        self.assertEqual(response.data[0]["units"], 27)
+        with self.assertNumQueries(1):
+            response = self.client.get("/api/analytics/order-statuses/")
+        self.assertEqual(response.data, [{"status": "pending", "count": 4}])
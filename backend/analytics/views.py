@@ -0,0 +1,59 @@
+# analytics/views.py
+from datetime import timedelta
+
+from django.utils import timezone
+from rest_framework import permissions, viewsets
+from rest_framework.decorators import action
+from rest_framework.response import Response
+from .models import CategorySales, DailySales, OrderStatusCount, ProductSales
+from .serializers import (
+    CategorySalesSerializer,
+    DailySalesQuerySerializer,
+    DailySalesSerializer,
+    OrderStatusCountSerializer,
+    ProductSalesSerializer,
+    TopProductsQuerySerializer,
+)
+
+
+class AnalyticsViewSet(viewsets.ViewSet):
+    """
+    Sales figures for staff, read from the rollup tables, so each answer
+    costs the same however many orders there are.
+    """
+
+    permission_classes = [permissions.IsAdminUser]
+
+    def get_params(self, serializer_class):
+        serializer = serializer_class(data=self.request.query_params)
+        serializer.is_valid(raise_exception=True)
+        return serializer.validated_data
+
+    @action(detail=False, url_path="daily-sales")
+    def daily_sales(self, request):
+        """The last ``days`` days (30 by default) that had orders, oldest first."""
+        days = self.get_params(DailySalesQuerySerializer)["days"]
+        since = timezone.localdate() - timedelta(days=days - 1)
+        rows = DailySales.objects.filter(date__gte=since)
+        return Response(DailySalesSerializer(rows, many=True).data)
+
+    @action(detail=False, url_path="top-products")
+    def top_products(self, request):
+        """The ``limit`` best selling products ``by`` revenue or units."""
+        params = self.get_params(TopProductsQuerySerializer)
+        rows = ProductSales.objects.select_related("product").order_by(
+            f"-{params['by']}", "product_id"
+        )[: params["limit"]]
+        return Response(ProductSalesSerializer(rows, many=True).data)
+
+    @action(detail=False)
+    def categories(self, request):
+        rows = CategorySales.objects.select_related("category").order_by(
+            "-revenue", "category_id"
+        )
+        return Response(CategorySalesSerializer(rows, many=True).data)
+
+    @action(detail=False, url_path="order-statuses")
+    def order_statuses(self, request):
+        rows = OrderStatusCount.objects.order_by("status")
+        return Response(OrderStatusCountSerializer(rows, many=True).data)
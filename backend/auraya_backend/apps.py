@@ -0,0 +1,9 @@
+from django.apps import AppConfig
+
+
+class AurayaBackendConfig(AppConfig):
+    name = "auraya_backend"
+    verbose_name = "Auraya"
+
+    def ready(self):
+        from . import db  # noqa: F401
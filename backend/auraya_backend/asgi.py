@@ -2,6 +2,8 @@
 ASGI config for auraya_backend project.
 
 It exposes the ASGI callable as a module-level variable named ``application``.
+Requests resolve against ``auraya_backend.urls_asgi``, which serves the
+catalog reads with async views.
 
 For more information on this file, see
 https://docs.djangoproject.com/en/4.2/howto/deployment/asgi/
@@ -9,8 +11,23 @@ https://docs.djangoproject.com/en/4.2/howto/deployment/asgi/
 
 import os
 
-from django.core.asgi import get_asgi_application
+import django
+from django.core.handlers.asgi import ASGIHandler
 
 os.environ.setdefault("DJANGO_SETTINGS_MODULE", "auraya_backend.settings")
+# Sync code runs in a fresh thread for every request, so a connection kept
+# for later requests would never be used again
+os.environ.setdefault("DB_CONN_MAX_AGE", "0")
 
-application = get_asgi_application()
+ASGI_URLCONF = "auraya_backend.urls_asgi"
+
+
+class CatalogASGIHandler(ASGIHandler):
+    async def get_response_async(self, request):
+        request.urlconf = ASGI_URLCONF
+        return await super().get_response_async(request)
+
+
+# What get_asgi_application() does, with the handler above
+django.setup(set_prefix=False)
+application = CatalogASGIHandler()
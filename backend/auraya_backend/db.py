@@ -0,0 +1,22 @@
+"""
+Per-connection database setup.
+
+SQLite settings such as ``synchronous`` and ``busy_timeout`` belong to the
+connection rather than the file, so every new connection gets
+``SQLITE_PRAGMAS`` as it opens.
+"""
+
+from django.conf import settings
+from django.db.backends.signals import connection_created
+
+
+def configure_sqlite(sender, connection, **kwargs):
+    if connection.vendor != "sqlite":
+        return
+    # On the driver connection, so the pragmas stay out of query logs and
+    # counts
+    for name, value in settings.SQLITE_PRAGMAS.items():
+        connection.connection.execute(f"PRAGMA {name} = {value}")
+
+
+connection_created.connect(configure_sqlite)
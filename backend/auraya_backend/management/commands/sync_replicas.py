@@ -0,0 +1,48 @@
+import sqlite3
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DEFAULT_DB_ALIAS, connections
+
+
+class Command(BaseCommand):
+    help = (
+        "Copy the SQLite primary onto the SQLite replicas in DATABASE_REPLICAS, "
+        "once or every --interval seconds, to stand in for replication when "
+        "trying the replica routing locally."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--interval",
+            type=float,
+            help="Keep copying with this many seconds of lag between copies",
+        )
+
+    def handle(self, *args, **options):
+        if not settings.DATABASE_REPLICAS:
+            raise CommandError("No replicas configured; set DB_REPLICAS")
+        aliases = [DEFAULT_DB_ALIAS, *settings.DATABASE_REPLICAS]
+        if any(connections[alias].vendor != "sqlite" for alias in aliases):
+            raise CommandError("Only SQLite databases can be copied")
+
+        while True:
+            self.sync()
+            if options["interval"] is None:
+                break
+            time.sleep(options["interval"])
+
+    def sync(self):
+        primary = sqlite3.connect(connections[DEFAULT_DB_ALIAS].settings_dict["NAME"])
+        try:
+            for alias in settings.DATABASE_REPLICAS:
+                replica = sqlite3.connect(connections[alias].settings_dict["NAME"])
+                try:
+                    # A consistent snapshot, even while the primary is written
+                    primary.backup(replica)
+                finally:
+                    replica.close()
+                self.stdout.write(f"Copied the primary to {alias}")
+        finally:
+            primary.close()
@@ -0,0 +1,283 @@
+"""
+Per-request performance metrics.
+
+``RequestMetricsMiddleware`` records, for every request, the resolved view
+and DRF action, the number and total time of SQL queries, the fingerprints
+of queries that ran more than once, the time spent rendering the response
+body and its size. Each request reports them in a ``Server-Timing`` header
+and adds them to process-wide histograms that ``views.MetricsView`` serves
+in the Prometheus text format at ``/api/_metrics/``.
+
+Histograms are per process: with several workers, each one is scraped (or
+summed) separately, as with any Prometheus client without a shared store.
+"""
+
+import bisect
+import threading
+import time
+from contextvars import ContextVar
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.db import connections
+from django.db.backends.signals import connection_created
+from rest_framework.renderers import JSONRenderer
+
+from .queries import QueryRecorder, check_queries
+
+PROMETHEUS_CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+DURATION_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+QUERY_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100)
+SIZE_BUCKETS = (256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304)
+
+_current = ContextVar("request_metrics", default=None)
+
+
+class RequestMetrics:
+    def __init__(self):
+        self.queries = QueryRecorder(settings.QUERY_SLOW_THRESHOLD)
+        self.serialize = 0.0
+
+
+def current_metrics():
+    """The ``RequestMetrics`` of the request being handled, if any."""
+    return _current.get()
+
+
+class Histogram:
+    def __init__(self, name, help, buckets):
+        self.name = name
+        self.help = help
+        self.buckets = buckets
+        # labels -> [per-bucket counts (+Inf last), sum]
+        self.series = {}
+
+    def observe(self, labels, value):
+        series = self.series.get(labels)
+        if series is None:
+            series = self.series[labels] = [[0] * (len(self.buckets) + 1), 0.0]
+        series[0][bisect.bisect_left(self.buckets, value)] += 1
+        series[1] += value
+
+    def render(self, label_names):
+        yield f"# HELP {self.name} {self.help}"
+        yield f"# TYPE {self.name} histogram"
+        for labels, (counts, total) in sorted(self.series.items()):
+            base = format_labels(label_names, labels)
+            cumulative = 0
+            for bound, count in zip((*self.buckets, "+Inf"), counts):
+                cumulative += count
+                le = format_labels(("le",), (format_value(bound),))
+                yield f"{self.name}_bucket{{{base},{le}}} {cumulative}"
+            yield f"{self.name}_sum{{{base}}} {format_value(total)}"
+            yield f"{self.name}_count{{{base}}} {cumulative}"
+
+
+class Counter:
+    def __init__(self, name, help):
+        self.name = name
+        self.help = help
+        self.series = {}
+
+    def inc(self, labels, amount=1):
+        self.series[labels] = self.series.get(labels, 0) + amount
+
+    def render(self, label_names):
+        yield f"# HELP {self.name} {self.help}"
+        yield f"# TYPE {self.name} counter"
+        for labels, value in sorted(self.series.items()):
+            yield f"{self.name}{{{format_labels(label_names, labels)}}} {value}"
+
+
+def format_value(value):
+    if isinstance(value, str):
+        return value
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+def format_labels(names, values):
+    return ",".join(
+        '{}="{}"'.format(
+            name,
+            str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n"),
+        )
+        for name, value in zip(names, values)
+    )
+
+
+class Registry:
+    """The process-wide metrics, labelled by view and DRF action."""
+
+    labels = ("view", "action")
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        self.requests = Counter(
+            "auraya_http_requests_total", "Requests handled, by response status."
+        )
+        self.duplicates = Counter(
+            "auraya_db_duplicate_queries_total",
+            "Queries whose fingerprint already ran earlier in the same request.",
+        )
+        self.histograms = [
+            Histogram(
+                "auraya_http_request_duration_seconds",
+                "Time spent in the Django handler.",
+                DURATION_BUCKETS,
+            ),
+            Histogram(
+                "auraya_db_queries_per_request",
+                "SQL queries per request.",
+                QUERY_BUCKETS,
+            ),
+            Histogram(
+                "auraya_db_duration_seconds",
+                "Total SQL time per request.",
+                DURATION_BUCKETS,
+            ),
+            Histogram(
+                "auraya_serialize_duration_seconds",
+                "Time spent rendering the response body.",
+                DURATION_BUCKETS,
+            ),
+            Histogram(
+                "auraya_response_size_bytes",
+                "Response body size.",
+                SIZE_BUCKETS,
+            ),
+        ]
+
+    def observe(self, labels, status, values, duplicates):
+        with self.lock:
+            self.requests.inc((*labels, status))
+            if duplicates:
+                self.duplicates.inc(labels, duplicates)
+            for histogram, value in zip(self.histograms, values):
+                histogram.observe(labels, value)
+
+    def render(self):
+        with self.lock:
+            lines = [
+                *self.requests.render((*self.labels, "status")),
+                *self.duplicates.render(self.labels),
+            ]
+            for histogram in self.histograms:
+                lines += histogram.render(self.labels)
+        return "\n".join(lines) + "\n"
+
+
+registry = Registry()
+
+
+class TimedJSONRenderer(JSONRenderer):
+    """``JSONRenderer`` that adds its running time to the request metrics."""
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        metrics = _current.get()
+        if metrics is None:
+            return super().render(data, accepted_media_type, renderer_context)
+        start = time.perf_counter()
+        try:
+            return super().render(data, accepted_media_type, renderer_context)
+        finally:
+            metrics.serialize += time.perf_counter() - start
+
+
+def resolve_labels(request):
+    match = request.resolver_match
+    if match is None:
+        return "<unresolved>", ""
+    actions = getattr(match.func, "actions", None) or {}
+    return match.view_name, actions.get(request.method.lower(), "")
+
+
+def server_timing(view, action, total, metrics, duplicates, size):
+    entries = [
+        f'total;dur={total * 1000:.1f};desc="{view}{":" if action else ""}{action}"',
+        f'db;dur={metrics.queries.duration * 1000:.1f};desc="{metrics.queries.count} queries"',
+        f"serialize;dur={metrics.serialize * 1000:.1f}",
+        f'size;desc="{size} bytes"',
+    ]
+    entries += [f'dup;desc="{key} x{count}"' for key, count in duplicates.items()]
+    return ", ".join(entries)
+
+
+def record_query(execute, sql, params, many, context):
+    metrics = _current.get()
+    if metrics is None:
+        return execute(sql, params, many, context)
+    return metrics.queries(execute, sql, params, many, context)
+
+
+def install_query_recorder(connection, **kwargs):
+    # Connections are per thread and the async ORM queries from other
+    # threads than the request's, so every connection gets a permanent
+    # wrapper that finds the request through the context
+    if record_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(record_query)
+
+
+connection_created.connect(install_query_recorder)
+
+
+class RequestMetricsMiddleware:
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.is_async = iscoroutinefunction(get_response)
+        if self.is_async:
+            markcoroutinefunction(self)
+        # Opened before this module was imported
+        for connection in connections.all(initialized_only=True):
+            install_query_recorder(connection)
+
+    def __call__(self, request):
+        if self.is_async:
+            return self.__acall__(request)
+        metrics = RequestMetrics()
+        token = _current.set(metrics)
+        start = time.perf_counter()
+        try:
+            response = self.get_response(request)
+        finally:
+            _current.reset(token)
+        return self.process(request, response, metrics, time.perf_counter() - start)
+
+    async def __acall__(self, request):
+        metrics = RequestMetrics()
+        token = _current.set(metrics)
+        start = time.perf_counter()
+        try:
+            response = await self.get_response(request)
+        finally:
+            _current.reset(token)
+        return self.process(request, response, metrics, time.perf_counter() - start)
+
+    def process(self, request, response, metrics, total):
+        view, action = resolve_labels(request)
+        duplicates = metrics.queries.duplicates()
+        size = 0 if response.streaming else len(response.content)
+        registry.observe(
+            (view, action),
+            response.status_code,
+            (
+                total,
+                metrics.queries.count,
+                metrics.queries.duration,
+                metrics.serialize,
+                size,
+            ),
+            sum(count - 1 for count in duplicates.values()),
+        )
+        if settings.REQUEST_METRICS_SERVER_TIMING:
+            response["Server-Timing"] = server_timing(
+                view, action, total, metrics, duplicates, size
+            )
+        check_queries(f"{request.method} {request.path} ({view})", metrics.queries)
+        return response
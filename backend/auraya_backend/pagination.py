@@ -0,0 +1,190 @@
+import base64
+import json
+
+from django.core.exceptions import ValidationError
+from django.core.paginator import InvalidPage
+from django.db.models import Q
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination, PageNumberPagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import replace_query_param
+
+
+class KeysetPagination(BasePagination):
+    """
+    Keyset ("seek") pagination on ``(ordering field, id)``.
+
+    Each page is fetched with ``WHERE (field, id) < (last value, last id)``
+    instead of ``OFFSET``, and no ``COUNT(*)`` is run, so page 5000 costs the
+    same as page 1. The ordering is taken from ``?ordering=`` when it names
+    one of the view's ``ordering_fields``, otherwise from the view's default
+    ``ordering``. Ordering fields must be non-nullable.
+    """
+
+    cursor_query_param = "cursor"
+    invalid_cursor_message = "Invalid cursor"
+
+    def __init__(self, page_size):
+        self.page_size = page_size
+
+    def get_ordering_field(self, request, view):
+        ordering_fields = getattr(view, "ordering_fields", None) or []
+        requested = request.query_params.get("ordering", "").split(",")[0].strip()
+        if requested.lstrip("-") in ordering_fields:
+            return requested
+        default = getattr(view, "ordering", None) or ["-created_at"]
+        return default[0] if isinstance(default, (list, tuple)) else default
+
+    def decode_cursor(self, request):
+        encoded = request.query_params.get(self.cursor_query_param)
+        if not encoded:
+            return None
+        try:
+            cursor = json.loads(base64.urlsafe_b64decode(encoded.encode()))
+            return cursor["o"], cursor["v"], int(cursor["id"]), bool(cursor["r"])
+        except (TypeError, ValueError, KeyError):
+            raise NotFound(self.invalid_cursor_message)
+
+    def encode_cursor(self, row, reverse):
+        value = getattr(row, self.field_name)
+        if not isinstance(value, (str, int)):
+            value = value.isoformat() if hasattr(value, "isoformat") else str(value)
+        cursor = {"o": self.ordering, "v": value, "id": row.pk, "r": reverse}
+        encoded = base64.urlsafe_b64encode(json.dumps(cursor).encode()).decode()
+        return replace_query_param(
+            self.request.build_absolute_uri(), self.cursor_query_param, encoded
+        )
+
+    def paginate_queryset(self, queryset, request, view=None):
+        queryset = self.get_page_queryset(queryset, request, view)
+        return self.build_page(list(queryset))
+
+    async def apaginate_queryset(self, queryset, request, view=None):
+        queryset = self.get_page_queryset(queryset, request, view)
+        return self.build_page([row async for row in queryset.aiterator()])
+
+    def get_page_queryset(self, queryset, request, view):
+        """The page as a sliced queryset: one row more than fits, in seek order."""
+        self.request = request
+        self.ordering = self.get_ordering_field(request, view)
+        self.field_name = self.ordering.lstrip("-")
+        descending = self.ordering.startswith("-")
+
+        self.cursor = cursor = self.decode_cursor(request)
+        reverse = False
+        if cursor is not None:
+            ordering, raw_value, last_id, reverse = cursor
+            if ordering != self.ordering:
+                raise NotFound(self.invalid_cursor_message)
+            try:
+                value = queryset.model._meta.get_field(self.field_name).to_python(
+                    raw_value
+                )
+            except ValidationError:
+                raise NotFound(self.invalid_cursor_message)
+            lookup = "lt" if descending != reverse else "gt"
+            # (field, id) < (value, last_id), spelled with a bound on the
+            # field alone so the index can seek straight to the position
+            queryset = queryset.filter(
+                Q(**{f"{self.field_name}__{lookup}e": value}),
+                Q(**{f"{self.field_name}__{lookup}": value})
+                | Q(**{f"pk__{lookup}": last_id}),
+            )
+
+        # Walk backwards from the cursor when paging to the previous page
+        self.reverse = reverse
+        if descending != reverse:
+            queryset = queryset.order_by(f"-{self.field_name}", "-pk")
+        else:
+            queryset = queryset.order_by(self.field_name, "pk")
+        return queryset[: self.page_size + 1]
+
+    def build_page(self, rows):
+        """Trim the fetched rows to the page and set the cursor links."""
+        has_more = len(rows) > self.page_size
+        rows = rows[: self.page_size]
+        if self.reverse:
+            rows.reverse()
+
+        self.next_link = self.previous_link = None
+        if rows:
+            if self.reverse:
+                self.next_link = self.encode_cursor(rows[-1], reverse=False)
+                if has_more:
+                    self.previous_link = self.encode_cursor(rows[0], reverse=True)
+            else:
+                if has_more:
+                    self.next_link = self.encode_cursor(rows[-1], reverse=False)
+                if self.cursor is not None:
+                    self.previous_link = self.encode_cursor(rows[0], reverse=True)
+        return rows
+
+    def get_paginated_response(self, data):
+        return Response(
+            {"next": self.next_link, "previous": self.previous_link, "results": data}
+        )
+
+
+class AsyncPageNumberPagination(PageNumberPagination):
+    """``PageNumberPagination`` that can also fetch its page with the async ORM."""
+
+    async def apaginate_queryset(self, queryset, request, view=None):
+        page_size = self.get_page_size(request)
+        if not page_size:
+            return None
+
+        paginator = self.django_paginator_class(queryset, page_size)
+        # Paginator would count synchronously on first use
+        paginator.count = await queryset.acount()
+        page_number = self.get_page_number(request, paginator)
+        try:
+            self.page = paginator.page(page_number)
+        except InvalidPage as exc:
+            raise NotFound(
+                self.invalid_page_message.format(
+                    page_number=page_number, message=str(exc)
+                )
+            )
+        self.page.object_list = [
+            row async for row in self.page.object_list.aiterator(page_size)
+        ]
+        self.request = request
+        return list(self.page)
+
+
+class PageNumberOrKeysetPagination(AsyncPageNumberPagination):
+    """
+    Page-number pagination by default; keyset pagination once the request
+    carries a ``cursor`` parameter (``?cursor=`` for the first page).
+    """
+
+    cursor_query_param = KeysetPagination.cursor_query_param
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.keyset = None
+        if self.cursor_query_param in request.query_params:
+            self.keyset = KeysetPagination(self.get_page_size(request))
+            return self.keyset.paginate_queryset(queryset, request, view)
+        return super().paginate_queryset(queryset, request, view)
+
+    async def apaginate_queryset(self, queryset, request, view=None):
+        self.keyset = None
+        if self.cursor_query_param in request.query_params:
+            self.keyset = KeysetPagination(self.get_page_size(request))
+            return await self.keyset.apaginate_queryset(queryset, request, view)
+        return await super().apaginate_queryset(queryset, request, view)
+
+    def get_paginated_response(self, data):
+        if self.keyset is not None:
+            return self.keyset.get_paginated_response(data)
+        return super().get_paginated_response(data)
+
+    def get_next_link(self):
+        if self.keyset is not None:
+            return self.keyset.next_link
+        return super().get_next_link()
+
+    def get_previous_link(self):
+        if self.keyset is not None:
+            return self.keyset.previous_link
+        return super().get_previous_link()
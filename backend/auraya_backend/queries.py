@@ -0,0 +1,157 @@
+"""
+SQL fingerprinting, per-request query recording and N+1 detection.
+
+A fingerprint is the SQL with every literal and parameter placeholder
+replaced by ``?`` and ``IN (...)`` lists collapsed, so the queries one ORM
+call issues for different rows share a fingerprint. A fingerprint that runs
+``QUERY_N_PLUS_ONE_THRESHOLD`` times within one request is reported as an
+N+1 candidate; statements slower than ``QUERY_SLOW_THRESHOLD`` seconds are
+reported as slow. Both go to the ``auraya.queries`` logger, which settings
+send to a rotating file.
+
+When ``QUERY_N_PLUS_ONE_RAISE`` is set (the test runner sets it)
+an N+1 candidate also raises ``NPlusOneError``, so any test that requests
+the offending endpoint fails. ``assert_no_n_plus_one`` does the same for a
+block of code.
+"""
+
+import functools
+import hashlib
+import logging
+import re
+import time
+from collections import Counter
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, connections
+
+logger = logging.getLogger("auraya.queries")
+
+_STRINGS = re.compile(r"'(?:[^']|'')*'")
+_NUMBERS = re.compile(r"\b\d+(?:\.\d+)?\b")
+_PLACEHOLDERS = re.compile(r"%s|\?")
+_IN_LISTS = re.compile(r"\bIN \((?:\?, )*\?\)", re.IGNORECASE)
+_VALUES_LISTS = re.compile(r"VALUES (?:\((?:\?, )*\?\), )*\((?:\?, )*\?\)")
+_WHITESPACE = re.compile(r"\s+")
+
+# Transaction control repeats by design, not because of a loop over rows
+_IGNORED = ("SAVEPOINT", "RELEASE SAVEPOINT", "ROLLBACK TO SAVEPOINT")
+
+
+def normalize_sql(sql):
+    sql = _STRINGS.sub("?", sql)
+    sql = _NUMBERS.sub("?", sql)
+    sql = _PLACEHOLDERS.sub("?", sql)
+    sql = _IN_LISTS.sub("IN (...)", sql)
+    sql = _VALUES_LISTS.sub("VALUES (...)", sql)
+    return _WHITESPACE.sub(" ", sql).strip()
+
+
+@functools.lru_cache(maxsize=4096)
+def fingerprint(sql):
+    """Short stable id for the normalized form of ``sql``."""
+    return hashlib.sha1(normalize_sql(sql).encode()).hexdigest()[:8]
+
+
+class QueryRecorder:
+    """
+    ``connection.execute_wrapper`` that counts and times queries.
+
+    Only the raw SQL string is counted per query; normalizing happens once
+    per distinct statement in ``duplicates()``, which keeps the per-query
+    cost to a dict update. Statements taking at least ``slow_threshold``
+    seconds are kept in ``slow``.
+    """
+
+    def __init__(self, slow_threshold=None):
+        self.count = 0
+        self.duration = 0.0
+        self.statements = Counter()
+        self.slow_threshold = slow_threshold
+        self.slow = []
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            elapsed = time.perf_counter() - start
+            self.duration += elapsed
+            self.count += 1
+            self.statements[sql] += 1
+            if self.slow_threshold is not None and elapsed >= self.slow_threshold:
+                self.slow.append((sql, elapsed))
+
+    def fingerprints(self):
+        """Executions per fingerprint, with an example statement for each."""
+        counts, examples = Counter(), {}
+        for sql, count in self.statements.items():
+            key = fingerprint(sql)
+            counts[key] += count
+            examples.setdefault(key, sql)
+        return counts, examples
+
+    def duplicates(self):
+        """``{fingerprint: executions}`` for statements run more than once."""
+        counts, _ = self.fingerprints()
+        return {key: count for key, count in counts.items() if count > 1}
+
+    def n_plus_one(self, threshold):
+        """``(fingerprint, executions, example sql)`` repeated ``threshold`` times."""
+        counts, examples = self.fingerprints()
+        return [
+            (key, count, examples[key])
+            for key, count in counts.most_common()
+            if count >= threshold and not examples[key].startswith(_IGNORED)
+        ]
+
+
+class NPlusOneError(AssertionError):
+    def __init__(self, label, findings):
+        self.findings = findings
+        super().__init__(
+            f"N+1 queries in {label}:\n"
+            + "\n".join(
+                f"  {count}x [{key}] {normalize_sql(sql)}"
+                for key, count, sql in findings
+            )
+        )
+
+
+def check_queries(label, recorder, threshold=None, raise_errors=None):
+    """
+    Log the N+1 candidates and slow statements ``recorder`` saw in ``label``
+    (a request or block of code) and return the N+1 candidates.
+
+    Raises ``NPlusOneError`` instead of returning when ``raise_errors`` (by
+    default ``QUERY_N_PLUS_ONE_RAISE``) is true.
+    """
+    if threshold is None:
+        threshold = settings.QUERY_N_PLUS_ONE_THRESHOLD
+    if raise_errors is None:
+        raise_errors = settings.QUERY_N_PLUS_ONE_RAISE
+
+    for sql, elapsed in recorder.slow:
+        logger.warning(
+            "slow query in %s: %.1f ms [%s] %s",
+            label,
+            elapsed * 1000,
+            fingerprint(sql),
+            normalize_sql(sql),
+        )
+    findings = recorder.n_plus_one(threshold)
+    for key, count, sql in findings:
+        logger.warning("n+1 in %s: %d x [%s] %s", label, count, key, normalize_sql(sql))
+    if findings and raise_errors:
+        raise NPlusOneError(label, findings)
+    return findings
+
+
+@contextmanager
+def assert_no_n_plus_one(label="block", threshold=None, using=DEFAULT_DB_ALIAS):
+    """Fail with ``NPlusOneError`` if a fingerprint repeats inside the block."""
+    recorder = QueryRecorder()
+    with connections[using].execute_wrapper(recorder):
+        yield recorder
+    check_queries(label, recorder, threshold, raise_errors=True)
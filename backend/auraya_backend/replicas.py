@@ -0,0 +1,177 @@
+"""
+Read-replica routing.
+
+Replicas are the database aliases listed in ``DATABASE_REPLICAS``. Nothing
+reads from them unless a view asks: viewsets with ``ReplicaReadsMixin``
+serve their ``replica_actions`` from a replica chosen once per request,
+and every other query, including all writes, goes to ``default``.
+
+Replicas lag behind the primary, so reads are pinned to the primary for
+``REPLICA_PIN_SECONDS`` after a write:
+
+* per user: ``ReplicaPinMiddleware`` pins the user of any request that
+  wrote to the database, so they read their own orders and addresses back;
+* per scope: ``pin("catalog")`` runs when the catalog cache generation is
+  bumped, so the pages cached under the new generation are not built from
+  rows the replica has yet to receive.
+
+Pins live in the cache, which must be shared by all workers for them to
+hold across processes.
+"""
+
+import random
+from contextvars import ContextVar
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.conf import settings
+from django.core.cache import cache
+from django.db import DEFAULT_DB_ALIAS
+from rest_framework.permissions import SAFE_METHODS
+
+PIN_KEY = "replica:pin:{}"
+
+_state = ContextVar("database_routing", default=None)
+
+
+class RoutingState:
+    def __init__(self):
+        # Alias the request reads from; None for the primary
+        self.replica = None
+        self.wrote = False
+
+
+class ReplicaRouter:
+    def db_for_read(self, model, **hints):
+        state = _state.get()
+        return state.replica if state is not None else None
+
+    def db_for_write(self, model, **hints):
+        state = _state.get()
+        if state is not None:
+            state.wrote = True
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        aliases = {DEFAULT_DB_ALIAS, *settings.DATABASE_REPLICAS}
+        if obj1._state.db in aliases and obj2._state.db in aliases:
+            return True
+        return None
+
+
+def pin(*scopes):
+    """Keep reads for ``scopes`` on the primary for a while."""
+    cache.set_many(
+        {PIN_KEY.format(scope): True for scope in scopes},
+        settings.REPLICA_PIN_SECONDS,
+    )
+
+
+def is_pinned(*scopes):
+    return bool(cache.get_many([PIN_KEY.format(scope) for scope in scopes]))
+
+
+async def ais_pinned(*scopes):
+    return bool(await cache.aget_many([PIN_KEY.format(scope) for scope in scopes]))
+
+
+def user_scope(user):
+    return f"user:{user.pk}"
+
+
+def use_replica(*scopes):
+    """Send the current request's reads to a replica unless a scope is pinned."""
+    state = _state.get()
+    if state is None or not settings.DATABASE_REPLICAS or is_pinned(*scopes):
+        return False
+    state.replica = random.choice(settings.DATABASE_REPLICAS)
+    return True
+
+
+async def ause_replica(*scopes):
+    state = _state.get()
+    if state is None or not settings.DATABASE_REPLICAS or await ais_pinned(*scopes):
+        return False
+    state.replica = random.choice(settings.DATABASE_REPLICAS)
+    return True
+
+
+class ReplicaReadsMixin:
+    """
+    Serves the ``replica_actions`` of a viewset from a read replica, unless
+    the user or one of ``replica_pin_scopes`` wrote recently.
+    """
+
+    replica_actions = ("list", "retrieve")
+    replica_pin_scopes = ()
+
+    def get_replica_pin_scopes(self, request):
+        """
+        The pin scopes that keep this request on the primary, or ``None``
+        if it does not read from a replica at all.
+        """
+        if (
+            request.method not in SAFE_METHODS
+            or self.action not in self.replica_actions
+        ):
+            return None
+        scopes = list(self.replica_pin_scopes)
+        if request.user.is_authenticated:
+            scopes.append(user_scope(request.user))
+        return scopes
+
+    def initial(self, request, *args, **kwargs):
+        super().initial(request, *args, **kwargs)
+        scopes = self.get_replica_pin_scopes(request)
+        if scopes is not None:
+            use_replica(*scopes)
+
+    async def ainitial(self, request, *args, **kwargs):
+        """``initial`` for async views, checking the pins without blocking."""
+        super().initial(request, *args, **kwargs)
+        scopes = self.get_replica_pin_scopes(request)
+        if scopes is not None:
+            await ause_replica(*scopes)
+
+
+class ReplicaPinMiddleware:
+    """Tracks database writes per request and pins the user who made them."""
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.is_async = iscoroutinefunction(get_response)
+        if self.is_async:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.is_async:
+            return self.__acall__(request)
+        state = RoutingState()
+        token = _state.set(state)
+        try:
+            response = self.get_response(request)
+        finally:
+            _state.reset(token)
+        if state.wrote:
+            self.pin_user(request)
+        return response
+
+    async def __acall__(self, request):
+        state = RoutingState()
+        token = _state.set(state)
+        try:
+            response = await self.get_response(request)
+        finally:
+            _state.reset(token)
+        if state.wrote:
+            # A session user is loaded lazily, from the database
+            await sync_to_async(self.pin_user)(request)
+        return response
+
+    def pin_user(self, request):
+        # DRF copies the user it authenticated onto the Django request
+        user = getattr(request, "user", None)
+        if user is not None and user.is_authenticated:
+            pin(user_scope(user))
@@ -0,0 +1,36 @@
+"""
+Test runner for ``manage.py test``.
+
+On top of Django's runner it turns on ``QUERY_N_PLUS_ONE_RAISE``, so any
+request a test makes fails on an N+1, and, when no real replicas are
+configured, adds a ``replica`` database for the routing tests, which route
+to it with ``override_settings(DATABASE_REPLICAS=["replica"])``.
+"""
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, connections
+from django.test.runner import DiscoverRunner
+
+TEST_REPLICA = "replica"
+
+
+class TestRunner(DiscoverRunner):
+    def setup_test_environment(self, **kwargs):
+        super().setup_test_environment(**kwargs)
+        self._raise_n_plus_one = settings.QUERY_N_PLUS_ONE_RAISE
+        settings.QUERY_N_PLUS_ONE_RAISE = True
+
+    def teardown_test_environment(self, **kwargs):
+        settings.QUERY_N_PLUS_ONE_RAISE = self._raise_n_plus_one
+        super().teardown_test_environment(**kwargs)
+
+    def setup_databases(self, **kwargs):
+        if not settings.DATABASE_REPLICAS and TEST_REPLICA not in connections:
+            # A separate test database, unlike real replicas which mirror
+            # default, so the routing tests can tell where a read went
+            default = connections.settings[DEFAULT_DB_ALIAS]
+            connections.settings[TEST_REPLICA] = {
+                **default,
+                "TEST": {**default["TEST"]},
+            }
+        return super().setup_databases(**kwargs)
@@ -22,12 +22,17 @@ INSTALLED_APPS = [
     "rest_framework_simplejwt",
     "corsheaders",
     "django_filters",
+    "auraya_backend",
     "products",
     "orders",
     "users",
+    "jobs",
+    "analytics",
 ]
 
 MIDDLEWARE = [
+    "auraya_backend.metrics.RequestMetricsMiddleware",
+    "auraya_backend.replicas.ReplicaPinMiddleware",
     "django.middleware.security.SecurityMiddleware",
     "django.contrib.sessions.middleware.SessionMiddleware",
     "corsheaders.middleware.CorsMiddleware",
@@ -59,25 +64,115 @@ TEMPLATES = [
 WSGI_APPLICATION = "auraya_backend.wsgi.application"
 
 # Database
-DATABASES = {
+# DB_ENGINE selects the profile:
+#   sqlite     single node; the file is tuned by SQLITE_PRAGMAS (default)
+#   postgres   direct connections to PostgreSQL
+#   pgbouncer  PostgreSQL behind PgBouncer in transaction pooling mode
+DB_ENGINE = os.getenv("DB_ENGINE", "sqlite")
+
+# Seconds a connection is kept open for later requests (0: one per request).
+# Each worker thread holds its own, so PostgreSQL needs max_connections
+# above workers x threads unless PgBouncer sits in between.
+DB_CONN_MAX_AGE = int(os.getenv("DB_CONN_MAX_AGE", "600"))
+
+if DB_ENGINE == "sqlite":
+    DATABASES = {
+        "default": {
+            "ENGINE": "django.db.backends.sqlite3",
+            "NAME": os.getenv("DB_NAME", BASE_DIR / "db.sqlite3"),
+            "CONN_MAX_AGE": DB_CONN_MAX_AGE,
+            "CONN_HEALTH_CHECKS": True,
+        }
+    }
+elif DB_ENGINE in ("postgres", "pgbouncer"):
+    DATABASES = {
+        "default": {
+            "ENGINE": "django.db.backends.postgresql",
+            "NAME": os.getenv("DB_NAME", "auraya_studio"),
+            "USER": os.getenv("DB_USER", "postgres"),
+            "PASSWORD": os.getenv("DB_PASSWORD", ""),
+            "HOST": os.getenv("DB_HOST", "localhost"),
+            "PORT": os.getenv(
+                "DB_PORT", "6432" if DB_ENGINE == "pgbouncer" else "5432"
+            ),
+            "CONN_MAX_AGE": DB_CONN_MAX_AGE,
+            "CONN_HEALTH_CHECKS": True,
+            "OPTIONS": {"connect_timeout": 5},
+        }
+    }
+    if DB_ENGINE == "pgbouncer":
+        # PgBouncer hands each transaction to any server connection, and a
+        # server-side cursor does not outlive the transaction that opened it
+        DATABASES["default"]["DISABLE_SERVER_SIDE_CURSORS"] = True
+else:
+    raise ValueError(f"Unknown DB_ENGINE {DB_ENGINE!r}")
+
+# Read replicas: DB_REPLICAS lists their files (sqlite) or hosts (postgres).
+# Only the reads of views with ReplicaReadsMixin go to them.
+DATABASE_REPLICAS = []
+for number, replica in enumerate(
+    filter(None, os.getenv("DB_REPLICAS", "").split(",")), 1
+):
+    alias = f"replica_{number}"
+    DATABASES[alias] = {
+        **DATABASES["default"],
+        "NAME" if DB_ENGINE == "sqlite" else "HOST": replica,
+        "TEST": {"MIRROR": "default"},
+    }
+    DATABASE_REPLICAS.append(alias)
+
+DATABASE_ROUTERS = ["auraya_backend.replicas.ReplicaRouter"]
+
+# How long reads stay on the primary after a user (or the catalog) writes;
+# longer than the replication lag
+REPLICA_PIN_SECONDS = 10
+
+# Applied to every new SQLite connection (auraya_backend.db). WAL lets
+# readers carry on while a write commits, and with WAL synchronous=NORMAL
+# only risks the last commits on power loss, never corruption. Set
+# DB_SQLITE_PRAGMAS="" to use SQLite's defaults.
+SQLITE_PRAGMAS = dict(
+    pragma.split("=", 1)
+    for pragma in os.getenv(
+        "DB_SQLITE_PRAGMAS", "journal_mode=wal,synchronous=normal,busy_timeout=5000"
+    ).split(",")
+    if pragma
+)
+
+# Cache
+CACHES = {
     "default": {
-        "ENGINE": "django.db.backends.sqlite3",
-        "NAME": BASE_DIR / "db.sqlite3",
+        "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+        "LOCATION": "auraya",
     }
 }
 
-# For PostgreSQL, use this configuration:
-# DATABASES = {
+# With several worker processes, use a shared backend so that catalog
+# invalidations reach all of them:
+# CACHES = {
 #     "default": {
-#         "ENGINE": "django.db.backends.postgresql",
-#         "NAME": "auraya_studio",
-#         "USER": "postgres",
-#         "PASSWORD": "your_password",
-#         "HOST": "localhost",
-#         "PORT": "5432",
+#         "BACKEND": "django.core.cache.backends.filebased.FileBasedCache",
+#         "LOCATION": BASE_DIR / "cache",
 #     }
 # }
 
+# Seconds a rendered catalog page may be served from the cache
+CATALOG_CACHE_TIMEOUT = 300
+
+# Seconds a user's /api/auth/me/ document may be served from the cache
+CURRENT_USER_CACHE_TIMEOUT = 600
+
+# Product search: "auto" picks SQLite FTS5 or Postgres full-text search from
+# the database in use; "python" forces the in-process index
+PRODUCT_SEARCH_BACKEND = "auto"
+
+# Product image variants: fixed-size crops in every format Pillow can write,
+# generated by a pool of PRODUCT_IMAGE_WORKERS threads (0 = in the request)
+PRODUCT_IMAGE_SIZES = {"thumb": (160, 160), "card": (480, 480)}
+PRODUCT_IMAGE_FORMATS = ["jpeg", "webp", "avif"]
+PRODUCT_IMAGE_WORKERS = 2
+PRODUCT_IMAGE_MAX_UPLOAD_SIZE = 20 * 1024 * 1024
+
 # Password validation
 AUTH_PASSWORD_VALIDATORS = [
     {
@@ -111,7 +206,7 @@ CORS_ALLOW_CREDENTIALS = True
 # REST Framework settings
 REST_FRAMEWORK = {
     "DEFAULT_AUTHENTICATION_CLASSES": [
-        "rest_framework_simplejwt.authentication.JWTAuthentication",
+        "users.authentication.StatelessJWTAuthentication",
     ],
     "DEFAULT_PERMISSION_CLASSES": [
         "rest_framework.permissions.IsAuthenticatedOrReadOnly",
@@ -121,6 +216,57 @@ REST_FRAMEWORK = {
     "DEFAULT_FILTER_BACKENDS": [
         "django_filters.rest_framework.DjangoFilterBackend",
     ],
+    "DEFAULT_RENDERER_CLASSES": [
+        "auraya_backend.metrics.TimedJSONRenderer",
+        "rest_framework.renderers.BrowsableAPIRenderer",
+    ],
+}
+
+# Per-request view, SQL, serialization and size metrics are aggregated for
+# /api/_metrics/; this also reports them to clients as Server-Timing headers
+REQUEST_METRICS_SERVER_TIMING = True
+
+# Query log: statements slower than QUERY_SLOW_THRESHOLD seconds and
+# fingerprints repeated QUERY_N_PLUS_ONE_THRESHOLD times in one request are
+# written to logs/queries.log; the test runner makes an N+1 fail the request
+QUERY_SLOW_THRESHOLD = 0.1
+QUERY_N_PLUS_ONE_THRESHOLD = 3
+QUERY_N_PLUS_ONE_RAISE = False
+
+# Raises on N+1s and adds the test-only "replica" database
+TEST_RUNNER = "auraya_backend.runner.TestRunner"
+
+LOG_DIR = BASE_DIR / "logs"
+LOG_DIR.mkdir(exist_ok=True)
+
+LOGGING = {
+    "version": 1,
+    "disable_existing_loggers": False,
+    "formatters": {
+        "timestamped": {"format": "{asctime} {levelname} {message}", "style": "{"},
+    },
+    "handlers": {
+        "query_log": {
+            "class": "logging.handlers.RotatingFileHandler",
+            "filename": LOG_DIR / "queries.log",
+            "maxBytes": 10 * 1024 * 1024,
+            "backupCount": 5,
+            "delay": True,
+            "formatter": "timestamped",
+        },
+        "job_log": {
+            "class": "logging.handlers.RotatingFileHandler",
+            "filename": LOG_DIR / "jobs.log",
+            "maxBytes": 10 * 1024 * 1024,
+            "backupCount": 5,
+            "delay": True,
+            "formatter": "timestamped",
+        },
+    },
+    "loggers": {
+        "auraya.queries": {"handlers": ["query_log"], "level": "WARNING"},
+        "auraya.jobs": {"handlers": ["job_log"], "level": "INFO"},
+    },
 }
 
 # JWT settings
@@ -130,9 +276,37 @@ SIMPLE_JWT = {
     "ROTATE_REFRESH_TOKENS": False,
     "BLACKLIST_AFTER_ROTATION": True,
     "UPDATE_LAST_LOGIN": False,
+    # Tokens carry a hash of the password, so changing it revokes them
+    "CHECK_REVOKE_TOKEN": True,
+    "TOKEN_OBTAIN_SERIALIZER": "users.serializers.TokenObtainPairSerializer",
 }
 
+# How long a process trusts what it last read about a token's user (active,
+# staff, password); users.authentication builds request.user from the token
+AUTH_USER_STATUS_TTL = 30
+
+# How long checkout holds stock for an unpaid order
+STOCK_RESERVATION_TTL = timedelta(minutes=30)
+# How many times confirming a payment may renew that hold
+STOCK_RESERVATION_MAX_EXTENSIONS = 3
+# How often run_jobs releases expired holds
+STOCK_RESERVATION_SWEEP_INTERVAL = timedelta(minutes=1)
+
 # PayPal settings (use environment variables in production)
 PAYPAL_MODE = "sandbox"  # Change to 'live' in production
 PAYPAL_CLIENT_ID = os.getenv("PAYPAL_CLIENT_ID", "")
 PAYPAL_CLIENT_SECRET = os.getenv("PAYPAL_CLIENT_SECRET", "")
+PAYPAL_API_BASE = os.getenv(
+    "PAYPAL_API_BASE",
+    (
+        "https://api-m.paypal.com"
+        if PAYPAL_MODE == "live"
+        else "https://api-m.sandbox.paypal.com"
+    ),
+)
+PAYPAL_CURRENCY = "USD"
+PAYPAL_TIMEOUT = 10
+
+# Background jobs (manage.py run_jobs): how long a worker may hold a job
+# before another worker takes it over
+JOB_LEASE = timedelta(minutes=5)
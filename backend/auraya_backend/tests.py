@@ -0,0 +1,288 @@
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.db import connection, connections
+from django.test import TestCase, override_settings
+from rest_framework.test import APITestCase
+
+from orders.models import Order
+from orders.tests import SHIPPING
+from products.models import Category, Product
+
+from .metrics import registry
+from .queries import (
+    NPlusOneError,
+    QueryRecorder,
+    assert_no_n_plus_one,
+    check_queries,
+    fingerprint,
+    normalize_sql,
+)
+
+
+class FingerprintTests(TestCase):
+    def test_literals_and_placeholders_are_normalized(self):
+        self.assertEqual(
+            normalize_sql(
+                "SELECT * FROM t WHERE a = 'x''y' AND b = 12.5\n  AND c = %s"
+            ),
+            "SELECT * FROM t WHERE a = ? AND b = ? AND c = ?",
+        )
+        self.assertEqual(
+            fingerprint("SELECT * FROM t WHERE id IN (1, 2, 3)"),
+            fingerprint("SELECT * FROM t WHERE id IN (%s)"),
+        )
+
+    def test_recorder_reports_repeated_statements(self):
+        recorder = QueryRecorder()
+        with connection.execute_wrapper(recorder):
+            for pk in range(3):
+                list(User.objects.filter(pk=pk))
+            Product.objects.count()
+        self.assertEqual(recorder.count, 4)
+        key = fingerprint(str(User.objects.filter(pk=0).query))
+        self.assertEqual(recorder.duplicates(), {key: 3})
+
+
+class RequestMetricsTests(APITestCase):
+    def setUp(self):
+        cache.clear()
+        registry.reset()
+        category = Category.objects.create(name="Rings", slug="rings")
+        Product.objects.create(
+            name="Ring", slug="ring", price="10.00", category=category, stock=1
+        )
+
+    def test_server_timing_header(self):
+        response = self.client.get("/api/products/")
+        timing = response["Server-Timing"]
+        self.assertIn("total;dur=", timing)
+        self.assertIn('desc="product-list:list"', timing)
+        self.assertIn('desc="3 queries"', timing)
+        self.assertIn("serialize;dur=", timing)
+        self.assertIn(f'size;desc="{len(response.content)} bytes"', timing)
+        self.assertNotIn("dup;", timing)
+
+    def test_metrics_are_staff_only(self):
+        self.assertEqual(self.client.get("/api/_metrics/").status_code, 401)
+        self.client.force_authenticate(User.objects.create_user("customer"))
+        self.assertEqual(self.client.get("/api/_metrics/").status_code, 403)
+
+    def test_prometheus_exposition(self):
+        self.client.get("/api/products/")
+        self.client.get("/api/products/ring/")
+        self.client.force_authenticate(User.objects.create_user("staff", is_staff=True))
+        response = self.client.get("/api/_metrics/")
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(
+            response["Content-Type"].startswith("text/plain; version=0.0.4")
+        )
+        body = response.content.decode()
+        self.assertIn("# TYPE auraya_http_requests_total counter", body)
+        self.assertIn(
+            'auraya_http_requests_total{view="product-list",action="list",status="200"} 1',
+            body,
+        )
+        self.assertIn(
+            'auraya_db_queries_per_request_bucket{view="product-list",action="list",le="3"} 1',
+            body,
+        )
+        self.assertIn(
+            'auraya_response_size_bytes_count{view="product-detail",action="retrieve"} 1',
+            body,
+        )
+
+
+class NPlusOneTests(APITestCase):
+    def setUp(self):
+        cache.clear()
+        self.products = [
+            Product.objects.create(
+                name=f"Item {i}",
+                slug=f"item-{i}",
+                price="10.00",
+                category=Category.objects.create(name=f"C{i}", slug=f"c{i}"),
+                stock=10,
+            )
+            for i in range(4)
+        ]
+
+    def test_per_row_lookup_is_detected(self):
+        with self.assertRaises(NPlusOneError) as raised:
+            with assert_no_n_plus_one("category names"):
+                [product.category.name for product in Product.objects.all()]
+        (key, count, sql), *_ = raised.exception.findings
+        self.assertEqual(count, 4)
+        self.assertIn("products_category", sql)
+
+        with assert_no_n_plus_one("category names"):
+            [
+                product.category.name
+                for product in Product.objects.select_related("category")
+            ]
+
+    def test_product_list_has_no_per_row_queries(self):
+        with assert_no_n_plus_one("product list"):
+            response = self.client.get("/api/products/")
+        self.assertEqual(
+            {product["category_name"] for product in response.data["results"]},
+            {"C0", "C1", "C2", "C3"},
+        )
+
+    def test_order_create_has_no_per_item_queries(self):
+        self.client.force_authenticate(User.objects.create_user("jane"))
+        with assert_no_n_plus_one("order create"):
+            response = self.client.post(
+                "/api/orders/",
+                {
+                    "items": [
+                        {"product_id": product.pk, "quantity": 1}
+                        for product in self.products
+                    ],
+                    "shipping_name": "Jane",
+                    "shipping_email": "jane@example.com",
+                    "shipping_address": "1 Main St",
+                    "shipping_city": "Springfield",
+                    "shipping_state": "IL",
+                    "shipping_zip": "62701",
+                    "shipping_country": "US",
+                },
+                format="json",
+            )
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(Order.objects.get().items.count(), 4)
+
+    @override_settings(QUERY_SLOW_THRESHOLD=0, QUERY_N_PLUS_ONE_RAISE=False)
+    def test_findings_are_logged(self):
+        recorder = QueryRecorder(slow_threshold=0)
+        with connection.execute_wrapper(recorder):
+            [product.category.name for product in Product.objects.all()]
+        with self.assertLogs("auraya.queries", "WARNING") as logs:
+            findings = check_queries("GET /test", recorder)
+        self.assertEqual(len(findings), 1)
+        self.assertEqual(
+            sum("slow query in GET /test" in line for line in logs.output), 5
+        )
+        self.assertEqual(
+            sum("n+1 in GET /test: 4 x" in line for line in logs.output), 1
+        )
+
+    def test_requests_fail_under_test_runner(self):
+        with self.assertLogs("auraya.queries", "WARNING"):
+            with self.assertRaises(NPlusOneError):
+                check_queries("GET /test", self.recorded_n_plus_one())
+
+    def recorded_n_plus_one(self):
+        recorder = QueryRecorder()
+        with connection.execute_wrapper(recorder):
+            [product.category.name for product in Product.objects.all()]
+        return recorder
+
+
+class DatabaseProfileTests(TestCase):
+    def test_sqlite_connections_are_tuned(self):
+        with connection.cursor() as cursor:
+            cursor.execute("PRAGMA synchronous")
+            self.assertEqual(cursor.fetchone(), (1,))
+            cursor.execute("PRAGMA busy_timeout")
+            self.assertEqual(cursor.fetchone(), (5000,))
+
+    @override_settings(SQLITE_PRAGMAS={"cache_size": "-4096"})
+    def test_pragmas_apply_to_new_connections_unlogged(self):
+        new = connections.create_connection("default")
+        new.force_debug_cursor = True
+        try:
+            new.ensure_connection()
+            self.assertEqual(len(new.queries_log), 0)
+            self.assertEqual(
+                new.connection.execute("PRAGMA cache_size").fetchone(), (-4096,)
+            )
+        finally:
+            new.close()
+
+
+@override_settings(DATABASE_REPLICAS=["replica"])
+class ReplicaRoutingTests(APITestCase):
+    databases = {"default", "replica"}
+
+    def setUp(self):
+        cache.clear()
+        # The replica has yet to receive the primary's rows
+        for alias in ("default", "replica"):
+            category = Category.objects.using(alias).create(
+                name=f"{alias} rings", slug=f"{alias}-rings"
+            )
+            Product.objects.using(alias).create(
+                name=f"{alias} ring",
+                slug=f"{alias}-ring",
+                price="10.00",
+                category=category,
+                stock=5,
+            )
+        self.user = User.objects.create_user("buyer")
+        User.objects.using("replica").create(pk=self.user.pk, username="buyer")
+        Order.objects.using("replica").create(
+            pk=500, user_id=self.user.pk, total_amount=99, **SHIPPING
+        )
+
+    def product_names(self):
+        response = self.client.get("/api/products/")
+        return [product["name"] for product in response.data["results"]]
+
+    def test_catalog_reads_from_replica(self):
+        self.assertEqual(self.product_names(), ["replica ring"])
+        self.assertEqual(
+            self.client.get("/api/products/replica-ring/").status_code, 200
+        )
+        self.assertEqual(
+            self.client.get("/api/products/default-ring/").status_code, 404
+        )
+
+    def test_writer_reads_own_writes(self):
+        staff = User.objects.create_user("staff", is_staff=True)
+        self.client.force_authenticate(staff)
+        self.assertEqual(self.product_names(), ["replica ring"])
+        response = self.client.post(
+            "/api/categories/", {"name": "Bands", "slug": "bands"}
+        )
+        self.assertEqual(response.status_code, 201)
+        self.assertFalse(
+            Category.objects.using("replica").filter(slug="bands").exists()
+        )
+
+        slugs = [c["slug"] for c in self.client.get("/api/categories/").data["results"]]
+        self.assertIn("bands", slugs)
+        self.client.force_authenticate(None)
+        self.assertEqual(self.product_names(), ["replica ring"])
+
+    def test_catalog_changes_pin_the_catalog(self):
+        self.client.force_authenticate(User.objects.create_user("staff", is_staff=True))
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.patch("/api/products/default-ring/", {"stock": 4})
+        self.client.force_authenticate(None)
+        self.assertEqual(self.product_names(), ["default ring"])
+
+    def order_ids(self):
+        return [
+            order["id"] for order in self.client.get("/api/orders/").data["results"]
+        ]
+
+    def test_order_history_reads_own_writes(self):
+        self.client.force_authenticate(self.user)
+        self.assertEqual(self.order_ids(), [500])
+
+        product = Product.objects.get()
+        response = self.client.post(
+            "/api/orders/",
+            {"items": [{"product_id": product.pk, "quantity": 1}], **SHIPPING},
+            format="json",
+        )
+        self.assertEqual(response.status_code, 201)
+        order_id = response.data["id"]
+        self.assertEqual(self.order_ids(), [order_id])
+
+        # Once the pin expires, history comes from the replica again, while
+        # a single order is always read from the primary
+        cache.clear()
+        self.assertEqual(self.order_ids(), [500])
+        response = self.client.get(f"/api/orders/{order_id}/")
+        self.assertEqual(response.status_code, 200)
@@ -7,6 +7,8 @@ from rest_framework.routers import DefaultRouter
 from rest_framework_simplejwt.views import TokenObtainPairView, TokenRefreshView
 from products.views import CategoryViewSet, ProductViewSet
 from orders.views import OrderViewSet
+from analytics.views import AnalyticsViewSet
+from auraya_backend.views import MetricsView
 from users.views import RegisterView, CurrentUserView, AddressViewSet, UserProfileView
 
 router = DefaultRouter()
@@ -14,9 +16,11 @@ router.register(r"categories", CategoryViewSet)
 router.register(r"products", ProductViewSet)
 router.register(r"orders", OrderViewSet, basename="order")
 router.register(r"addresses", AddressViewSet, basename="address")
+router.register(r"analytics", AnalyticsViewSet, basename="analytics")
 
 urlpatterns = [
     path("admin/", admin.site.urls),
+    path("api/_metrics/", MetricsView.as_view(), name="metrics"),
     path("api/", include(router.urls)),
     path("api/auth/login/", TokenObtainPairView.as_view(), name="token_obtain_pair"),
     path("api/auth/refresh/", TokenRefreshView.as_view(), name="token_refresh"),
@@ -0,0 +1,17 @@
+"""
+URLs for the ASGI application: the async catalog read views ahead of the
+regular routes (see ``products.async_views``).
+"""
+
+from django.urls import path
+
+from products.async_views import category_list, product_detail, product_list
+
+from .urls import urlpatterns as sync_urlpatterns
+
+urlpatterns = [
+    path("api/products/", product_list, name="product-list"),
+    path("api/products/<slug:slug>/", product_detail, name="product-detail"),
+    path("api/categories/", category_list, name="category-list"),
+    *sync_urlpatterns,
+]
@@ -0,0 +1,14 @@
+from django.http import HttpResponse
+from rest_framework import permissions
+from rest_framework.views import APIView
+
+from .metrics import PROMETHEUS_CONTENT_TYPE, registry
+
+
+class MetricsView(APIView):
+    """Prometheus scrape target for the request metrics."""
+
+    permission_classes = [permissions.IsAdminUser]
+
+    def get(self, request):
+        return HttpResponse(registry.render(), content_type=PROMETHEUS_CONTENT_TYPE)
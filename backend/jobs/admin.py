@@ -0,0 +1,10 @@
+from django.contrib import admin
+from .models import Job
+
+
+@admin.register(Job)
+class JobAdmin(admin.ModelAdmin):
+    list_display = ["id", "name", "status", "attempts", "run_at", "finished_at"]
+    list_filter = ["status", "name"]
+    search_fields = ["idempotency_key"]
+    readonly_fields = ["created_at", "updated_at"]
@@ -0,0 +1,80 @@
+import multiprocessing
+import signal
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections, connections
+
+from jobs.queue import run_due_jobs, schedule_recurring, worker_id
+
+
+class Worker:
+    def __init__(self, interval, batch, burst):
+        self.interval = interval
+        self.batch = batch
+        self.burst = burst
+        self.stopping = False
+
+    def stop(self, *args):
+        # Finish the job at hand, then exit
+        self.stopping = True
+
+    def __call__(self):
+        signal.signal(signal.SIGTERM, self.stop)
+        signal.signal(signal.SIGINT, self.stop)
+        name = worker_id()
+        processed = 0
+        while not self.stopping:
+            close_old_connections()
+            ran = run_due_jobs(name, limit=self.batch)
+            processed += ran
+            if not ran:
+                if self.burst:
+                    break
+                time.sleep(self.interval)
+        connections.close_all()
+        return processed
+
+
+class Command(BaseCommand):
+    help = "Run queued jobs in one or more worker processes"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--processes", type=int, default=1)
+        parser.add_argument(
+            "--interval", type=float, default=1, help="Seconds between polls when idle"
+        )
+        parser.add_argument("--batch", type=int, default=10, help="Jobs per claim")
+        parser.add_argument(
+            "--burst", action="store_true", help="Exit once no job is due"
+        )
+
+    def handle(self, *args, **options):
+        schedule_recurring()
+        worker = Worker(options["interval"], options["batch"], options["burst"])
+        if options["processes"] == 1:
+            processed = worker()
+            self.stdout.write(self.style.SUCCESS(f"Processed {processed} jobs"))
+            return
+
+        # Children must not share the parent's database connections
+        connections.close_all()
+        context = multiprocessing.get_context("fork")
+        processes = [
+            context.Process(target=worker, daemon=True)
+            for _ in range(options["processes"])
+        ]
+        for process in processes:
+            process.start()
+
+        def forward(signum, frame):
+            for process in processes:
+                process.terminate()
+
+        signal.signal(signal.SIGTERM, forward)
+        signal.signal(signal.SIGINT, forward)
+        for process in processes:
+            process.join()
+        self.stdout.write(
+            self.style.SUCCESS(f"{len(processes)} worker processes stopped")
+        )
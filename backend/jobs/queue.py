@@ -0,0 +1,241 @@
+"""
+A job queue kept in the database.
+
+``enqueue`` inserts a ``Job`` row in the caller's transaction, so a job is
+queued exactly when the change that needs it commits. With an
+``idempotency_key``, enqueueing the same work again returns the job already
+queued for it instead of adding another; if that job has failed, it is
+queued again with a fresh set of attempts.
+
+Workers (``manage.py run_jobs``) claim due jobs with a conditional
+``UPDATE``, so each job runs on one worker at a time without the row locks
+SQLite lacks. A claim is a lease: a job whose worker died is claimed again
+once ``JOB_LEASE`` has passed, so job functions must be idempotent.
+
+A job that raises is retried with exponential backoff and jitter until it
+has run ``max_attempts`` times; raising ``PermanentFailure`` fails it at
+once.
+
+A job registered with ``every`` recurs: ``schedule_recurring`` (run by
+``run_jobs`` at startup) queues it under its name as idempotency key, and
+each time it finishes, succeeded or failed, the same row is queued again
+``every`` later.
+"""
+
+import logging
+import os
+import random
+import socket
+import traceback
+from datetime import timedelta
+
+from django.conf import settings
+from django.db.models import F, Q
+from django.utils import timezone
+
+from .models import Job
+
+logger = logging.getLogger("auraya.jobs")
+
+registry = {}
+
+
+class PermanentFailure(Exception):
+    """Raised by a job that retrying cannot help."""
+
+
+class JobSpec:
+    def __init__(self, name, func, max_attempts, backoff, max_backoff, every=None):
+        self.name = name
+        self.func = func
+        self.max_attempts = max_attempts
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.every = every
+
+    def get_delay(self, attempts):
+        """Seconds to wait before the attempt after ``attempts`` failed ones."""
+        delay = min(self.backoff * 2 ** (attempts - 1), self.max_backoff)
+        # Jitter keeps jobs that failed together from retrying together
+        return delay * random.uniform(0.5, 1)
+
+    def enqueue(self, idempotency_key=None, run_at=None, **payload):
+        return enqueue(
+            self.name, payload, idempotency_key=idempotency_key, run_at=run_at
+        )
+
+
+def job(name, max_attempts=5, backoff=10, max_backoff=3600, every=None):
+    """
+    Register the decorated function as job ``name``.
+
+    The function is called with the job's payload as keyword arguments and
+    may return anything JSON can store. The decorated name becomes a
+    ``JobSpec``, whose ``enqueue(**payload)`` queues a run. With ``every``
+    (a ``timedelta``) the job recurs at that interval, without a payload.
+    """
+
+    def register(func):
+        spec = JobSpec(name, func, max_attempts, backoff, max_backoff, every)
+        registry[name] = spec
+        return spec
+
+    return register
+
+
+def get_lease():
+    return getattr(settings, "JOB_LEASE", timedelta(minutes=5))
+
+
+def enqueue(name, payload=None, idempotency_key=None, run_at=None):
+    spec = registry[name]
+    fields = {
+        "name": name,
+        "payload": payload or {},
+        "max_attempts": spec.max_attempts,
+        "run_at": run_at or timezone.now(),
+    }
+    if idempotency_key is None:
+        return Job.objects.create(**fields)
+    queued, created = Job.objects.get_or_create(
+        idempotency_key=idempotency_key, defaults=fields
+    )
+    if not created and queued.status == "failed":
+        requeued = Job.objects.filter(pk=queued.pk, status="failed").update(
+            status="queued",
+            attempts=0,
+            max_attempts=spec.max_attempts,
+            run_at=fields["run_at"],
+            finished_at=None,
+            updated_at=timezone.now(),
+        )
+        if requeued:
+            queued.refresh_from_db()
+    return queued
+
+
+def schedule_recurring(now=None):
+    """Queue every recurring job that is not queued already."""
+    return [
+        enqueue(spec.name, idempotency_key=spec.name, run_at=now)
+        for spec in registry.values()
+        if spec.every
+    ]
+
+
+def worker_id():
+    return f"{socket.gethostname()}:{os.getpid()}"
+
+
+def claim(worker, limit=10, now=None):
+    """Lease up to ``limit`` due jobs to ``worker``, oldest first."""
+    now = now or timezone.now()
+    claimable = Q(status="queued", run_at__lte=now) | Q(
+        status="running", locked_until__lt=now
+    )
+    candidates = list(
+        Job.objects.filter(claimable)
+        .order_by("run_at", "pk")
+        .values_list("pk", flat=True)[:limit]
+    )
+    claimed = [
+        pk
+        for pk in candidates
+        # Another worker may have claimed it since the SELECT
+        if Job.objects.filter(claimable, pk=pk).update(
+            status="running",
+            locked_by=worker,
+            locked_until=now + get_lease(),
+            attempts=F("attempts") + 1,
+            updated_at=now,
+        )
+    ]
+    return list(Job.objects.filter(pk__in=claimed).order_by("run_at", "pk"))
+
+
+def finish(queued, worker, **fields):
+    # A worker that outlived its lease must not overwrite the new claim
+    return Job.objects.filter(pk=queued.pk, status="running", locked_by=worker).update(
+        locked_until=None, updated_at=timezone.now(), **fields
+    )
+
+
+def run(queued, worker):
+    spec = registry.get(queued.name)
+    if spec is None:
+        error = f"No job named {queued.name!r} is registered"
+    elif queued.attempts > queued.max_attempts:
+        # The worker died on the last attempt and the lease ran out
+        error = queued.last_error or "Lease expired on the last attempt"
+    else:
+        try:
+            # Jobs open their own transactions; one around an external call
+            # would hold the database for its whole duration
+            result = spec.func(**queued.payload)
+        except PermanentFailure as exc:
+            error = f"{exc.__class__.__name__}: {exc}"
+        except Exception as exc:
+            error = traceback.format_exc()
+            if queued.attempts < queued.max_attempts:
+                delay = spec.get_delay(queued.attempts)
+                logger.warning(
+                    "%s retrying in %.0fs (attempt %d/%d): %s",
+                    queued,
+                    delay,
+                    queued.attempts,
+                    queued.max_attempts,
+                    exc,
+                )
+                finish(
+                    queued,
+                    worker,
+                    status="queued",
+                    run_at=timezone.now() + timedelta(seconds=delay),
+                    last_error=error,
+                )
+                return False
+        else:
+            if spec.every:
+                finish(queued, worker, result=result, last_error="", **next_run(spec))
+            else:
+                finish(
+                    queued,
+                    worker,
+                    status="succeeded",
+                    result=result,
+                    finished_at=timezone.now(),
+                )
+            return True
+
+    logger.error("%s failed: %s", queued, error)
+    if spec is not None and spec.every:
+        finish(queued, worker, last_error=error, **next_run(spec))
+    else:
+        finish(
+            queued,
+            worker,
+            status="failed",
+            last_error=error,
+            finished_at=timezone.now(),
+        )
+    return False
+
+
+def next_run(spec):
+    # A recurring job's row is queued again rather than finished
+    now = timezone.now()
+    return {
+        "status": "queued",
+        "attempts": 0,
+        "run_at": now + spec.every,
+        "finished_at": now,
+    }
+
+
+def run_due_jobs(worker=None, limit=10, now=None):
+    """Claim and run one batch of due jobs; returns how many ran."""
+    worker = worker or worker_id()
+    jobs = claim(worker, limit, now)
+    for queued in jobs:
+        run(queued, worker)
+    return len(jobs)
@@ -0,0 +1,141 @@
+from datetime import timedelta
+
+from django.test import TestCase
+from django.utils import timezone
+
+from .models import Job
+from .queue import (
+    PermanentFailure,
+    claim,
+    enqueue,
+    job,
+    registry,
+    run_due_jobs,
+    schedule_recurring,
+)
+
+calls = []
+
+
+@job("tests.record", max_attempts=3, backoff=10)
+def record(value, fail=0, permanent=False):
+    calls.append(value)
+    if permanent:
+        raise PermanentFailure("bad value")
+    if len(calls) <= fail:
+        raise ValueError("try again")
+    return {"value": value}
+
+
+@job("tests.tick", max_attempts=1, every=timedelta(minutes=5))
+def tick():
+    calls.append("tick")
+    if len(calls) == 2:
+        raise ValueError("missed a tick")
+
+
+class JobQueueTests(TestCase):
+    def setUp(self):
+        calls.clear()
+
+    def test_job_runs_once(self):
+        queued = record.enqueue(value=1)
+        self.assertEqual(run_due_jobs(), 1)
+        self.assertEqual(run_due_jobs(), 0)
+        queued.refresh_from_db()
+        self.assertEqual(queued.status, "succeeded")
+        self.assertEqual(queued.result, {"value": 1})
+        self.assertEqual(calls, [1])
+
+    def test_idempotency_key_queues_once(self):
+        first = record.enqueue(value=1, idempotency_key="once")
+        second = record.enqueue(value=2, idempotency_key="once")
+        self.assertEqual(first.pk, second.pk)
+        self.assertEqual(Job.objects.count(), 1)
+
+    def test_future_job_waits(self):
+        run_at = timezone.now() + timedelta(minutes=1)
+        record.enqueue(value=1, run_at=run_at)
+        self.assertEqual(run_due_jobs(), 0)
+        self.assertEqual(run_due_jobs(now=run_at), 1)
+
+    def test_failures_back_off(self):
+        queued = record.enqueue(value=1, fail=1)
+        run_due_jobs()
+        queued.refresh_from_db()
+        self.assertEqual(queued.status, "queued")
+        self.assertIn("ValueError: try again", queued.last_error)
+        delay = (queued.run_at - queued.updated_at).total_seconds()
+        self.assertTrue(5 <= delay <= 10, delay)
+        self.assertTrue(20 <= record.get_delay(3) <= 40)
+        self.assertLessEqual(record.get_delay(20), record.max_backoff)
+
+        run_due_jobs(now=queued.run_at)
+        queued.refresh_from_db()
+        self.assertEqual(queued.status, "succeeded")
+        self.assertEqual(queued.attempts, 2)
+
+    def test_attempts_are_limited(self):
+        queued = record.enqueue(value=1, fail=10)
+        for _ in range(5):
+            run_due_jobs(now=timezone.now() + timedelta(hours=1))
+        queued.refresh_from_db()
+        self.assertEqual(queued.status, "failed")
+        self.assertEqual(queued.attempts, 3)
+        self.assertEqual(len(calls), 3)
+
+    def test_permanent_failure_is_not_retried(self):
+        queued = record.enqueue(value=1, permanent=True)
+        run_due_jobs()
+        queued.refresh_from_db()
+        self.assertEqual(queued.status, "failed")
+        self.assertEqual(queued.last_error, "PermanentFailure: bad value")
+        self.assertIsNotNone(queued.finished_at)
+
+    def test_failed_job_is_requeued_by_its_key(self):
+        queued = record.enqueue(value=1, fail=3, idempotency_key="retry")
+        for _ in range(3):
+            run_due_jobs(now=timezone.now() + timedelta(hours=1))
+        queued.refresh_from_db()
+        self.assertEqual(queued.status, "failed")
+
+        again = record.enqueue(value=1, fail=3, idempotency_key="retry")
+        self.assertEqual(again.pk, queued.pk)
+        self.assertEqual((again.status, again.attempts), ("queued", 0))
+        self.assertIsNone(again.finished_at)
+        self.assertEqual(run_due_jobs(), 1)
+        again.refresh_from_db()
+        self.assertEqual(again.status, "succeeded")
+
+    def test_expired_lease_is_reclaimed(self):
+        queued = record.enqueue(value=1)
+        self.assertEqual(len(claim("dead-worker")), 1)
+        self.assertEqual(claim("other-worker"), [])
+
+        later = timezone.now() + timedelta(hours=1)
+        self.assertEqual(run_due_jobs("other-worker", now=later), 1)
+        queued.refresh_from_db()
+        self.assertEqual(queued.status, "succeeded")
+        self.assertEqual(queued.attempts, 2)
+        self.assertEqual(queued.locked_by, "other-worker")
+
+    def test_unknown_job_fails(self):
+        enqueue("tests.record", {"value": 1})
+        Job.objects.update(name="tests.missing")
+        run_due_jobs()
+        self.assertEqual(Job.objects.get().status, "failed")
+        self.assertNotIn("tests.missing", registry)
+
+    def test_recurring_job_is_queued_again(self):
+        schedule_recurring()
+        schedule_recurring()
+        queued = Job.objects.get(name="tests.tick")
+        for _ in range(3):
+            run_due_jobs(now=queued.run_at)
+            queued.refresh_from_db()
+            # Queued again after a success and after a failure alike
+            self.assertEqual((queued.status, queued.attempts), ("queued", 0))
+            delay = queued.run_at - queued.finished_at
+            self.assertEqual(delay, timedelta(minutes=5))
+        self.assertEqual(calls, ["tick"] * 3)
+        self.assertEqual(Job.objects.filter(name="tests.tick").count(), 1)
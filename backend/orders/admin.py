@@ -1,5 +1,6 @@
 from django.contrib import admin
-from .models import Order, OrderItem
+from analytics import rollups
+from .models import Order, OrderItem, StockReservation
 
 
 class OrderItemInline(admin.TabularInline):
@@ -13,3 +14,22 @@ class OrderAdmin(admin.ModelAdmin):
     list_filter = ["status", "paid"]
     search_fields = ["user__username", "user__email"]
     inlines = [OrderItemInline]
+
+    def save_model(self, request, obj, form, change):
+        obj.state_before_edit = None
+        if change:
+            obj.state_before_edit = rollups.OrderState(
+                *Order.objects.values_list("status", "paid", "paid_at").get(pk=obj.pk)
+            )
+        super().save_model(request, obj, form, change)
+
+    def save_related(self, request, form, formsets, change):
+        # After the inlines, so a new order counts with its items
+        super().save_related(request, form, formsets, change)
+        rollups.record_order(form.instance, form.instance.state_before_edit)
+
+
+@admin.register(StockReservation)
+class StockReservationAdmin(admin.ModelAdmin):
+    list_display = ["order", "product", "quantity", "status", "expires_at"]
+    list_filter = ["status"]
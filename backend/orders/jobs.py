@@ -0,0 +1,100 @@
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+
+from analytics import rollups
+from jobs.queue import PermanentFailure, job
+from . import reservations
+from .models import Order
+from .paypal import PayPalClient, PayPalError, captured_amount
+
+# PayPal orders the payer has not approved yet
+AWAITING_PAYER = ("CREATED", "SAVED", "PAYER_ACTION_REQUIRED")
+
+
+class AwaitingPayer(Exception):
+    pass
+
+
+@job("orders.verify_payment", max_attempts=8, backoff=15)
+def verify_payment(order_id, paypal_order_id):
+    """
+    Check ``paypal_order_id`` with PayPal, capturing it if it is only
+    approved, and move the order from pending to processing once the full
+    amount has been captured.
+    """
+    try:
+        order = Order.objects.get(pk=order_id)
+    except Order.DoesNotExist:
+        raise PermanentFailure(f"Order {order_id} does not exist")
+    if order.paid:
+        return {"order": order.pk, "status": order.status}
+    if order.paypal_order_id != paypal_order_id:
+        # The customer paid again with another PayPal order; its job decides
+        return {"order": order.pk, "superseded_by": order.paypal_order_id}
+    if order.status != "pending":
+        raise PermanentFailure(f"Order {order.pk} is {order.status}")
+
+    client = PayPalClient()
+    try:
+        paypal_order = client.get_order(paypal_order_id)
+        if paypal_order["status"] == "APPROVED":
+            paypal_order = client.capture_order(
+                paypal_order_id, request_id=f"auraya-order-{order.pk}-capture"
+            )
+    except PayPalError as exc:
+        if exc.retryable:
+            raise
+        raise PermanentFailure(str(exc))
+
+    if paypal_order["status"] in AWAITING_PAYER:
+        raise AwaitingPayer(
+            f"PayPal order {paypal_order_id} is {paypal_order['status']}"
+        )
+    if paypal_order["status"] != "COMPLETED":
+        raise PermanentFailure(
+            f"PayPal order {paypal_order_id} is {paypal_order['status']}"
+        )
+    amount, currency = captured_amount(paypal_order)
+    if amount != order.total_amount or currency != settings.PAYPAL_CURRENCY:
+        raise PermanentFailure(
+            f"Captured {amount} {currency}, order {order.pk} is for "
+            f"{order.total_amount} {settings.PAYPAL_CURRENCY}"
+        )
+
+    now = timezone.now()
+    with transaction.atomic():
+        updated = Order.objects.filter(
+            pk=order.pk, paid=False, status="pending"
+        ).update(paid=True, paid_at=now, status="processing", updated_at=now)
+        if updated:
+            reservations.commit(order)
+            before = rollups.order_state(order)
+            order.paid, order.paid_at, order.status = True, now, "processing"
+            rollups.record_order(order, before)
+    if not updated:
+        order.refresh_from_db()
+        if order.paid:
+            # Another run of this job got there first
+            return {"order": order.pk, "status": order.status}
+        # Cancelled (or expired) while PayPal captured; the money is taken
+        # but the stock is gone, so staff must refund or reinstate it
+        raise PermanentFailure(
+            f"Captured {amount} {currency} for PayPal order {paypal_order_id}, "
+            f"but order {order.pk} became {order.status}; refund needed"
+        )
+    return {"order": order.pk, "status": "processing", "captured": str(amount)}
+
+
+@job(
+    "orders.release_expired_reservations",
+    every=getattr(settings, "STOCK_RESERVATION_SWEEP_INTERVAL", timedelta(minutes=1)),
+)
+def release_expired_reservations():
+    """
+    Put the stock of expired holds back on sale. Nothing else does unless
+    a checkout runs short of that very product.
+    """
+    return {"orders": reservations.release_expired()}
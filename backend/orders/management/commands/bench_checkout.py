@@ -0,0 +1,75 @@
+import statistics
+import time
+from types import SimpleNamespace
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.test.utils import CaptureQueriesContext
+
+from orders.serializers import OrderCreateSerializer
+from products.models import Category, Product
+
+
+class Command(BaseCommand):
+    help = "Measure queries and latency of order creation as the cart grows"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--sizes", type=int, nargs="+", default=[1, 5, 10, 30, 100]
+        )
+        parser.add_argument("--repeat", type=int, default=20)
+
+    def handle(self, *args, **options):
+        sizes = options["sizes"]
+
+        # Everything runs in a transaction that is rolled back at the end
+        with transaction.atomic():
+            user = User.objects.create_user("bench-checkout")
+            category = Category.objects.create(
+                name="Bench", slug="bench-checkout"
+            )
+            products = Product.objects.bulk_create(
+                Product(
+                    name=f"Bench product {i}",
+                    slug=f"bench-checkout-{i}",
+                    description="",
+                    price=10,
+                    category=category,
+                    stock=1_000_000,
+                )
+                for i in range(max(sizes))
+            )
+            request = SimpleNamespace(user=user)
+
+            self.stdout.write(f"{'items':>6} {'queries':>8} {'p50 ms':>8} {'max ms':>8}")
+            for size in sizes:
+                data = {
+                    "items": [
+                        {"product_id": product.id, "quantity": 1}
+                        for product in products[:size]
+                    ],
+                    "shipping_name": "Bench",
+                    "shipping_email": "bench@example.com",
+                    "shipping_address": "1 Bench St",
+                    "shipping_city": "Bench",
+                    "shipping_state": "BS",
+                    "shipping_zip": "00000",
+                    "shipping_country": "US",
+                }
+                timings = []
+                for _ in range(options["repeat"]):
+                    serializer = OrderCreateSerializer(
+                        data=data, context={"request": request}
+                    )
+                    serializer.is_valid(raise_exception=True)
+                    with CaptureQueriesContext(connection) as queries:
+                        start = time.perf_counter()
+                        serializer.save()
+                        timings.append((time.perf_counter() - start) * 1000)
+                self.stdout.write(
+                    f"{size:>6} {len(queries):>8} "
+                    f"{statistics.median(timings):>8.2f} {max(timings):>8.2f}"
+                )
+
+            transaction.set_rollback(True)
@@ -0,0 +1,13 @@
+from django.core.management.base import BaseCommand
+
+from orders.reservations import release_expired
+
+
+class Command(BaseCommand):
+    help = "Return expired stock reservations to stock and cancel their unpaid orders"
+
+    def handle(self, *args, **kwargs):
+        count = release_expired()
+        self.stdout.write(
+            self.style.SUCCESS(f"Released reservations for {count} expired orders")
+        )
@@ -0,0 +1,42 @@
+# Generated by Django 5.0.14 on 2026-10-18 01:32
+
+from django.db import migrations, models
+from django.db.models import OuterRef, Subquery
+
+
+def backfill_product_snapshot(apps, schema_editor):
+    OrderItem = apps.get_model("orders", "OrderItem")
+    Product = apps.get_model("products", "Product")
+    product = Product.objects.filter(pk=OuterRef("product_id"))
+    OrderItem.objects.filter(product__isnull=False).update(
+        product_name=Subquery(product.values("name")[:1]),
+        product_slug=Subquery(product.values("slug")[:1]),
+        product_image=Subquery(product.values("image")[:1]),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("orders", "0003_order_order_user_created_idx_order_order_created_idx"),
+        ("products", "0004_catalog_filter_indexes"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="orderitem",
+            name="product_image",
+            field=models.ImageField(blank=True, null=True, upload_to="products/"),
+        ),
+        migrations.AddField(
+            model_name="orderitem",
+            name="product_name",
+            field=models.CharField(blank=True, max_length=200),
+        ),
+        migrations.AddField(
+            model_name="orderitem",
+            name="product_slug",
+            field=models.SlugField(blank=True, db_index=False, max_length=200),
+        ),
+        migrations.RunPython(backfill_product_snapshot, migrations.RunPython.noop),
+    ]
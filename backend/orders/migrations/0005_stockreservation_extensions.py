@@ -0,0 +1,18 @@
+# Generated by Django 5.0.14 on 2026-10-18 02:51
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("orders", "0004_orderitem_product_snapshot"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="stockreservation",
+            name="extensions",
+            field=models.PositiveIntegerField(default=0),
+        ),
+    ]
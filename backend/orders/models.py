@@ -37,6 +37,13 @@ class Order(models.Model):
 
     class Meta:
         ordering = ["-created_at"]
+        indexes = [
+            # Keyset pagination of a customer's orders and of all orders
+            models.Index(
+                fields=["user", "created_at", "id"], name="order_user_created_idx"
+            ),
+            models.Index(fields=["created_at", "id"], name="order_created_idx"),
+        ]
 
     def __str__(self):
         return f"Order #{self.id} by {self.user.username}"
@@ -48,9 +55,49 @@ class OrderItem(models.Model):
     quantity = models.IntegerField(default=1)
     price = models.DecimalField(max_digits=10, decimal_places=2)
 
+    # Snapshot of the product at purchase time, so order history renders
+    # without the catalog and survives product edits and deletion
+    product_name = models.CharField(max_length=200, blank=True)
+    product_slug = models.SlugField(max_length=200, blank=True, db_index=False)
+    product_image = models.ImageField(upload_to="products/", blank=True, null=True)
+
     def __str__(self):
-        return f"{self.quantity}x {self.product.name if self.product else 'Deleted Product'}"
+        return f"{self.quantity}x {self.product_name or 'Deleted Product'}"
+
+    def snapshot_product(self, product):
+        self.product = product
+        self.product_name = product.name
+        self.product_slug = product.slug
+        self.product_image = product.image
 
     @property
     def subtotal(self):
         return self.quantity * self.price
+
+
+class StockReservation(models.Model):
+    STATUS_CHOICES = [
+        ("held", "Held"),
+        ("committed", "Committed"),
+        ("released", "Released"),
+    ]
+
+    order = models.ForeignKey(
+        Order, on_delete=models.CASCADE, related_name="reservations"
+    )
+    product = models.ForeignKey(
+        Product, on_delete=models.CASCADE, related_name="reservations"
+    )
+    quantity = models.IntegerField()
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default="held")
+    expires_at = models.DateTimeField()
+    # Times the hold was renewed by payment confirmations
+    extensions = models.PositiveIntegerField(default=0)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        indexes = [models.Index(fields=["status", "expires_at"])]
+
+    def __str__(self):
+        return f"{self.quantity}x {self.product} for order #{self.order_id} ({self.status})"
@@ -0,0 +1,114 @@
+"""
+Minimal client for the PayPal REST API (Orders v2).
+
+The checkout page creates and approves the PayPal order in the browser;
+the server only needs to read it back, capture it when it is approved and
+check what was paid. ``paypalrestsdk`` only speaks the v1 Payments API, so
+these calls go straight to the REST endpoints.
+"""
+
+import base64
+import json
+import urllib.error
+import urllib.parse
+import urllib.request
+from decimal import Decimal
+
+from django.conf import settings
+from django.core.cache import cache
+
+TOKEN_CACHE_KEY = "paypal:access-token"
+
+
+class PayPalError(Exception):
+    def __init__(self, message, status=None, retryable=True):
+        super().__init__(message)
+        self.status = status
+        self.retryable = retryable
+
+
+class PayPalClient:
+    def __init__(self, base_url=None, client_id=None, client_secret=None, timeout=None):
+        self.base_url = (base_url or settings.PAYPAL_API_BASE).rstrip("/")
+        self.client_id = client_id or settings.PAYPAL_CLIENT_ID
+        self.client_secret = client_secret or settings.PAYPAL_CLIENT_SECRET
+        self.timeout = timeout or settings.PAYPAL_TIMEOUT
+
+    def send(self, method, path, body=None, headers=None):
+        request = urllib.request.Request(
+            self.base_url + path, data=body, method=method, headers=headers or {}
+        )
+        try:
+            with urllib.request.urlopen(request, timeout=self.timeout) as response:
+                return json.loads(response.read() or b"{}")
+        except urllib.error.HTTPError as exc:
+            detail = exc.read()[:500].decode(errors="replace")
+            if exc.code == 401:
+                cache.delete(TOKEN_CACHE_KEY)
+            # Rate limits, server errors and expired tokens pass with time
+            retryable = exc.code in (401, 408, 429) or exc.code >= 500
+            raise PayPalError(
+                f"{method} {path}: HTTP {exc.code} {detail}",
+                status=exc.code,
+                retryable=retryable,
+            )
+        except (urllib.error.URLError, TimeoutError, OSError) as exc:
+            raise PayPalError(f"{method} {path}: {exc}")
+
+    def get_access_token(self):
+        token = cache.get(TOKEN_CACHE_KEY)
+        if token:
+            return token
+        credentials = base64.b64encode(
+            f"{self.client_id}:{self.client_secret}".encode()
+        ).decode()
+        data = self.send(
+            "POST",
+            "/v1/oauth2/token",
+            body=urllib.parse.urlencode({"grant_type": "client_credentials"}).encode(),
+            headers={
+                "Authorization": f"Basic {credentials}",
+                "Content-Type": "application/x-www-form-urlencoded",
+            },
+        )
+        token = data["access_token"]
+        cache.set(TOKEN_CACHE_KEY, token, max(int(data.get("expires_in", 0)) - 60, 0))
+        return token
+
+    def call(self, method, path, payload=None, headers=None):
+        headers = {
+            "Authorization": f"Bearer {self.get_access_token()}",
+            "Content-Type": "application/json",
+            **(headers or {}),
+        }
+        body = json.dumps(payload).encode() if payload is not None else None
+        return self.send(method, path, body=body, headers=headers)
+
+    def get_order(self, order_id):
+        return self.call(
+            "GET", f"/v2/checkout/orders/{urllib.parse.quote(order_id, safe='')}"
+        )
+
+    def capture_order(self, order_id, request_id):
+        """
+        Capture an approved order. PayPal answers a repeated ``request_id``
+        with the first capture instead of charging again.
+        """
+        return self.call(
+            "POST",
+            f"/v2/checkout/orders/{urllib.parse.quote(order_id, safe='')}/capture",
+            payload={},
+            headers={"PayPal-Request-Id": request_id},
+        )
+
+
+def captured_amount(paypal_order):
+    """Total of the order's completed captures as ``(amount, currency)``."""
+    amount, currencies = Decimal("0"), set()
+    for unit in paypal_order.get("purchase_units", []):
+        for capture in unit.get("payments", {}).get("captures", []):
+            if capture.get("status") == "COMPLETED":
+                amount += Decimal(capture["amount"]["value"])
+                currencies.add(capture["amount"]["currency_code"])
+    currency = currencies.pop() if len(currencies) == 1 else None
+    return amount, currency
@@ -0,0 +1,216 @@
+"""
+Stock reservations for checkout.
+
+Placing an order takes its units out of ``Product.stock`` straight away and
+records them as held reservations. Payment confirmation commits them;
+cancelling the order or letting the hold expire puts the units back.
+
+Stock is only ever changed with conditional ``F()`` updates
+(``... SET stock = stock - n WHERE stock >= n``), so the database refuses
+to oversell no matter how many checkouts race for the same product.
+"""
+
+from collections import Counter
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Case, F, Q, When
+from django.utils import timezone
+
+from analytics import rollups
+from products.cache import bump_generation_on_commit
+from products.models import Product
+from .models import Order, StockReservation
+
+
+def get_reservation_ttl():
+    return getattr(settings, "STOCK_RESERVATION_TTL", timedelta(minutes=30))
+
+
+def get_max_extensions():
+    return getattr(settings, "STOCK_RESERVATION_MAX_EXTENSIONS", 3)
+
+
+class InsufficientStock(Exception):
+    def __init__(self, product_ids):
+        self.product_ids = sorted(product_ids)
+        super().__init__(f"Insufficient stock for products {self.product_ids}")
+
+
+def _take_stock(quantities):
+    """
+    Decrement stock for every product in one conditional UPDATE.
+
+    Returns ``None`` on success. Otherwise nothing is decremented and the ids
+    of the products that could not cover their quantity are returned.
+    """
+    condition = Q()
+    for product_id, quantity in quantities.items():
+        condition |= Q(pk=product_id, stock__gte=quantity)
+
+    with transaction.atomic():
+        updated = Product.objects.filter(condition).update(
+            stock=Case(
+                *[
+                    When(pk=product_id, then=F("stock") - quantity)
+                    for product_id, quantity in quantities.items()
+                ],
+                default=F("stock"),
+            ),
+            # Moves the product's Last-Modified
+            updated_at=timezone.now(),
+        )
+        if updated == len(quantities):
+            # A queryset update sends no signals
+            bump_generation_on_commit("product")
+            return None
+        # Undo the rows that did have enough stock
+        transaction.set_rollback(True)
+
+    available = dict(
+        Product.objects.filter(pk__in=quantities).values_list("pk", "stock")
+    )
+    short = [
+        product_id
+        for product_id, quantity in quantities.items()
+        if available.get(product_id, 0) < quantity
+    ]
+    # Stock may have come back since the update; report the whole cart then
+    return short or list(quantities)
+
+
+def reserve(order, items):
+    """
+    Hold stock for ``items`` (``(product_id, quantity)`` pairs) on ``order``.
+
+    Raises ``InsufficientStock`` if any product cannot cover its quantity, in
+    which case no stock is taken.
+    """
+    quantities = Counter()
+    for product_id, quantity in items:
+        quantities[product_id] += quantity
+
+    short = _take_stock(quantities)
+    if short and release_expired(product_ids=short):
+        # Expired holds were blocking the order; try again with that stock back
+        short = _take_stock(quantities)
+    if short:
+        raise InsufficientStock(short)
+
+    expires_at = timezone.now() + get_reservation_ttl()
+    return StockReservation.objects.bulk_create(
+        StockReservation(
+            order=order, product_id=product_id, quantity=quantity, expires_at=expires_at
+        )
+        for product_id, quantity in quantities.items()
+    )
+
+
+def commit(order):
+    """Make the order's held reservations permanent once it has been paid."""
+    return order.reservations.filter(status="held").update(
+        status="committed", updated_at=timezone.now()
+    )
+
+
+def extend(order):
+    """
+    Hold the order's reservations for another full TTL from now, at most
+    ``STOCK_RESERVATION_MAX_EXTENSIONS`` times, so repeated confirmations
+    cannot keep stock off sale indefinitely.
+    """
+    return order.reservations.filter(
+        status="held", extensions__lt=get_max_extensions()
+    ).update(
+        expires_at=timezone.now() + get_reservation_ttl(),
+        extensions=F("extensions") + 1,
+        updated_at=timezone.now(),
+    )
+
+
+def _claim(queryset, **changes):
+    """
+    Apply ``changes`` to the rows of ``queryset`` with one conditional
+    UPDATE and return exactly the rows this call changed, as they were.
+
+    If a concurrent writer took some of the rows between the read and the
+    update, the update is rolled back and retried on what still matches, so
+    two callers never both claim a row.
+    """
+    while True:
+        with transaction.atomic():
+            rows = list(queryset.select_for_update())
+            if not rows:
+                return rows
+            updated = queryset.filter(pk__in=[row.pk for row in rows]).update(**changes)
+            if updated == len(rows):
+                return rows
+            transaction.set_rollback(True)
+
+
+def _restock(reservations):
+    """Return the units of ``reservations`` to stock in one UPDATE."""
+    quantities = Counter()
+    for reservation in reservations:
+        quantities[reservation.product_id] += reservation.quantity
+    if quantities:
+        Product.objects.filter(pk__in=quantities).update(
+            stock=Case(
+                *[
+                    When(pk=product_id, then=F("stock") + quantity)
+                    for product_id, quantity in quantities.items()
+                ],
+                default=F("stock"),
+            ),
+            updated_at=timezone.now(),
+        )
+        bump_generation_on_commit("product")
+
+
+def _release(reservations):
+    with transaction.atomic():
+        released = _claim(reservations, status="released", updated_at=timezone.now())
+        _restock(released)
+    return len(released)
+
+
+def release(order, statuses=("held",)):
+    """
+    Return the order's reservations in ``statuses`` to stock.
+
+    The reservations are claimed before they are restocked, so releasing the
+    same order twice (say a cancel racing the expiry sweep) restocks once.
+    """
+    return _release(order.reservations.filter(status__in=statuses))
+
+
+def release_expired(now=None, product_ids=None):
+    """
+    Release held reservations past their expiry and cancel their unpaid orders.
+
+    Returns the number of orders affected.
+    """
+    expired = StockReservation.objects.filter(
+        status="held", expires_at__lte=now or timezone.now()
+    )
+    if product_ids is not None:
+        expired = expired.filter(product_id__in=product_ids)
+
+    order_ids = set(expired.values_list("order_id", flat=True))
+    if not order_ids:
+        return 0
+    with transaction.atomic():
+        _release(StockReservation.objects.filter(order__in=order_ids, status="held"))
+        cancelled = _claim(
+            Order.objects.filter(pk__in=order_ids, paid=False, status="pending"),
+            status="cancelled",
+            updated_at=timezone.now(),
+        )
+        changes = []
+        for order in cancelled:
+            before = rollups.order_state(order)
+            order.status = "cancelled"
+            changes.append((order, before))
+        rollups.record_orders(changes)
+    return len(order_ids)
@@ -1,11 +1,26 @@
 # orders/serializers.py
+from django.db import transaction
 from rest_framework import serializers
+from analytics import rollups
 from .models import Order, OrderItem
-from products.serializers import ProductSerializer
+from . import reservations
+
+
+class OrderItemProductSerializer(serializers.ModelSerializer):
+    """The product as it was when the order was placed."""
+
+    id = serializers.IntegerField(source="product_id", read_only=True)
+    name = serializers.CharField(source="product_name", read_only=True)
+    slug = serializers.CharField(source="product_slug", read_only=True)
+    image = serializers.ImageField(source="product_image", read_only=True)
+
+    class Meta:
+        model = OrderItem
+        fields = ["id", "name", "slug", "image"]
 
 
 class OrderItemSerializer(serializers.ModelSerializer):
-    product_detail = ProductSerializer(source="product", read_only=True)
+    product_detail = OrderItemProductSerializer(source="*", read_only=True)
     subtotal = serializers.ReadOnlyField()
 
     class Meta:
@@ -56,30 +71,75 @@ class OrderCreateSerializer(serializers.Serializer):
     shipping_country = serializers.CharField(max_length=100)
     paypal_order_id = serializers.CharField(max_length=200, required=False)
 
+    def validate_items(self, items):
+        if not items:
+            raise serializers.ValidationError("At least one item is required.")
+        for item in items:
+            if "product_id" not in item or "quantity" not in item:
+                raise serializers.ValidationError(
+                    "Each item needs a product_id and a quantity."
+                )
+            if item["quantity"] < 1:
+                raise serializers.ValidationError("Quantity must be at least 1.")
+        return items
+
     def create(self, validated_data):
         items_data = validated_data.pop("items")
         user = self.context["request"].user
 
-        # Calculate total
         from products.models import Product
 
-        total = 0
-        order_items = []
+        with transaction.atomic():
+            # One query for every product in the cart
+            products = Product.objects.in_bulk(
+                {item["product_id"] for item in items_data}
+            )
+            missing = sorted(
+                {item["product_id"] for item in items_data} - products.keys()
+            )
+            if missing:
+                raise serializers.ValidationError(
+                    {"items": [f"Product {pk} does not exist." for pk in missing]}
+                )
+
+            # Calculate total
+            total = 0
+            order_items = []
+
+            for item in items_data:
+                product = products[item["product_id"]]
+                quantity = item["quantity"]
+                price = product.price
+                total += price * quantity
+                order_item = OrderItem(quantity=quantity, price=price)
+                order_item.snapshot_product(product)
+                order_items.append(order_item)
 
-        for item in items_data:
-            product = Product.objects.get(id=item["product_id"])
-            quantity = item["quantity"]
-            price = product.price
-            total += price * quantity
-            order_items.append(
-                {"product": product, "quantity": quantity, "price": price}
+            # Create order
+            order = Order.objects.create(
+                user=user, total_amount=total, **validated_data
             )
 
-        # Create order
-        order = Order.objects.create(user=user, total_amount=total, **validated_data)
+            # Create order items
+            for order_item in order_items:
+                order_item.order = order
+            OrderItem.objects.bulk_create(order_items)
+
+            # Hold the stock until payment; fails the whole order if short
+            try:
+                reservations.reserve(
+                    order, [(item.product.id, item.quantity) for item in order_items]
+                )
+            except reservations.InsufficientStock as exc:
+                raise serializers.ValidationError(
+                    {
+                        "items": [
+                            f"Not enough stock for product {pk}."
+                            for pk in exc.product_ids
+                        ]
+                    }
+                )
 
-        # Create order items
-        for item in order_items:
-            OrderItem.objects.create(order=order, **item)
+            rollups.record_order(order)
 
         return order
@@ -1,3 +1,601 @@
-from django.test import TestCase
+import json
+import threading
+from datetime import timedelta
+from decimal import Decimal
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from types import SimpleNamespace
+from unittest import mock
 
-# Create your tests here.
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.db import OperationalError, connection, transaction
+from django.test import TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework.test import APITestCase
+
+from analytics.models import ProductSales
+from jobs.models import Job
+from jobs.queue import run_due_jobs, schedule_recurring
+from products.models import Category, Product
+from .models import Order, OrderItem, StockReservation
+from .paypal import PayPalClient
+from . import reservations
+from .serializers import OrderCreateSerializer
+
+
+SHIPPING = {
+    "shipping_name": "Jane Doe",
+    "shipping_email": "jane@example.com",
+    "shipping_address": "1 Main St",
+    "shipping_city": "Springfield",
+    "shipping_state": "IL",
+    "shipping_zip": "62701",
+    "shipping_country": "US",
+}
+
+
+class PayPalStub(ThreadingHTTPServer):
+    """
+    Just enough of the PayPal Orders v2 API, served from a thread.
+
+    ``orders`` maps a PayPal order id to its status and amount; capturing an
+    approved order completes it, and a repeated ``PayPal-Request-Id`` gets
+    the first capture back. ``fail_next`` answers that many requests with 503.
+    """
+
+    class Handler(BaseHTTPRequestHandler):
+        def log_message(self, *args):
+            pass
+
+        def reply(self, status, data):
+            body = json.dumps(data).encode()
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def handle_request(self, method):
+            stub = self.server
+            self.rfile.read(int(self.headers.get("Content-Length") or 0))
+            stub.requests.append((method, self.path))
+            if stub.fail_next:
+                stub.fail_next -= 1
+                return self.reply(503, {"name": "SERVICE_UNAVAILABLE"})
+            if self.path == "/v1/oauth2/token":
+                return self.reply(200, {"access_token": "token", "expires_in": 3600})
+            if self.headers.get("Authorization") != "Bearer token":
+                return self.reply(401, {"error": "invalid_token"})
+            parts = self.path.split("/")
+            paypal_order = stub.orders.get(parts[4]) if len(parts) > 4 else None
+            if paypal_order is None:
+                return self.reply(404, {"name": "RESOURCE_NOT_FOUND"})
+            if method == "POST" and parts[5:] == ["capture"]:
+                request_id = self.headers["PayPal-Request-Id"]
+                if request_id not in stub.captures:
+                    if paypal_order["status"] != "APPROVED":
+                        return self.reply(422, {"name": "UNPROCESSABLE_ENTITY"})
+                    paypal_order["status"] = "COMPLETED"
+                    stub.captures[request_id] = stub.render(parts[4])
+                return self.reply(201, stub.captures[request_id])
+            return self.reply(200, stub.render(parts[4]))
+
+        def do_GET(self):
+            self.handle_request("GET")
+
+        def do_POST(self):
+            self.handle_request("POST")
+
+    def __init__(self):
+        super().__init__(("127.0.0.1", 0), self.Handler)
+        self.orders = {}
+        self.captures = {}
+        self.requests = []
+        self.fail_next = 0
+
+    @property
+    def url(self):
+        return f"http://127.0.0.1:{self.server_address[1]}"
+
+    def add_order(self, paypal_order_id, amount, status="APPROVED", currency="USD"):
+        self.orders[paypal_order_id] = {
+            "status": status,
+            "amount": str(amount),
+            "currency": currency,
+        }
+
+    def render(self, paypal_order_id):
+        paypal_order = self.orders[paypal_order_id]
+        amount = {
+            "currency_code": paypal_order["currency"],
+            "value": paypal_order["amount"],
+        }
+        unit = {"amount": amount}
+        if paypal_order["status"] == "COMPLETED":
+            unit["payments"] = {"captures": [{"status": "COMPLETED", "amount": amount}]}
+        return {
+            "id": paypal_order_id,
+            "status": paypal_order["status"],
+            "purchase_units": [unit],
+        }
+
+    def __enter__(self):
+        threading.Thread(target=self.serve_forever, daemon=True).start()
+        return self
+
+    def __exit__(self, *args):
+        self.shutdown()
+        self.server_close()
+
+
+class OrderCreateTests(APITestCase):
+    def setUp(self):
+        self.user = User.objects.create_user("buyer", password="pw")
+        self.client.force_authenticate(self.user)
+        category = Category.objects.create(name="Rings", slug="rings")
+        self.products = [
+            Product.objects.create(
+                name=f"Ring {i}",
+                slug=f"ring-{i}",
+                description="",
+                price=Decimal("10.00") + i,
+                category=category,
+                stock=100,
+            )
+            for i in range(30)
+        ]
+
+    def order_data(self, products, quantity=1):
+        return {
+            "items": [
+                {"product_id": product.id, "quantity": quantity}
+                for product in products
+            ],
+            **SHIPPING,
+        }
+
+    def test_create_order(self):
+        response = self.client.post(
+            "/api/orders/", self.order_data(self.products[:3], quantity=2), format="json"
+        )
+        self.assertEqual(response.status_code, 201)
+        order = Order.objects.get()
+        self.assertEqual(order.user, self.user)
+        self.assertEqual(order.total_amount, Decimal("66.00"))
+        self.assertEqual(order.items.count(), 3)
+
+    def test_query_count_is_independent_of_cart_size(self):
+        request = SimpleNamespace(user=self.user)
+        counts = []
+        for size in (1, 10, 30):
+            serializer = OrderCreateSerializer(
+                data=self.order_data(self.products[:size]),
+                context={"request": request},
+            )
+            serializer.is_valid(raise_exception=True)
+            with CaptureQueriesContext(connection) as queries:
+                serializer.save()
+            counts.append(len(queries))
+        self.assertEqual(counts, [counts[0]] * 3)
+        self.assertEqual(OrderItem.objects.count(), 41)
+
+    def test_unknown_product_writes_nothing(self):
+        data = self.order_data(self.products[:2])
+        data["items"].append({"product_id": 999999, "quantity": 1})
+        response = self.client.post("/api/orders/", data, format="json")
+        self.assertEqual(response.status_code, 400)
+        self.assertFalse(Order.objects.exists())
+        self.assertFalse(OrderItem.objects.exists())
+
+    def test_rejects_empty_cart_and_bad_quantity(self):
+        response = self.client.post("/api/orders/", self.order_data([]), format="json")
+        self.assertEqual(response.status_code, 400)
+        response = self.client.post(
+            "/api/orders/", self.order_data(self.products[:1], quantity=0), format="json"
+        )
+        self.assertEqual(response.status_code, 400)
+
+    def test_order_history_reads_only_order_tables(self):
+        for _ in range(3):
+            self.client.post(
+                "/api/orders/", self.order_data(self.products[:5]), format="json"
+            )
+        product = self.products[0]
+        product.name = "Renamed"
+        product.save()
+        self.products[1].delete()
+
+        staff = User.objects.create_user("staff", is_staff=True)
+        self.client.force_authenticate(staff)
+        # COUNT, orders joined to users, items
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get("/api/orders/")
+        self.assertEqual(len(queries), 3)
+        self.assertFalse(any("products_" in query["sql"] for query in queries))
+
+        items = response.data["results"][0]["items"]
+        self.assertEqual(
+            items[0]["product_detail"],
+            {"id": product.id, "name": "Ring 0", "slug": "ring-0", "image": None},
+        )
+        self.assertIsNone(items[1]["product"])
+        self.assertEqual(items[1]["product_detail"]["name"], "Ring 1")
+
+    def test_keyset_pagination_of_order_history(self):
+        other = User.objects.create_user("other")
+        for i in range(15):
+            Order.objects.create(user=self.user, total_amount=i, **SHIPPING)
+            Order.objects.create(user=other, total_amount=i, **SHIPPING)
+
+        ids, url = [], "/api/orders/?cursor="
+        while url:
+            response = self.client.get(url)
+            ids += [order["id"] for order in response.data["results"]]
+            url = response.data["next"]
+        self.assertEqual(
+            ids,
+            list(
+                Order.objects.filter(user=self.user)
+                .order_by("-created_at", "-id")
+                .values_list("id", flat=True)
+            ),
+        )
+
+
+class StockReservationTests(APITestCase):
+    def setUp(self):
+        self.user = User.objects.create_user("buyer", password="pw")
+        self.staff = User.objects.create_user("staff", password="pw", is_staff=True)
+        self.client.force_authenticate(self.user)
+        category = Category.objects.create(name="Rings", slug="rings")
+        self.ring = Product.objects.create(
+            name="Ring", slug="ring", description="", price=10, category=category, stock=5
+        )
+        self.band = Product.objects.create(
+            name="Band", slug="band", description="", price=20, category=category, stock=1
+        )
+
+    def place_order(self, *items):
+        return self.client.post(
+            "/api/orders/",
+            {
+                "items": [
+                    {"product_id": product.id, "quantity": quantity}
+                    for product, quantity in items
+                ],
+                **SHIPPING,
+            },
+            format="json",
+        )
+
+    def assertStock(self, product, expected):
+        product.refresh_from_db()
+        self.assertEqual(product.stock, expected)
+
+    def test_order_holds_stock(self):
+        response = self.place_order((self.ring, 2), (self.ring, 1), (self.band, 1))
+        self.assertEqual(response.status_code, 201)
+        self.assertStock(self.ring, 2)
+        self.assertStock(self.band, 0)
+        held = StockReservation.objects.filter(status="held")
+        self.assertEqual(
+            sorted(held.values_list("product_id", "quantity")),
+            [(self.ring.id, 3), (self.band.id, 1)],
+        )
+
+    def test_insufficient_stock_takes_nothing(self):
+        response = self.place_order((self.ring, 2), (self.band, 2))
+        self.assertEqual(response.status_code, 400)
+        self.assertStock(self.ring, 5)
+        self.assertStock(self.band, 1)
+        self.assertFalse(Order.objects.exists())
+
+    def test_confirm_payment_commits_reservation(self):
+        order_id = self.place_order((self.ring, 1)).data["id"]
+        with PayPalStub() as paypal, override_settings(PAYPAL_API_BASE=paypal.url):
+            paypal.add_order("PAY-1", "10.00")
+            response = self.client.post(
+                f"/api/orders/{order_id}/confirm_payment/", {"paypal_order_id": "PAY-1"}
+            )
+            self.assertEqual(response.status_code, 202)
+            self.assertEqual(response.data["status"], "pending")
+            self.assertEqual(StockReservation.objects.get().status, "held")
+
+            self.assertEqual(run_due_jobs(), 1)
+        order = Order.objects.get(pk=order_id)
+        self.assertTrue(order.paid)
+        self.assertEqual(order.status, "processing")
+        self.assertEqual(StockReservation.objects.get().status, "committed")
+        self.assertStock(self.ring, 4)
+
+    def test_cancel_releases_stock(self):
+        order_id = self.place_order((self.ring, 3)).data["id"]
+        self.client.force_authenticate(self.staff)
+        for _ in range(2):
+            response = self.client.post(
+                f"/api/orders/{order_id}/update_status/", {"status": "cancelled"}
+            )
+            self.assertEqual(response.status_code, 200)
+        self.assertStock(self.ring, 5)
+        self.assertEqual(StockReservation.objects.get().status, "released")
+
+    def test_cancel_restocks_every_line_in_one_update(self):
+        products = [
+            Product.objects.create(
+                name=f"Charm {i}", slug=f"charm-{i}", description="", price=5, stock=3
+            )
+            for i in range(4)
+        ]
+        order_id = self.place_order(*[(product, 2) for product in products]).data["id"]
+        self.client.force_authenticate(self.staff)
+        # An N+1 fails the request under the test settings
+        response = self.client.post(
+            f"/api/orders/{order_id}/update_status/", {"status": "cancelled"}
+        )
+        self.assertEqual(response.status_code, 200)
+        for product in products:
+            self.assertStock(product, 3)
+
+    def test_cancelled_orders_cannot_be_reopened(self):
+        order_id = self.place_order((self.band, 1)).data["id"]
+        self.client.force_authenticate(self.staff)
+        self.client.post(
+            f"/api/orders/{order_id}/update_status/", {"status": "cancelled"}
+        )
+        response = self.client.post(
+            f"/api/orders/{order_id}/update_status/", {"status": "shipped"}
+        )
+        self.assertEqual(response.status_code, 409)
+        self.assertEqual(Order.objects.get(pk=order_id).status, "cancelled")
+        self.assertStock(self.band, 1)
+
+    def test_advancing_an_unpaid_order_commits_its_stock(self):
+        order_id = self.place_order((self.ring, 2)).data["id"]
+        self.client.force_authenticate(self.staff)
+        response = self.client.post(
+            f"/api/orders/{order_id}/update_status/", {"status": "shipped"}
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(StockReservation.objects.get().status, "committed")
+
+        later = (
+            timezone.now() + reservations.get_reservation_ttl() + timedelta(seconds=1)
+        )
+        self.assertEqual(reservations.release_expired(now=later), 0)
+        self.assertStock(self.ring, 3)
+
+    def test_release_expired_is_independent_of_order_count(self):
+        later = (
+            timezone.now() + reservations.get_reservation_ttl() + timedelta(seconds=1)
+        )
+        counts = []
+        for orders in (1, 3):
+            for _ in range(orders):
+                self.place_order((self.ring, 1))
+            with CaptureQueriesContext(connection) as queries:
+                self.assertEqual(reservations.release_expired(now=later), orders)
+            counts.append(len(queries))
+        self.assertEqual(counts[0], counts[1])
+        self.assertStock(self.ring, 5)
+
+    def test_expired_reservations_are_released(self):
+        order_id = self.place_order((self.band, 1)).data["id"]
+        self.assertEqual(reservations.release_expired(), 0)
+
+        later = timezone.now() + reservations.get_reservation_ttl() + timedelta(seconds=1)
+        self.assertEqual(reservations.release_expired(now=later), 1)
+        self.assertStock(self.band, 1)
+        self.assertEqual(Order.objects.get(pk=order_id).status, "cancelled")
+
+        response = self.client.post(
+            f"/api/orders/{order_id}/confirm_payment/", {"paypal_order_id": "PAY-1"}
+        )
+        self.assertEqual(response.status_code, 409)
+
+    def test_job_workers_release_expired_reservations(self):
+        order_id = self.place_order((self.band, 1)).data["id"]
+        StockReservation.objects.update(expires_at=timezone.now() - timedelta(seconds=1))
+        schedule_recurring()
+        run_due_jobs()
+        self.assertStock(self.band, 1)
+        self.assertEqual(Order.objects.get(pk=order_id).status, "cancelled")
+        sweep = Job.objects.get(name="orders.release_expired_reservations")
+        self.assertEqual((sweep.status, sweep.result), ("queued", {"orders": 1}))
+
+    def test_expired_hold_does_not_block_checkout(self):
+        self.place_order((self.band, 1))
+        StockReservation.objects.update(expires_at=timezone.now() - timedelta(seconds=1))
+        response = self.place_order((self.band, 1))
+        self.assertEqual(response.status_code, 201)
+        self.assertStock(self.band, 0)
+        self.assertEqual(
+            list(Order.objects.order_by("id").values_list("status", flat=True)),
+            ["cancelled", "pending"],
+        )
+
+
+class PaymentVerificationTests(APITestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user("buyer", password="pw")
+        self.client.force_authenticate(self.user)
+        product = Product.objects.create(
+            name="Ring", slug="ring", description="", price=25, stock=5
+        )
+        self.order_id = self.client.post(
+            "/api/orders/",
+            {"items": [{"product_id": product.id, "quantity": 2}], **SHIPPING},
+            format="json",
+        ).data["id"]
+        self.paypal = PayPalStub().__enter__()
+        self.addCleanup(self.paypal.__exit__)
+        settings = override_settings(PAYPAL_API_BASE=self.paypal.url)
+        settings.enable()
+        self.addCleanup(settings.disable)
+
+    def confirm(self, paypal_order_id="PAY-1"):
+        return self.client.post(
+            f"/api/orders/{self.order_id}/confirm_payment/",
+            {"paypal_order_id": paypal_order_id},
+        )
+
+    def test_confirming_twice_queues_one_job(self):
+        self.paypal.add_order("PAY-1", "50.00")
+        self.assertEqual(self.confirm().status_code, 202)
+        self.assertEqual(self.confirm().status_code, 202)
+        self.assertEqual(Job.objects.count(), 1)
+
+        run_due_jobs()
+        response = self.confirm()
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data["status"], "processing")
+        self.assertEqual(Job.objects.get().status, "succeeded")
+        # Counted as sold once, for all the confirmations
+        self.assertEqual(ProductSales.objects.get().units, 2)
+
+    def test_confirming_extends_the_hold(self):
+        StockReservation.objects.update(expires_at=timezone.now())
+        self.confirm()
+        self.assertEqual(
+            reservations.release_expired(now=timezone.now() + timedelta(minutes=1)), 0
+        )
+
+    def test_hold_extensions_are_capped(self):
+        for _ in range(5):
+            self.confirm()
+        self.assertEqual(StockReservation.objects.get().extensions, 3)
+        expires_at = StockReservation.objects.get().expires_at
+        self.confirm()
+        self.assertEqual(StockReservation.objects.get().expires_at, expires_at)
+
+    def test_failed_verification_is_queued_again(self):
+        self.confirm("PAY-1")
+        run_due_jobs()
+        self.assertEqual(Job.objects.get().status, "failed")
+
+        self.paypal.add_order("PAY-1", "50.00")
+        self.assertEqual(self.confirm("PAY-1").status_code, 202)
+        self.assertEqual(Job.objects.get().status, "queued")
+        run_due_jobs()
+        self.assertEqual(Job.objects.get().status, "succeeded")
+        self.assertTrue(Order.objects.get(pk=self.order_id).paid)
+
+    def test_cancel_during_capture_fails_verification(self):
+        self.paypal.add_order("PAY-1", "50.00")
+        self.confirm()
+        capture_order = PayPalClient.capture_order
+
+        def capture_then_cancel(client, *args, **kwargs):
+            captured = capture_order(client, *args, **kwargs)
+            # The expiry sweep ran while PayPal was answering
+            reservations.release_expired(now=timezone.now() + timedelta(days=1))
+            return captured
+
+        with mock.patch.object(PayPalClient, "capture_order", capture_then_cancel):
+            run_due_jobs()
+        queued = Job.objects.get()
+        self.assertEqual(queued.status, "failed")
+        self.assertIn("became cancelled; refund needed", queued.last_error)
+        order = Order.objects.get(pk=self.order_id)
+        self.assertEqual((order.paid, order.status), (False, "cancelled"))
+
+    def test_unavailable_paypal_is_retried(self):
+        self.paypal.add_order("PAY-1", "50.00")
+        self.paypal.fail_next = 1
+        self.confirm()
+        run_due_jobs()
+        queued = Job.objects.get()
+        self.assertEqual(queued.status, "queued")
+        self.assertEqual(queued.attempts, 1)
+        self.assertIn("HTTP 503", queued.last_error)
+        self.assertGreater(queued.run_at, timezone.now())
+        self.assertEqual(run_due_jobs(), 0)
+
+        run_due_jobs(now=queued.run_at)
+        self.assertEqual(Job.objects.get().status, "succeeded")
+        self.assertTrue(Order.objects.get(pk=self.order_id).paid)
+
+    def test_capture_is_idempotent(self):
+        self.paypal.add_order("PAY-1", "50.00")
+        self.confirm()
+        run_due_jobs()
+        # A worker that died after capturing retries with the same request id
+        Order.objects.filter(pk=self.order_id).update(paid=False, status="pending")
+        self.paypal.orders["PAY-1"]["status"] = "APPROVED"
+        Job.objects.update(status="queued", run_at=timezone.now())
+        run_due_jobs()
+        self.assertEqual(len(self.paypal.captures), 1)
+        self.assertEqual(
+            [path for method, path in self.paypal.requests if method == "POST"][1:],
+            ["/v2/checkout/orders/PAY-1/capture"] * 2,
+        )
+
+    def test_payer_approval_is_awaited(self):
+        self.paypal.add_order("PAY-1", "50.00", status="PAYER_ACTION_REQUIRED")
+        self.confirm()
+        run_due_jobs()
+        self.assertEqual(Job.objects.get().status, "queued")
+        self.assertFalse(Order.objects.get(pk=self.order_id).paid)
+
+    def test_amount_mismatch_fails_verification(self):
+        self.paypal.add_order("PAY-1", "5.00")
+        self.confirm()
+        run_due_jobs()
+        queued = Job.objects.get()
+        self.assertEqual(queued.status, "failed")
+        self.assertIn("Captured 5.00 USD", queued.last_error)
+        order = Order.objects.get(pk=self.order_id)
+        self.assertFalse(order.paid)
+        self.assertEqual(order.status, "pending")
+        self.assertEqual(StockReservation.objects.get().status, "held")
+
+    def test_unknown_paypal_order_fails_verification(self):
+        self.confirm("PAY-404")
+        run_due_jobs()
+        self.assertEqual(Job.objects.get().status, "failed")
+
+
+class StockReservationConcurrencyTests(TransactionTestCase):
+    def test_concurrent_checkouts_never_oversell(self):
+        stock, threads_count, attempts = 10, 8, 5
+        user = User.objects.create_user("buyer")
+        product = Product.objects.create(
+            name="Last rings", slug="last-rings", description="", price=10, stock=stock
+        )
+        results = []
+        start = threading.Barrier(threads_count)
+
+        def checkout():
+            start.wait()
+            try:
+                for _ in range(attempts):
+                    while True:
+                        try:
+                            with transaction.atomic():
+                                order = Order.objects.create(
+                                    user=user, total_amount=10, **SHIPPING
+                                )
+                                reservations.reserve(order, [(product.id, 1)])
+                            results.append(True)
+                        except reservations.InsufficientStock:
+                            results.append(False)
+                        except OperationalError:
+                            # SQLite lock contention; the attempt did not happen
+                            continue
+                        break
+            finally:
+                connection.close()
+
+        threads = [threading.Thread(target=checkout) for _ in range(threads_count)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        product.refresh_from_db()
+        self.assertEqual(len(results), threads_count * attempts)
+        self.assertEqual(results.count(True), stock)
+        self.assertEqual(product.stock, 0)
+        self.assertEqual(StockReservation.objects.count(), stock)
+        self.assertEqual(Order.objects.count(), stock)
@@ -2,21 +2,30 @@
 from rest_framework import viewsets, permissions, status
 from rest_framework.decorators import action
 from rest_framework.response import Response
+from auraya_backend.pagination import PageNumberOrKeysetPagination
+from auraya_backend.replicas import ReplicaReadsMixin
 from .models import Order
 from .serializers import OrderSerializer, OrderCreateSerializer
-from django.utils import timezone
-import paypalrestsdk
+from . import reservations
+from .jobs import verify_payment
+from analytics import rollups
+from django.db import transaction
 
 
-class OrderViewSet(viewsets.ModelViewSet):
+class OrderViewSet(ReplicaReadsMixin, viewsets.ModelViewSet):
     serializer_class = OrderSerializer
     permission_classes = [permissions.IsAuthenticated]
+    pagination_class = PageNumberOrKeysetPagination
+    # Order history; a single order is read back from the primary
+    replica_actions = ("list",)
 
     def get_queryset(self):
         user = self.request.user
+        # Items carry their product snapshot, so no catalog tables are read
+        queryset = Order.objects.select_related("user").prefetch_related("items")
         if user.is_staff:
-            return Order.objects.all()
-        return Order.objects.filter(user=user)
+            return queryset
+        return queryset.filter(user=user)
 
     def create(self, request, *args, **kwargs):
         serializer = OrderCreateSerializer(
@@ -38,14 +47,28 @@ class OrderViewSet(viewsets.ModelViewSet):
                 status=status.HTTP_400_BAD_REQUEST,
             )
 
-        # Update order
-        order.paypal_order_id = paypal_order_id
-        order.paid = True
-        order.paid_at = timezone.now()
-        order.status = "processing"
-        order.save()
+        if order.status == "cancelled":
+            return Response(
+                {"error": "Order has been cancelled"},
+                status=status.HTTP_409_CONFLICT,
+            )
 
-        return Response(OrderSerializer(order).data)
+        if order.paid:
+            return Response(OrderSerializer(order).data)
+
+        # PayPal is asked by a worker; the order moves to processing once the
+        # payment is verified, and stock stays held until then
+        with transaction.atomic():
+            order.paypal_order_id = paypal_order_id
+            order.save(update_fields=["paypal_order_id", "updated_at"])
+            reservations.extend(order)
+            verify_payment.enqueue(
+                order_id=order.pk,
+                paypal_order_id=paypal_order_id,
+                idempotency_key=f"verify-payment:{order.pk}:{paypal_order_id}",
+            )
+
+        return Response(OrderSerializer(order).data, status=status.HTTP_202_ACCEPTED)
 
     @action(detail=True, methods=["post"], permission_classes=[permissions.IsAdminUser])
     def update_status(self, request, pk=None):
@@ -57,7 +80,25 @@ class OrderViewSet(viewsets.ModelViewSet):
                 {"error": "Invalid status"}, status=status.HTTP_400_BAD_REQUEST
             )
 
-        order.status = new_status
-        order.save()
+        with transaction.atomic():
+            # Read the status the change applies to under a lock, as the
+            # expiry sweep may have just cancelled the order
+            order = Order.objects.select_for_update().get(pk=order.pk)
+            if order.status == "cancelled" and new_status != "cancelled":
+                # Its stock has gone back on sale
+                return Response(
+                    {"error": "Cancelled orders cannot be reopened"},
+                    status=status.HTTP_409_CONFLICT,
+                )
+            before = rollups.order_state(order)
+            if new_status == "cancelled" and order.status != "cancelled":
+                reservations.release(order, statuses=("held", "committed"))
+            elif order.status == "pending" and new_status != "pending":
+                # Out of the expiry sweep's reach, or it would restock units
+                # that have been sent
+                reservations.commit(order)
+            order.status = new_status
+            order.save()
+            rollups.record_order(order, before)
 
         return Response(OrderSerializer(order).data)
@@ -0,0 +1,163 @@
+"""
+Async read path for the catalog, served by the ASGI application.
+
+``auraya_backend.asgi`` resolves requests against ``urls_asgi``, which
+routes the product list and detail and the category list here ahead of the
+DRF router. Anonymous ``GET`` and ``HEAD`` requests are answered on the
+event loop: the regular viewsets still build the queryset, serializer and
+paginator, but every query is awaited through the async ORM
+(``aaggregate``, ``acount``, ``aiterator``, ``aget``), as is every cache
+read and write, so a request waiting on the database, the cache or a slow
+client does not hold a worker thread.
+
+Everything else goes to the sync viewset: writes, and requests carrying a
+token, whose user DRF loads synchronously.
+"""
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.cache import cache
+from django.http import Http404, HttpResponse
+from rest_framework.response import Response
+
+from .views import CategoryViewSet, ProductViewSet
+
+SAFE_METHODS = ("GET", "HEAD")
+
+# Filtering on these runs queries of its own (choice validation, search index)
+SYNC_FILTER_PARAMS = {"category", "search"}
+
+
+async def filter_queryset(view, request):
+    if SYNC_FILTER_PARAMS & request.query_params.keys():
+        return await sync_to_async(lambda: view.filter_queryset(view.get_queryset()))()
+    return view.filter_queryset(view.get_queryset())
+
+
+async def conditional_response(view, request, queryset, build):
+    """``ConditionalGetMixin.conditional_response`` with an async ``build``."""
+    etag, last_modified = await view.aget_conditional_validators(request, queryset)
+    if etag is None:
+        return await build()
+    response = view.get_not_modified_response(request, etag, last_modified)
+    if response is None:
+        response = await build()
+    return view.add_conditional_headers(response, etag, last_modified)
+
+
+async def list_action(view, request, **kwargs):
+    queryset = await filter_queryset(view, request)
+
+    async def build():
+        # CachedListMixin.list for an anonymous user
+        key = await view.aget_list_cache_key(request)
+        data = await cache.aget(key)
+        if data is not None:
+            return Response(data)
+        page = await view.paginator.apaginate_queryset(queryset, request, view)
+        response = view.get_paginated_response(
+            view.get_serializer(page, many=True).data
+        )
+        await cache.aset(key, response.data, settings.CATALOG_CACHE_TIMEOUT)
+        return response
+
+    if "cursor" in request.query_params:
+        return await build()
+    return await conditional_response(view, request, queryset, build)
+
+
+async def retrieve_action(view, request, **kwargs):
+    lookup_url_kwarg = view.lookup_url_kwarg or view.lookup_field
+    queryset = (await filter_queryset(view, request)).filter(
+        **{view.lookup_field: kwargs[lookup_url_kwarg]}
+    )
+
+    async def build():
+        try:
+            instance = await queryset.aget()
+        except queryset.model.DoesNotExist:
+            raise Http404(
+                f"No {queryset.model._meta.object_name} matches the given query."
+            )
+        view.check_object_permissions(request, instance)
+        return Response(view.get_serializer(instance).data)
+
+    return await conditional_response(view, request, queryset, build)
+
+
+ACTIONS = {"list": list_action, "retrieve": retrieve_action}
+
+
+async def render(response):
+    if not isinstance(response, Response):
+        # 304 Not Modified
+        return response
+    if response.accepted_renderer.format != "json":
+        # The browsable API queries the database for its forms
+        await sync_to_async(response.render)()
+    else:
+        response.render()
+    # A plain response, or Django would hop to a thread to render it again
+    rendered = HttpResponse(response.content, status=response.status_code)
+    for header, value in response.items():
+        rendered[header] = value
+    return rendered
+
+
+def async_view(viewset, actions, **initkwargs):
+    """
+    View for the read action of ``viewset`` mapped to ``GET`` in
+    ``actions``, falling back to the sync view for everything else.
+    """
+    sync_view = sync_to_async(viewset.as_view(dict(actions), **initkwargs))
+    actions = {"head": actions["get"], **actions}
+    action = ACTIONS[actions["get"]]
+
+    async def view(request, *args, **kwargs):
+        if request.method not in SAFE_METHODS or "HTTP_AUTHORIZATION" in request.META:
+            return await sync_view(request, *args, **kwargs)
+
+        # What ViewSetMixin.as_view and APIView.dispatch do, minus the handler
+        self = viewset(**initkwargs)
+        self.action_map = actions
+        self.args = args
+        self.kwargs = kwargs
+        self.request = request
+        request = self.initialize_request(request, *args, **kwargs)
+        self.request = request
+        self.headers = self.default_response_headers
+        try:
+            await self.ainitial(request, *args, **kwargs)
+            response = await action(self, request, **kwargs)
+        except Exception as exc:
+            response = self.handle_exception(exc)
+        response = self.finalize_response(request, response, *args, **kwargs)
+        return await render(response)
+
+    view.cls = viewset
+    view.initkwargs = initkwargs
+    view.actions = actions
+    view.csrf_exempt = True
+    return view
+
+
+product_list = async_view(
+    ProductViewSet, {"get": "list", "post": "create"}, basename="product", detail=False
+)
+product_detail = async_view(
+    ProductViewSet,
+    {
+        "get": "retrieve",
+        "put": "update",
+        "patch": "partial_update",
+        "delete": "destroy",
+    },
+    basename="product",
+    detail=True,
+)
+category_list = async_view(
+    CategoryViewSet,
+    {"get": "list", "post": "create"},
+    basename="category",
+    detail=False,
+)
@@ -0,0 +1,202 @@
+"""
+Response caching for the public catalog endpoints.
+
+Cached pages are keyed on the normalized query string plus a generation
+counter for every model the page renders. Saving or deleting a ``Product``,
+``Category`` or ``ProductImage`` bumps its counter (see ``signals.py``), so
+the next request builds a new key and stale pages are never read again;
+they simply age out of the cache.
+
+The same counters feed the ETags of ``ConditionalGetMixin``, which answers
+``If-None-Match`` / ``If-Modified-Since`` with a 304 before any serialization.
+
+Writes that bypass signals (queryset ``update()``, ``bulk_create``) must
+bump the counters themselves; checkout does so whenever it moves stock, so
+a cached page never outlives the stock it shows.
+"""
+
+import hashlib
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Count, Max
+from django.utils.cache import get_conditional_response, patch_vary_headers
+from django.utils.http import http_date, quote_etag, urlencode
+from rest_framework.response import Response
+
+from auraya_backend.replicas import pin
+
+GENERATION_KEY = "catalog:generation:{}"
+
+
+def get_generations(*model_names):
+    keys = [GENERATION_KEY.format(name) for name in model_names]
+    values = cache.get_many(keys)
+    missing = [key for key in keys if key not in values]
+    if missing:
+        # New or evicted counters start from the clock rather than zero, so
+        # they never reuse a generation that older pages were cached under
+        for key in missing:
+            cache.add(key, time.time_ns(), timeout=None)
+        values.update(cache.get_many(missing))
+    return [values.get(key) for key in keys]
+
+
+async def aget_generations(*model_names):
+    keys = [GENERATION_KEY.format(name) for name in model_names]
+    values = await cache.aget_many(keys)
+    missing = [key for key in keys if key not in values]
+    if missing:
+        for key in missing:
+            await cache.aadd(key, time.time_ns(), timeout=None)
+        values.update(await cache.aget_many(missing))
+    return [values.get(key) for key in keys]
+
+
+def bump_generation(*model_names):
+    # Until replicas catch up, pages for the new generation are built from
+    # the primary
+    pin("catalog")
+    for name in model_names:
+        key = GENERATION_KEY.format(name)
+        try:
+            cache.incr(key)
+        except ValueError:
+            cache.add(key, time.time_ns(), timeout=None)
+
+
+def bump_generation_on_commit(*model_names):
+    # Bumping before the commit would let a concurrent request cache the old
+    # rows under the new generation
+    transaction.on_commit(lambda: bump_generation(*model_names))
+
+
+class CachedListMixin:
+    """
+    Serves ``list`` for non-staff users from the cache.
+
+    ``cache_models`` names the models (by ``model_name``) whose rows end up in
+    the response, ``cache_key_params`` the query parameters that change it.
+    """
+
+    cache_models = ()
+    cache_key_params = ()
+
+    def get_list_cache_key(self, request):
+        generations = get_generations(*self.cache_models)
+        return self.make_list_cache_key(request, generations)
+
+    async def aget_list_cache_key(self, request):
+        generations = await aget_generations(*self.cache_models)
+        return self.make_list_cache_key(request, generations)
+
+    def make_list_cache_key(self, request, generations):
+        params = []
+        for name in sorted(self.cache_key_params):
+            value = request.query_params.get(name, "").strip()
+            if not value or (name == "page" and value == "1"):
+                continue
+            params.append((name, value))
+        return "catalog:{}:{}:{}:{}".format(
+            self.basename,
+            request.get_host(),
+            ".".join(str(generation) for generation in generations),
+            hashlib.md5(urlencode(params).encode()).hexdigest(),
+        )
+
+    def list(self, request, *args, **kwargs):
+        if request.user and request.user.is_staff:
+            return super().list(request, *args, **kwargs)
+
+        key = self.get_list_cache_key(request)
+        data = cache.get(key)
+        if data is not None:
+            return Response(data)
+
+        response = super().list(request, *args, **kwargs)
+        if response.status_code == 200:
+            cache.set(key, response.data, settings.CATALOG_CACHE_TIMEOUT)
+        return response
+
+
+class ConditionalGetMixin:
+    """
+    Adds ``ETag`` and ``Last-Modified`` to ``list`` and ``retrieve``.
+
+    Both come from one aggregate over the rows the view would render
+    (newest ``updated_at`` and row count) plus the ``cache_models``
+    generations, so a matching conditional request gets its 304 without the
+    page being loaded or serialized.
+    """
+
+    def get_conditional_validators(self, request, queryset):
+        stats = queryset.order_by().aggregate(
+            last_modified=Max("updated_at"), count=Count("pk")
+        )
+        generations = get_generations(*self.cache_models)
+        return self.make_conditional_validators(request, stats, generations)
+
+    async def aget_conditional_validators(self, request, queryset):
+        stats = await queryset.order_by().aaggregate(
+            last_modified=Max("updated_at"), count=Count("pk")
+        )
+        generations = await aget_generations(*self.cache_models)
+        return self.make_conditional_validators(request, stats, generations)
+
+    def make_conditional_validators(self, request, stats, generations):
+        if not stats["count"]:
+            return None, None
+        parts = [
+            self.basename,
+            self.action,
+            request.get_host(),
+            request.get_full_path(),
+            bool(request.user and request.user.is_staff),
+            stats["count"],
+            stats["last_modified"].isoformat(),
+            *generations,
+        ]
+        etag = quote_etag(hashlib.sha256(repr(parts).encode()).hexdigest())
+        return etag, stats["last_modified"]
+
+    def get_not_modified_response(self, request, etag, last_modified):
+        return get_conditional_response(
+            request, etag=etag, last_modified=int(last_modified.timestamp())
+        )
+
+    def add_conditional_headers(self, response, etag, last_modified):
+        if response.status_code in (200, 304):
+            response["ETag"] = etag
+            response["Last-Modified"] = http_date(last_modified.timestamp())
+            patch_vary_headers(response, ["Authorization"])
+        return response
+
+    def conditional_response(self, request, queryset, view, *args, **kwargs):
+        etag, last_modified = self.get_conditional_validators(request, queryset)
+        if etag is None:
+            return view(request, *args, **kwargs)
+
+        response = self.get_not_modified_response(request, etag, last_modified)
+        if response is None:
+            response = view(request, *args, **kwargs)
+        return self.add_conditional_headers(response, etag, last_modified)
+
+    def list(self, request, *args, **kwargs):
+        if "cursor" in request.query_params:
+            # Keyset pages exist to avoid the COUNT(*) these validators need
+            return super().list(request, *args, **kwargs)
+        queryset = self.filter_queryset(self.get_queryset())
+        return self.conditional_response(
+            request, queryset, super().list, *args, **kwargs
+        )
+
+    def retrieve(self, request, *args, **kwargs):
+        lookup_url_kwarg = self.lookup_url_kwarg or self.lookup_field
+        queryset = self.filter_queryset(self.get_queryset()).filter(
+            **{self.lookup_field: kwargs[lookup_url_kwarg]}
+        )
+        return self.conditional_response(
+            request, queryset, super().retrieve, *args, **kwargs
+        )
@@ -0,0 +1,123 @@
+"""
+Streaming readers and writers for the catalog import/export commands.
+
+A catalog file is CSV with a header row or JSON Lines, one product per
+record, with the columns in ``CATALOG_FIELDS``. Products are matched by
+``slug``; ``category`` is a category slug, blank for a product without one.
+"""
+
+import csv
+import json
+from decimal import Decimal, InvalidOperation
+
+from django.core.exceptions import ValidationError
+from django.core.validators import validate_slug
+
+from .models import Product
+
+CATALOG_FIELDS = [
+    "slug",
+    "name",
+    "description",
+    "price",
+    "stock",
+    "is_active",
+    "category",
+    "category_name",
+    "image",
+]
+REQUIRED_FIELDS = ["slug", "name", "price"]
+SLUG_MAX_LENGTH = Product._meta.get_field("slug").max_length
+
+
+class CatalogError(ValueError):
+    def __init__(self, line, message):
+        super().__init__(f"line {line}: {message}")
+
+
+def detect_format(path, format=None):
+    if format:
+        return format
+    return "jsonl" if str(path).endswith((".jsonl", ".ndjson")) else "csv"
+
+
+def read_records(file, format):
+    """Yield ``(line number, record)`` pairs without reading the whole file."""
+    if format == "csv":
+        reader = csv.DictReader(file)
+        for record in reader:
+            yield reader.line_num, record
+    else:
+        for line, text in enumerate(file, start=1):
+            if not text.strip():
+                continue
+            try:
+                yield line, json.loads(text)
+            except json.JSONDecodeError as exc:
+                raise CatalogError(line, f"invalid JSON ({exc.msg})")
+
+
+def parse_bool(value):
+    if isinstance(value, bool):
+        return value
+    return str(value).strip().lower() in ("1", "true", "yes", "y")
+
+
+def clean_slug(line, name, value):
+    slug = str(value).strip()
+    try:
+        validate_slug(slug)
+    except ValidationError:
+        raise CatalogError(line, f"invalid {name} {value!r}")
+    if len(slug) > SLUG_MAX_LENGTH:
+        raise CatalogError(line, f"{name} longer than {SLUG_MAX_LENGTH} characters")
+    return slug
+
+
+def clean_record(line, record):
+    """Validate one record and convert it to model field values."""
+    missing = [name for name in REQUIRED_FIELDS if record.get(name) in (None, "")]
+    if missing:
+        raise CatalogError(line, f"missing {', '.join(missing)}")
+    try:
+        price = Decimal(str(record["price"]))
+    except InvalidOperation:
+        price = None
+    # NaN and Infinity parse, but no DecimalField stores them
+    if price is None or not price.is_finite():
+        raise CatalogError(line, f"invalid price {record['price']!r}")
+    try:
+        stock = int(record.get("stock") or 0)
+    except ValueError:
+        raise CatalogError(line, f"invalid stock {record['stock']!r}")
+
+    is_active = record.get("is_active")
+    category = record.get("category")
+    return {
+        "slug": clean_slug(line, "slug", record["slug"]),
+        "name": str(record["name"]).strip(),
+        "description": record.get("description") or "",
+        "price": price,
+        "stock": stock,
+        "is_active": True if is_active in (None, "") else parse_bool(is_active),
+        "category": (
+            None if category in (None, "") else clean_slug(line, "category", category)
+        ),
+        "category_name": (record.get("category_name") or "").strip(),
+        "image": record.get("image") or "",
+    }
+
+
+class CatalogWriter:
+    def __init__(self, file, format):
+        self.file = file
+        self.format = format
+        if format == "csv":
+            self.writer = csv.DictWriter(file, fieldnames=CATALOG_FIELDS)
+            self.writer.writeheader()
+
+    def write(self, record):
+        if self.format == "csv":
+            self.writer.writerow(record)
+        else:
+            self.file.write(json.dumps(record, default=str) + "\n")
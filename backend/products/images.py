@@ -0,0 +1,145 @@
+"""
+Resized and re-encoded derivatives of product images.
+
+Every ``Product.image`` and ``ProductImage.image`` gets a fixed-size
+variant per entry of ``PRODUCT_IMAGE_SIZES``, encoded in each format of
+``PRODUCT_IMAGE_FORMATS`` that Pillow can write. Variants are stored next to
+the original (``products/ring.jpg`` -> ``products/ring.card.webp``) and their
+storage names are kept in the model's ``image_variants`` as
+``{size: {format: name}}``.
+
+Generation runs on a thread pool once the saving transaction commits, so
+uploads return as soon as the original is stored. Until the variants exist,
+clients fall back to the original image. ``PRODUCT_IMAGE_WORKERS = 0``
+generates them inline instead; ``generate_image_variants`` backfills
+existing images.
+"""
+
+import logging
+import os
+from concurrent.futures import ThreadPoolExecutor
+from io import BytesIO
+
+from django.apps import apps
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.db import connection, transaction
+from PIL import Image, ImageOps, features
+
+from .cache import bump_generation
+
+logger = logging.getLogger(__name__)
+
+EXTENSIONS = {"jpeg": "jpg", "webp": "webp", "avif": "avif"}
+SAVE_OPTIONS = {
+    "jpeg": {"quality": 82, "optimize": True, "progressive": True},
+    "webp": {"quality": 80, "method": 4},
+    "avif": {"quality": 60},
+}
+
+_executor = None
+
+
+def get_variant_formats():
+    return [
+        name
+        for name in settings.PRODUCT_IMAGE_FORMATS
+        if name == "jpeg" or features.check(name)
+    ]
+
+
+def variant_name(original, size, format):
+    stem = os.path.splitext(original)[0]
+    return f"{stem}.{size}.{EXTENSIONS[format]}"
+
+
+def needs_variants(instance):
+    """Whether ``image_variants`` is missing or belongs to another image."""
+    if not instance.image:
+        return bool(instance.image_variants)
+    stem = os.path.splitext(instance.image.name)[0]
+    names = [
+        name
+        for formats in instance.image_variants.values()
+        for name in formats.values()
+    ]
+    return not names or any(not name.startswith(f"{stem}.") for name in names)
+
+
+def encode(image, format):
+    if format == "jpeg" and image.mode not in ("RGB", "L"):
+        image = image.convert("RGB")
+    elif image.mode not in ("RGB", "RGBA", "L"):
+        image = image.convert("RGBA")
+    buffer = BytesIO()
+    image.save(buffer, format=format.upper(), **SAVE_OPTIONS.get(format, {}))
+    return buffer.getvalue()
+
+
+def generate_variants(instance):
+    """Write every variant of ``instance.image`` and return their names."""
+    field = instance.image
+    with field.open("rb") as file:
+        original = Image.open(file)
+        original.load()
+    original = ImageOps.exif_transpose(original)
+
+    variants = {}
+    for size, dimensions in settings.PRODUCT_IMAGE_SIZES.items():
+        resized = ImageOps.fit(original, dimensions, Image.Resampling.LANCZOS)
+        for format in get_variant_formats():
+            name = variant_name(field.name, size, format)
+            # Regenerating replaces the old file instead of adding a suffix
+            field.storage.delete(name)
+            variants.setdefault(size, {})[format] = field.storage.save(
+                name, ContentFile(encode(resized, format))
+            )
+    return variants
+
+
+def update_variants(model_label, pk):
+    model = apps.get_model(model_label)
+    instance = model.objects.filter(pk=pk).first()
+    if instance is None:
+        return
+    queryset, variants = model.objects.filter(pk=pk), {}
+    if instance.image:
+        try:
+            variants = generate_variants(instance)
+        except (OSError, Image.DecompressionBombError):
+            logger.warning("Cannot create variants of %s", instance.image.name)
+            return
+        # Every row showing this file, unless the image was replaced while we
+        # were working
+        queryset = model.objects.filter(image=instance.image.name)
+    if queryset.update(image_variants=variants):
+        bump_generation(model._meta.model_name)
+
+
+def _run_in_worker(model_label, pk):
+    try:
+        update_variants(model_label, pk)
+    except Exception:
+        logger.exception("Image variants failed for %s %s", model_label, pk)
+    finally:
+        # Worker threads have their own connection; don't leave it open
+        connection.close()
+
+
+def get_executor():
+    global _executor
+    if _executor is None:
+        _executor = ThreadPoolExecutor(
+            max_workers=settings.PRODUCT_IMAGE_WORKERS,
+            thread_name_prefix="image-variants",
+        )
+    return _executor
+
+
+def schedule_variants(instance):
+    """Generate the variants of ``instance`` after the transaction commits."""
+    args = (instance._meta.label_lower, instance.pk)
+    if not settings.PRODUCT_IMAGE_WORKERS:
+        transaction.on_commit(lambda: update_variants(*args))
+    else:
+        transaction.on_commit(lambda: get_executor().submit(_run_in_worker, *args))
@@ -0,0 +1,319 @@
+import json
+import statistics
+import time
+from pathlib import Path
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.test import Client, override_settings
+from django.test.utils import CaptureQueriesContext
+
+from orders.models import Order
+from products.management.commands.generate_load_data import PASSWORD
+from products.models import Category, Product
+from users.authentication import UserClaimsRefreshToken
+from users.models import Address
+
+DEFAULT_BASELINE = Path(settings.BASE_DIR) / "benchmarks" / "api_baseline.json"
+
+
+def percentile(timings, n):
+    if len(timings) == 1:
+        return timings[0]
+    return statistics.quantiles(timings, n=100, method="inclusive")[n - 1]
+
+
+class Endpoint:
+    """One request shape; ``path`` and ``data`` may depend on the iteration."""
+
+    def __init__(self, label, method, path, user=None, data=None, repeat=None):
+        self.label = label
+        self.method = method
+        self.path = path
+        self.user = user
+        self.data = data
+        self.repeat = repeat
+
+    def prepare(self, i):
+        """The client method and its arguments for iteration ``i``."""
+        path = self.path(i) if callable(self.path) else self.path
+        data = self.data(i) if callable(self.data) else self.data
+        kwargs = {} if self.method == "get" else {"content_type": "application/json"}
+        if self.user is not None:
+            token = UserClaimsRefreshToken.for_user(self.user).access_token
+            kwargs["HTTP_AUTHORIZATION"] = f"Bearer {token}"
+        return self.method, path, data, kwargs
+
+
+def get_endpoints(customer, staff):
+    """Every route of the API router and the auth views, as a customer would
+    call them and, where it differs, as staff."""
+    # In stock for every order the benchmark places
+    product = (
+        Product.objects.filter(is_active=True, stock__gte=10_000).order_by("pk").first()
+    )
+    category = Category.objects.order_by("pk").first()
+    order = Order.objects.filter(user=customer).order_by("pk").first()
+    address = Address.objects.filter(user=customer).order_by("pk").first()
+    shipping = {
+        "shipping_name": "Bench",
+        "shipping_email": "bench@example.com",
+        "shipping_address": "1 Bench St",
+        "shipping_city": "Bench",
+        "shipping_state": "BS",
+        "shipping_zip": "00000",
+        "shipping_country": "US",
+    }
+    address_data = {
+        "label": "Bench",
+        "full_name": "Bench User",
+        "address_line1": "1 Bench St",
+        "city": "Bench",
+        "state": "BS",
+        "zip_code": "00000",
+        "country": "US",
+    }
+    return [
+        Endpoint("api root", "get", "/api/"),
+        Endpoint("category list", "get", "/api/categories/"),
+        Endpoint("category detail", "get", f"/api/categories/{category.slug}/"),
+        Endpoint("product list", "get", "/api/products/"),
+        Endpoint("product list page 2", "get", "/api/products/", data={"page": 2}),
+        Endpoint(
+            "product list by category",
+            "get",
+            "/api/products/",
+            data={"category_slug": category.slug, "ordering": "price"},
+        ),
+        Endpoint("product search", "get", "/api/products/", data={"search": "silver"}),
+        Endpoint("product list keyset", "get", "/api/products/", data={"cursor": ""}),
+        Endpoint(
+            "product list fields",
+            "get",
+            "/api/products/",
+            data={"fields": "id,name,images"},
+        ),
+        Endpoint("product list (staff)", "get", "/api/products/", user=staff),
+        Endpoint("product detail", "get", f"/api/products/{product.slug}/"),
+        Endpoint(
+            "product update (staff)",
+            "patch",
+            f"/api/products/{product.slug}/",
+            user=staff,
+            data=lambda i: {"stock": 10_000 + i},
+        ),
+        Endpoint("order list", "get", "/api/orders/", user=customer),
+        Endpoint("order list (staff)", "get", "/api/orders/", user=staff),
+        Endpoint("order detail", "get", f"/api/orders/{order.pk}/", user=customer),
+        Endpoint(
+            "order create",
+            "post",
+            "/api/orders/",
+            user=customer,
+            data={"items": [{"product_id": product.pk, "quantity": 1}], **shipping},
+        ),
+        Endpoint(
+            "order update_status (staff)",
+            "post",
+            f"/api/orders/{order.pk}/update_status/",
+            user=staff,
+            data={"status": "processing"},
+        ),
+        *(
+            Endpoint(
+                f"analytics {name} (staff)",
+                "get",
+                f"/api/analytics/{name}/",
+                user=staff,
+            )
+            for name in ("daily-sales", "top-products", "categories", "order-statuses")
+        ),
+        Endpoint("address list", "get", "/api/addresses/", user=customer),
+        Endpoint(
+            "address detail", "get", f"/api/addresses/{address.pk}/", user=customer
+        ),
+        Endpoint(
+            "address create",
+            "post",
+            "/api/addresses/",
+            user=customer,
+            data=address_data,
+        ),
+        Endpoint(
+            "address set_default",
+            "post",
+            f"/api/addresses/{address.pk}/set_default/",
+            user=customer,
+        ),
+        Endpoint("auth me", "get", "/api/auth/me/", user=customer),
+        Endpoint("profile", "get", "/api/profile/", user=customer),
+        Endpoint(
+            "profile update",
+            "patch",
+            "/api/profile/",
+            user=customer,
+            data=lambda i: {"phone": f"555-{i:04d}"},
+        ),
+        Endpoint(
+            "auth register",
+            "post",
+            "/api/auth/register/",
+            data=lambda i: {
+                "username": f"bench-register-{i}",
+                "email": f"bench-register-{i}@example.com",
+                "password": PASSWORD,
+            },
+            repeat=5,
+        ),
+        # Password hashing dominates; a few samples are enough
+        Endpoint(
+            "auth login",
+            "post",
+            "/api/auth/login/",
+            data={"username": customer.username, "password": PASSWORD},
+            repeat=5,
+        ),
+        Endpoint(
+            "auth refresh",
+            "post",
+            "/api/auth/refresh/",
+            data=lambda i: {"refresh": str(UserClaimsRefreshToken.for_user(customer))},
+        ),
+    ]
+
+
+class Command(BaseCommand):
+    help = (
+        "Generate a seeded dataset, drive every API endpoint through the test "
+        "client and compare latency, queries and bytes with a stored baseline. "
+        "All writes are rolled back."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--requests", type=int, default=30)
+        parser.add_argument("--products", type=int, default=2000)
+        parser.add_argument("--users", type=int, default=100)
+        parser.add_argument("--orders", type=int, default=2000)
+        parser.add_argument("--only", help="Run endpoints whose label contains this")
+        parser.add_argument("--baseline", default=str(DEFAULT_BASELINE))
+        parser.add_argument(
+            "--save-baseline", action="store_true", help="Store this run as baseline"
+        )
+        parser.add_argument(
+            "--tolerance",
+            type=float,
+            default=0.5,
+            help=(
+                "Allowed relative growth of p50 latency and bytes; latency is "
+                "only comparable with a baseline from the same machine"
+            ),
+        )
+        parser.add_argument(
+            "--fail-on-regression",
+            action="store_true",
+            help="Exit non-zero on regression",
+        )
+        parser.add_argument(
+            "--no-cache", action="store_true", help="Disable the catalog cache"
+        )
+
+    def handle(self, *args, **options):
+        caches = settings.CACHES
+        if options["no_cache"]:
+            caches = {
+                "default": {"BACKEND": "django.core.cache.backends.dummy.DummyCache"}
+            }
+        with override_settings(CACHES=caches), transaction.atomic():
+            call_command(
+                "generate_load_data",
+                products=options["products"],
+                users=options["users"],
+                orders=options["orders"],
+                stdout=self.stdout,
+            )
+            # A customer with order history and addresses
+            customer = (
+                Order.objects.filter(user__username__startswith="load-user-")
+                .select_related("user")
+                .first()
+                .user
+            )
+            staff = User.objects.create_user("bench-staff", is_staff=True)
+            results = self.run_endpoints(
+                get_endpoints(customer, staff), options["requests"], options["only"]
+            )
+            transaction.set_rollback(True)
+
+        path = Path(options["baseline"])
+        baseline = json.loads(path.read_text()) if path.exists() else {}
+        regressions = self.report(results, baseline, options["tolerance"])
+
+        if options["save_baseline"]:
+            path.parent.mkdir(parents=True, exist_ok=True)
+            path.write_text(json.dumps(results, indent=2, sort_keys=True) + "\n")
+            self.stdout.write(f"Baseline written to {path}")
+        if regressions and options["fail_on_regression"]:
+            raise CommandError(f"Regressions: {', '.join(regressions)}")
+
+    def run_endpoints(self, endpoints, requests, only):
+        client = Client(SERVER_NAME="localhost")
+        results = {}
+        for endpoint in endpoints:
+            if only and only not in endpoint.label:
+                continue
+            timings, queries, sizes = [], [], []
+            for i in range(endpoint.repeat or requests):
+                method, path, data, kwargs = endpoint.prepare(i)
+                send = getattr(client, method)
+                with CaptureQueriesContext(connection) as captured:
+                    start = time.perf_counter()
+                    response = send(path, data, **kwargs)
+                    timings.append((time.perf_counter() - start) * 1000)
+                if response.status_code >= 400:
+                    raise CommandError(
+                        f"{endpoint.label}: HTTP {response.status_code} "
+                        f"{response.content[:200]!r}"
+                    )
+                queries.append(len(captured))
+                sizes.append(len(response.content))
+            results[endpoint.label] = {
+                "p50_ms": round(percentile(timings, 50), 2),
+                "p95_ms": round(percentile(timings, 95), 2),
+                "p99_ms": round(percentile(timings, 99), 2),
+                "queries": statistics.median(queries),
+                "bytes": int(statistics.median(sizes)),
+            }
+        return results
+
+    def report(self, results, baseline, tolerance):
+        self.stdout.write(
+            f"{'endpoint':<30} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} "
+            f"{'queries':>8} {'bytes':>8}  vs baseline"
+        )
+        regressions = []
+        for label, result in results.items():
+            notes = []
+            before = baseline.get(label)
+            if before:
+                if result["p50_ms"] > before["p50_ms"] * (1 + tolerance):
+                    notes.append(f"p50 {before['p50_ms']} -> {result['p50_ms']}")
+                if result["queries"] > before["queries"]:
+                    notes.append(f"queries {before['queries']} -> {result['queries']}")
+                if result["bytes"] > before["bytes"] * (1 + tolerance):
+                    notes.append(f"bytes {before['bytes']} -> {result['bytes']}")
+            if notes:
+                regressions.append(label)
+            comparison = (
+                self.style.ERROR("; ".join(notes))
+                if notes
+                else ("ok" if before else "no baseline")
+            )
+            self.stdout.write(
+                f"{label:<30} {result['p50_ms']:>8.2f} {result['p95_ms']:>8.2f} "
+                f"{result['p99_ms']:>8.2f} {result['queries']:>8g} "
+                f"{result['bytes']:>8}  {comparison}"
+            )
+        return regressions
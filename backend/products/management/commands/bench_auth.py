@@ -0,0 +1,101 @@
+import contextlib
+import time
+
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.test import Client
+from django.test.utils import CaptureQueriesContext
+from rest_framework.views import APIView
+from rest_framework_simplejwt.authentication import JWTAuthentication
+
+from orders.models import Order
+from users.authentication import (
+    StatelessJWTAuthentication,
+    UserClaimsRefreshToken,
+    user_statuses,
+)
+
+from .bench_api import percentile
+
+SCHEMES = {
+    "database": JWTAuthentication,
+    "stateless": StatelessJWTAuthentication,
+}
+
+# What a signed-in shopper polls
+PATHS = ["/api/orders/", "/api/addresses/", "/api/products/", "/api/profile/"]
+
+
+@contextlib.contextmanager
+def authentication(cls):
+    # The views read the class attribute, which the setting only seeds
+    previous = APIView.authentication_classes
+    APIView.authentication_classes = [cls]
+    try:
+        yield
+    finally:
+        APIView.authentication_classes = previous
+
+
+class Command(BaseCommand):
+    help = (
+        "Compare authenticated request throughput and queries with "
+        "JWTAuthentication, which loads the user for every request, and "
+        "StatelessJWTAuthentication. All writes are rolled back."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--requests", type=int, default=500)
+        parser.add_argument("--users", type=int, default=20)
+        parser.add_argument("--orders", type=int, default=200)
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            call_command(
+                "generate_load_data",
+                products=200,
+                users=options["users"],
+                orders=options["orders"],
+                stdout=self.stdout,
+            )
+            users = list({order.user for order in Order.objects.select_related("user")})
+            tokens = [
+                f"Bearer {UserClaimsRefreshToken.for_user(user).access_token}"
+                for user in users
+            ]
+            results = {}
+            for name, cls in SCHEMES.items():
+                user_statuses.clear()
+                with authentication(cls):
+                    results[name] = self.run(tokens, options["requests"])
+            transaction.set_rollback(True)
+
+        self.stdout.write(
+            f"{'scheme':<10} {'req/s':>8} {'p50 ms':>8} {'p95 ms':>8} "
+            f"{'queries':>8} {'user queries':>13}"
+        )
+        for name, (rate, timings, queries, user_queries) in results.items():
+            self.stdout.write(
+                f"{name:<10} {rate:>8.0f} {percentile(timings, 50):>8.2f} "
+                f"{percentile(timings, 95):>8.2f} {queries:>8.2f} "
+                f"{user_queries:>13.2f}"
+            )
+
+    def run(self, tokens, requests):
+        client = Client(SERVER_NAME="localhost")
+        timings, queries, user_queries = [], 0, 0
+        start = time.perf_counter()
+        for i in range(requests):
+            path = PATHS[i % len(PATHS)]
+            token = tokens[i % len(tokens)]
+            with CaptureQueriesContext(connection) as captured:
+                request_start = time.perf_counter()
+                response = client.get(path, HTTP_AUTHORIZATION=token)
+                timings.append((time.perf_counter() - request_start) * 1000)
+            if response.status_code != 200:
+                raise CommandError(f"{path}: HTTP {response.status_code}")
+            queries += len(captured)
+            user_queries += sum('FROM "auth_user"' in q["sql"] for q in captured)
+        rate = requests / (time.perf_counter() - start)
+        return rate, timings, queries / requests, user_queries / requests
@@ -0,0 +1,251 @@
+import asyncio
+import contextlib
+import os
+import signal
+import socket
+import statistics
+import subprocess
+import sys
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from products.models import Category, Product
+
+HOST = "127.0.0.1"
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind((HOST, 0))
+        return sock.getsockname()[1]
+
+
+def server_command(server, port, workers, threads):
+    if server == "wsgi":
+        return [
+            sys.executable,
+            "-m",
+            "gunicorn",
+            "auraya_backend.wsgi:application",
+            f"--bind={HOST}:{port}",
+            f"--workers={workers}",
+            "--worker-class=gthread",
+            f"--threads={threads}",
+            "--keep-alive=60",
+            "--log-level=warning",
+        ]
+    return [
+        sys.executable,
+        "-m",
+        "uvicorn",
+        "auraya_backend.asgi:application",
+        f"--host={HOST}",
+        f"--port={port}",
+        f"--workers={workers}",
+        "--timeout-keep-alive=60",
+        "--no-access-log",
+        "--log-level=warning",
+    ]
+
+
+def wait_until_ready(process, port, timeout=30):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise CommandError(f"Server exited with code {process.returncode}")
+        try:
+            socket.create_connection((HOST, port), timeout=1).close()
+            return
+        except OSError:
+            time.sleep(0.2)
+    raise CommandError(f"Server did not listen on port {port}")
+
+
+@contextlib.contextmanager
+def serve(server, workers, threads, env=None):
+    """Run ``server`` in a subprocess; yields the port once it listens."""
+    port = free_port()
+    process = subprocess.Popen(
+        server_command(server, port, workers, threads),
+        cwd=settings.BASE_DIR,
+        env={
+            **os.environ,
+            "DJANGO_SETTINGS_MODULE": "auraya_backend.settings",
+            **(env or {}),
+        },
+        start_new_session=True,
+    )
+    try:
+        wait_until_ready(process, port)
+        yield port
+    finally:
+        os.killpg(process.pid, signal.SIGTERM)
+        process.wait(timeout=30)
+
+
+async def read_response(reader):
+    status = int((await reader.readline()).split()[1])
+    length, chunked = None, False
+    while True:
+        line = await reader.readline()
+        if line in (b"\r\n", b""):
+            break
+        name, _, value = line.decode("latin-1").partition(":")
+        name = name.strip().lower()
+        if name == "content-length":
+            length = int(value)
+        elif name == "transfer-encoding" and "chunked" in value:
+            chunked = True
+    if chunked:
+        while size := int((await reader.readline()).strip(), 16):
+            await reader.readexactly(size + 2)
+        await reader.readline()
+    elif length:
+        await reader.readexactly(length)
+    return status
+
+
+class Client:
+    """One keep-alive connection issuing requests back to back."""
+
+    def __init__(self, port, paths, deadline, trickle=None):
+        self.port = port
+        self.paths = paths
+        self.deadline = deadline
+        self.trickle = trickle
+        self.timings = []
+        self.errors = 0
+
+    async def send(self, writer, request):
+        if self.trickle is None:
+            writer.write(request)
+        else:
+            # A slow client: the request arrives a few bytes at a time
+            for start in range(0, len(request), 8):
+                writer.write(request[start : start + 8])
+                await writer.drain()
+                await asyncio.sleep(self.trickle)
+        await writer.drain()
+
+    async def run(self, offset):
+        writer = None
+        i = offset
+        while time.monotonic() < self.deadline:
+            path = self.paths[i % len(self.paths)]
+            i += 1
+            request = (
+                f"GET {path} HTTP/1.1\r\nHost: {HOST}\r\n"
+                "Accept: application/json\r\n\r\n"
+            ).encode()
+            try:
+                if writer is None:
+                    reader, writer = await asyncio.open_connection(HOST, self.port)
+                start = time.perf_counter()
+                await self.send(writer, request)
+                status = await read_response(reader)
+                if status != 200:
+                    raise ValueError(status)
+                self.timings.append((time.perf_counter() - start) * 1000)
+            except (OSError, ValueError, asyncio.IncompleteReadError):
+                self.errors += 1
+                if writer is not None:
+                    writer.close()
+                writer = None
+        if writer is not None:
+            writer.close()
+
+
+async def drive(port, paths, clients, slow_clients, trickle, duration):
+    deadline = time.monotonic() + duration
+    fast = [Client(port, paths, deadline) for _ in range(clients)]
+    slow = [Client(port, paths, deadline, trickle) for _ in range(slow_clients)]
+    await asyncio.gather(
+        *(client.run(i) for i, client in enumerate(fast + slow)),
+    )
+    return fast, slow
+
+
+class Command(BaseCommand):
+    help = (
+        "Start the WSGI (gunicorn, gthread) and ASGI (uvicorn) deployments "
+        "on the configured database and drive the catalog read endpoints "
+        "with many concurrent keep-alive clients, optionally alongside slow "
+        "clients that trickle their requests in."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--clients", type=int, default=500)
+        parser.add_argument(
+            "--slow-clients",
+            type=int,
+            default=0,
+            help="Extra clients that send each request 8 bytes at a time",
+        )
+        parser.add_argument(
+            "--trickle-ms",
+            type=float,
+            default=50,
+            help="Pause between the pieces of a slow client's request",
+        )
+        parser.add_argument("--duration", type=float, default=10)
+        parser.add_argument("--workers", type=int, default=2)
+        parser.add_argument(
+            "--threads", type=int, default=8, help="Threads per gunicorn worker"
+        )
+        parser.add_argument(
+            "--servers", nargs="+", choices=["wsgi", "asgi"], default=["wsgi", "asgi"]
+        )
+
+    def handle(self, *args, **options):
+        product = Product.objects.filter(is_active=True).order_by("pk").first()
+        if product is None or not Category.objects.exists():
+            raise CommandError("No catalog to read; run generate_load_data first")
+        paths = [
+            "/api/products/",
+            "/api/products/?page=2",
+            f"/api/products/{product.slug}/",
+            "/api/categories/",
+        ]
+
+        results = {}
+        for server in options["servers"]:
+            with serve(server, options["workers"], options["threads"]) as port:
+                self.stdout.write(
+                    f"{server}: {options['clients']} clients"
+                    f" + {options['slow_clients']} slow for {options['duration']}s"
+                )
+                results[server] = asyncio.run(
+                    drive(
+                        port,
+                        paths,
+                        options["clients"],
+                        options["slow_clients"],
+                        options["trickle_ms"] / 1000,
+                        options["duration"],
+                    )
+                )
+
+        self.report(results, options["duration"])
+
+    def report(self, results, duration):
+        self.stdout.write(
+            f"{'server':<8} {'clients':<8} {'req/s':>8} {'p50 ms':>8} "
+            f"{'p95 ms':>8} {'p99 ms':>8} {'errors':>7}"
+        )
+        for server, groups in results.items():
+            for label, clients in zip(("normal", "slow"), groups):
+                if not clients:
+                    continue
+                timings = sorted(t for client in clients for t in client.timings)
+                errors = sum(client.errors for client in clients)
+                if len(timings) > 1:
+                    cuts = statistics.quantiles(timings, n=100, method="inclusive")
+                    p50, p95, p99 = cuts[49], cuts[94], cuts[98]
+                else:
+                    p50 = p95 = p99 = timings[0] if timings else float("nan")
+                self.stdout.write(
+                    f"{server:<8} {label:<8} {len(timings) / duration:>8.0f} "
+                    f"{p50:>8.1f} {p95:>8.1f} {p99:>8.1f} {errors:>7}"
+                )
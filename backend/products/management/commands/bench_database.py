@@ -0,0 +1,158 @@
+import asyncio
+import random
+import threading
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, connections
+from django.db.models import F
+from django.test import override_settings
+
+from products.models import Category, Product
+
+from .bench_api import percentile
+from .bench_concurrency import drive, serve
+
+# What the database looked like before connection profiles, and what the
+# default profile is now
+PROFILES = {
+    "per-request": {"conn_max_age": 0, "pragmas": {"journal_mode": "delete"}},
+    "tuned": {
+        "conn_max_age": settings.DB_CONN_MAX_AGE,
+        "pragmas": settings.SQLITE_PRAGMAS,
+    },
+}
+
+
+class Writer(threading.Thread):
+    """Stock writes at a steady rate, as checkouts would make them."""
+
+    def __init__(self, product_ids, rate):
+        super().__init__(daemon=True)
+        self.product_ids = product_ids
+        self.interval = 1 / rate
+        self.stopping = threading.Event()
+        self.writes = 0
+        self.timings = []
+
+    def run(self):
+        try:
+            while not self.stopping.wait(self.interval):
+                start = time.perf_counter()
+                Product.objects.filter(pk=random.choice(self.product_ids)).update(
+                    stock=F("stock")
+                )
+                self.timings.append((time.perf_counter() - start) * 1000)
+                self.writes += 1
+        finally:
+            connection.close()
+
+
+class Command(BaseCommand):
+    help = (
+        "Serve the catalog with gunicorn under each database profile (a "
+        "connection per request on an untuned database, then persistent "
+        "connections with the SQLITE_PRAGMAS tuning) and compare requests "
+        "per second while a background writer updates stock."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--clients", type=int, default=32)
+        parser.add_argument("--duration", type=float, default=10)
+        parser.add_argument("--workers", type=int, default=2)
+        parser.add_argument(
+            "--threads", type=int, default=8, help="Threads per gunicorn worker"
+        )
+        parser.add_argument(
+            "--writes-per-second",
+            type=float,
+            default=20,
+            help="Rate of the background stock writes (0 for none)",
+        )
+        parser.add_argument(
+            "--profiles", nargs="+", choices=list(PROFILES), default=list(PROFILES)
+        )
+
+    def handle(self, *args, **options):
+        product_ids = list(
+            Product.objects.filter(is_active=True)
+            .order_by("pk")
+            .values_list("pk", flat=True)[:200]
+        )
+        if not product_ids or not Category.objects.exists():
+            raise CommandError("No catalog to read; run generate_load_data first")
+        slugs = Product.objects.filter(pk__in=product_ids[:20]).values_list(
+            "slug", flat=True
+        )
+        paths = [
+            "/api/products/",
+            "/api/products/?page=2",
+            "/api/categories/",
+            *(f"/api/products/{slug}/" for slug in slugs),
+        ]
+
+        results = {}
+        for name in options["profiles"]:
+            profile = PROFILES[name]
+            env = {
+                "DB_CONN_MAX_AGE": str(profile["conn_max_age"]),
+                "DB_SQLITE_PRAGMAS": ",".join(
+                    f"{key}={value}" for key, value in profile["pragmas"].items()
+                ),
+            }
+            # The journal mode belongs to the file; the first connection of
+            # the profile sets it, before any server holds the file open
+            connections.close_all()
+            with override_settings(SQLITE_PRAGMAS=profile["pragmas"]):
+                connection.ensure_connection()
+                with serve("wsgi", options["workers"], options["threads"], env) as port:
+                    self.stdout.write(
+                        f"{name}: {options['clients']} clients for "
+                        f"{options['duration']}s, CONN_MAX_AGE={env['DB_CONN_MAX_AGE']}"
+                        f", pragmas {env['DB_SQLITE_PRAGMAS'] or '(none)'}"
+                    )
+                    writer = None
+                    if options["writes_per_second"]:
+                        writer = Writer(product_ids, options["writes_per_second"])
+                        writer.start()
+                    try:
+                        clients, _ = asyncio.run(
+                            drive(
+                                port,
+                                paths,
+                                options["clients"],
+                                0,
+                                None,
+                                options["duration"],
+                            )
+                        )
+                    finally:
+                        if writer is not None:
+                            writer.stopping.set()
+                            writer.join()
+                results[name] = clients, writer
+            connections.close_all()
+
+        self.report(results, options["duration"])
+
+    def report(self, results, duration):
+        self.stdout.write(
+            f"{'profile':<12} {'req/s':>8} {'p50 ms':>8} {'p95 ms':>8} "
+            f"{'p99 ms':>8} {'errors':>7} {'writes/s':>9} {'write p95':>10}"
+        )
+        for name, (clients, writer) in results.items():
+            timings = sorted(t for client in clients for t in client.timings)
+            errors = sum(client.errors for client in clients)
+            p50, p95, p99 = (
+                percentile(timings, n) if timings else float("nan")
+                for n in (50, 95, 99)
+            )
+            writes, write_p95 = 0, float("nan")
+            if writer is not None and writer.timings:
+                writes, write_p95 = writer.writes, percentile(writer.timings, 95)
+            self.stdout.write(
+                f"{name:<12} {len(timings) / duration:>8.0f} {p50:>8.1f} "
+                f"{p95:>8.1f} {p99:>8.1f} {errors:>7} {writes / duration:>9.1f} "
+                f"{write_p95:>10.1f}"
+            )
@@ -0,0 +1,98 @@
+import random
+import tempfile
+import time
+from io import BytesIO
+
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.test import Client, override_settings
+from PIL import Image, ImageFilter
+
+from products.images import update_variants
+from products.models import Category, Product
+
+
+def make_photo(rng, size):
+    """A noisy gradient that compresses roughly like a product photo."""
+    noise = Image.effect_noise(size, 40).filter(ImageFilter.GaussianBlur(2))
+    gradient = Image.linear_gradient("L").resize(size)
+    tint = Image.new("L", size, rng.randrange(256))
+    buffer = BytesIO()
+    Image.merge("RGB", (noise, gradient, tint)).save(buffer, "JPEG", quality=90)
+    return buffer.getvalue()
+
+
+class Command(BaseCommand):
+    help = "Compare bytes per catalog page with original and resized card images"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--products", type=int, default=12)
+        parser.add_argument("--width", type=int, default=2000)
+
+    def handle(self, *args, **options):
+        rng = random.Random(42)
+        size = (options["width"], options["width"])
+        client = Client(SERVER_NAME="localhost")
+
+        with tempfile.TemporaryDirectory() as media_root, override_settings(
+            MEDIA_ROOT=media_root,
+            PRODUCT_IMAGE_WORKERS=0,
+            CACHES={
+                "default": {"BACKEND": "django.core.cache.backends.dummy.DummyCache"}
+            },
+        ), transaction.atomic():
+            category = Category.objects.create(name="Bench", slug="bench-images")
+            products = Product.objects.bulk_create(
+                Product(
+                    name=f"Bench product {i}",
+                    slug=f"bench-images-{i}",
+                    description="",
+                    price=10,
+                    category=category,
+                    stock=1,
+                )
+                for i in range(options["products"])
+            )
+            start = time.perf_counter()
+            for product in products:
+                product.image.save(
+                    f"bench-{product.pk}.jpg", ContentFile(make_photo(rng, size))
+                )
+                update_variants("products.product", product.pk)
+            elapsed = (time.perf_counter() - start) * 1000 / len(products)
+            self.stdout.write(f"Variants generated in {elapsed:.0f} ms per image")
+
+            response = client.get("/api/products/", {"category_slug": category.slug})
+            assert response.status_code == 200, response.status_code
+            cards = response.json()["results"]
+            json_bytes = len(response.content)
+
+            def image_bytes(name_of):
+                return sum(
+                    default_storage.size(name_of(product))
+                    for product in Product.objects.filter(category=category)[
+                        : len(cards)
+                    ]
+                )
+
+            formats = Product.objects.get(pk=products[0].pk).image_variants["card"]
+            cases = [("original", lambda product: product.image.name)] + [
+                (
+                    f"card {format}",
+                    lambda product, format=format: product.image_variants["card"][
+                        format
+                    ],
+                )
+                for format in formats
+            ]
+            self.stdout.write(
+                f"{len(cards)} cards, {json_bytes} bytes of JSON\n"
+                f"{'images':<16} {'image bytes':>12} {'page bytes':>12}"
+            )
+            for label, name_of in cases:
+                total = image_bytes(name_of)
+                self.stdout.write(f"{label:<16} {total:>12} {total + json_bytes:>12}")
+
+            transaction.set_rollback(True)
@@ -0,0 +1,73 @@
+import statistics
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.test import Client, override_settings
+
+from auraya_backend.pagination import KeysetPagination
+from products.models import Category, Product
+
+
+class Command(BaseCommand):
+    help = "Compare page-number and keyset pagination latency on shallow and deep pages"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--deep-page", type=int, default=5000)
+        parser.add_argument("--page-size", type=int, default=12)
+        parser.add_argument("--repeat", type=int, default=20)
+
+    def handle(self, *args, **options):
+        deep_page, page_size = options["deep_page"], options["page_size"]
+        client = Client(SERVER_NAME="localhost")
+
+        # Rendered pages must not come from the catalog cache
+        with transaction.atomic(), override_settings(
+            CACHES={
+                "default": {"BACKEND": "django.core.cache.backends.dummy.DummyCache"}
+            }
+        ):
+            category = Category.objects.create(name="Bench", slug="bench-pagination")
+            total = deep_page * page_size
+            self.stdout.write(f"Creating {total} products...")
+            for start in range(0, total, 5000):
+                Product.objects.bulk_create(
+                    Product(
+                        name=f"Bench product {i}",
+                        slug=f"bench-pagination-{i}",
+                        description="",
+                        price=i % 500,
+                        category=category,
+                        stock=1,
+                    )
+                    for i in range(start, min(start + 5000, total))
+                )
+
+            # Cursor pointing just before the first row of the deep page
+            keyset = KeysetPagination(page_size)
+            keyset.request = client.get("/api/products/?cursor=").wsgi_request
+            keyset.ordering, keyset.field_name = "-created_at", "created_at"
+            before_deep_page = Product.objects.order_by("-created_at", "-id")[
+                (deep_page - 1) * page_size - 1
+            ]
+            deep_cursor = keyset.encode_cursor(before_deep_page, reverse=False)
+
+            cases = [
+                ("page 1, page number", "/api/products/?page=1"),
+                (f"page {deep_page}, page number", f"/api/products/?page={deep_page}"),
+                ("page 1, keyset", "/api/products/?cursor="),
+                (f"page {deep_page}, keyset", deep_cursor),
+            ]
+            self.stdout.write(f"{'case':<28} {'p50 ms':>8} {'max ms':>8}")
+            for label, url in cases:
+                timings = []
+                for _ in range(options["repeat"]):
+                    start = time.perf_counter()
+                    response = client.get(url)
+                    timings.append((time.perf_counter() - start) * 1000)
+                    assert response.status_code == 200, response.status_code
+                self.stdout.write(
+                    f"{label:<28} {statistics.median(timings):>8.2f} {max(timings):>8.2f}"
+                )
+
+            transaction.set_rollback(True)
@@ -0,0 +1,67 @@
+import statistics
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from rest_framework.renderers import JSONRenderer
+
+from products.models import Category, Product, ProductImage
+from products.serializers import ProductListSerializer, ProductSerializer
+
+
+class Command(BaseCommand):
+    help = "Compare payload size and render time of full and card product pages"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--page-sizes", type=int, nargs="+", default=[12, 100])
+        parser.add_argument("--images", type=int, default=3)
+        parser.add_argument("--repeat", type=int, default=50)
+
+    def handle(self, *args, **options):
+        page_sizes = options["page_sizes"]
+
+        with transaction.atomic():
+            category = Category.objects.create(name="Bench", slug="bench-payload")
+            products = Product.objects.bulk_create(
+                Product(
+                    name=f"Bench product {i}",
+                    slug=f"bench-payload-{i}",
+                    description="Handmade sterling silver piece, polished by hand. "
+                    * 8,
+                    price=10,
+                    category=category,
+                    stock=5,
+                    image=f"products/bench-{i}.jpg",
+                )
+                for i in range(max(page_sizes))
+            )
+            ProductImage.objects.bulk_create(
+                ProductImage(
+                    product=product,
+                    image=f"products/bench-{product.pk}-{n}.jpg",
+                    alt_text=product.name,
+                )
+                for product in products
+                for n in range(options["images"])
+            )
+
+            queryset = Product.objects.filter(category=category).order_by("-pk")
+            renderer = JSONRenderer()
+            self.stdout.write(
+                f"{'serializer':<24} {'items':>6} {'bytes':>9} {'p50 ms':>8}"
+            )
+            for page_size in page_sizes:
+                for serializer_class in (ProductSerializer, ProductListSerializer):
+                    timings = []
+                    for _ in range(options["repeat"]):
+                        start = time.perf_counter()
+                        page = serializer_class.setup_eager_loading(queryset)
+                        data = serializer_class(page[:page_size], many=True).data
+                        body = renderer.render(data)
+                        timings.append((time.perf_counter() - start) * 1000)
+                    self.stdout.write(
+                        f"{serializer_class.__name__:<24} {page_size:>6} "
+                        f"{len(body):>9} {statistics.median(timings):>8.2f}"
+                    )
+
+            transaction.set_rollback(True)
@@ -0,0 +1,106 @@
+import random
+import statistics
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Q
+
+from products.models import Category, Product
+from products.search import PythonSearchBackend, get_search_backend, tokenize
+
+WORDS = """
+    silver gold sterling necklace bracelet ring pendant chain leather collar
+    charm beaded vintage classic handmade polished engraved minimal layered rose
+    pearl crystal turquoise dog cat paw heart star moon band
+""".split()
+
+
+class Command(BaseCommand):
+    help = "Compare icontains scanning with the full-text search backends"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--products", type=int, default=100_000)
+        parser.add_argument("--repeat", type=int, default=10)
+        parser.add_argument(
+            "--queries", nargs="+", default=["necklace", "silver neck", "turquoise paw"]
+        )
+
+    def time(self, repeat, run):
+        timings = []
+        for _ in range(repeat):
+            start = time.perf_counter()
+            result = run()
+            timings.append((time.perf_counter() - start) * 1000)
+        return statistics.median(timings), result
+
+    def handle(self, *args, **options):
+        rng = random.Random(42)
+        # Synthetic vocabulary on top of the real product words
+        vocabulary = WORDS + [
+            "".join(rng.choice("abcdefghijklmnopqrstuvwxyz") for _ in range(7))
+            for _ in range(5000)
+        ]
+
+        with transaction.atomic():
+            category = Category.objects.create(name="Bench", slug="bench-search")
+            self.stdout.write(f"Creating {options['products']} products...")
+            for start in range(0, options["products"], 5000):
+                Product.objects.bulk_create(
+                    Product(
+                        name=" ".join(rng.choices(vocabulary, k=3)).title(),
+                        slug=f"bench-search-{i}",
+                        description=" ".join(rng.choices(vocabulary, k=40)),
+                        price=10,
+                        category=category,
+                    )
+                    for i in range(start, min(start + 5000, options["products"]))
+                )
+
+            queryset = Product.objects.filter(is_active=True)
+            backend = get_search_backend()
+            python_backend = PythonSearchBackend()
+            # The first search builds the in-process index
+            build_ms, _ = self.time(
+                1, lambda: list(python_backend.search(queryset, ["warmup"]))
+            )
+            self.stdout.write(
+                f"Backend: {type(backend).__name__}; "
+                f"Python index built in {build_ms:.0f} ms"
+            )
+
+            def first_page(matches, ranked):
+                matches = matches.order_by("-search_rank" if ranked else "-created_at")
+                return matches.count(), list(matches[:12])
+
+            self.stdout.write(
+                f"{'query':<18} {'matches':>8} {'icontains ms':>13} "
+                f"{type(backend).__name__ + ' ms':>24} {'python ms':>10}"
+            )
+            for query in options["queries"]:
+                terms = tokenize(query)
+                condition = Q()
+                for term in terms:
+                    condition &= Q(name__icontains=term) | Q(
+                        description__icontains=term
+                    )
+                scan_ms, (count, _) = self.time(
+                    options["repeat"],
+                    lambda: first_page(queryset.filter(condition), ranked=False),
+                )
+                backend_ms, _ = self.time(
+                    options["repeat"],
+                    lambda: first_page(backend.search(queryset, terms), ranked=True),
+                )
+                python_ms, _ = self.time(
+                    options["repeat"],
+                    lambda: first_page(
+                        python_backend.search(queryset, terms), ranked=True
+                    ),
+                )
+                self.stdout.write(
+                    f"{query:<18} {count:>8} {scan_ms:>13.1f} "
+                    f"{backend_ms:>24.1f} {python_ms:>10.1f}"
+                )
+
+            transaction.set_rollback(True)
@@ -0,0 +1,123 @@
+from django.contrib.auth.models import AnonymousUser, User
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from rest_framework.test import APIRequestFactory, force_authenticate
+
+from orders.views import OrderViewSet
+from products.models import Category
+from products.views import CategoryViewSet, ProductViewSet
+from users.views import AddressViewSet
+
+CUSTOMER = User(pk=1, username="customer")
+STAFF = User(pk=2, username="staff", is_staff=True)
+
+# (label, viewset, action, query parameters, user, URL kwargs)
+QUERY_SHAPES = [
+    ("category list", CategoryViewSet, "list", {}, None, {}),
+    ("product list", ProductViewSet, "list", {}, None, {}),
+    ("product list by price", ProductViewSet, "list", {"ordering": "price"}, None, {}),
+    ("product list by name", ProductViewSet, "list", {"ordering": "-name"}, None, {}),
+    (
+        "product list in category",
+        ProductViewSet,
+        "list",
+        {"category_slug": "rings"},
+        None,
+        {},
+    ),
+    (
+        "product list by category id",
+        ProductViewSet,
+        "list",
+        # django-filter validates the id, so one has to exist
+        {"category": lambda: Category.objects.values_list("pk", flat=True).first()},
+        None,
+        {},
+    ),
+    (
+        "product list in category by price",
+        ProductViewSet,
+        "list",
+        {"category_slug": "rings", "ordering": "price"},
+        None,
+        {},
+    ),
+    (
+        "product list in price range",
+        ProductViewSet,
+        "list",
+        {"min_price": 10, "max_price": 50},
+        None,
+        {},
+    ),
+    ("product search", ProductViewSet, "list", {"search": "silver"}, None, {}),
+    ("product list (staff)", ProductViewSet, "list", {}, STAFF, {}),
+    ("product detail", ProductViewSet, "retrieve", {}, None, {"slug": "ring"}),
+    ("order list", OrderViewSet, "list", {}, CUSTOMER, {}),
+    ("order list (staff)", OrderViewSet, "list", {}, STAFF, {}),
+    ("order detail", OrderViewSet, "retrieve", {}, CUSTOMER, {"pk": 1}),
+    ("address list", AddressViewSet, "list", {}, CUSTOMER, {}),
+]
+
+
+def get_endpoint_queryset(viewset_class, action, params, user, kwargs):
+    """The queryset an endpoint would evaluate for one page or object."""
+    request = APIRequestFactory().get("/", params)
+    force_authenticate(request, user or AnonymousUser())
+    view = viewset_class(action_map={"get": action}, format_kwarg=None, kwargs=kwargs)
+    view.request = view.initialize_request(request)
+    view.action = action
+
+    queryset = view.filter_queryset(view.get_queryset())
+    if action == "retrieve":
+        lookup_field = view.lookup_field
+        return queryset.filter(**{lookup_field: kwargs[lookup_field]})
+    page_size = view.paginator.get_page_size(view.request) if view.paginator else 100
+    return queryset[:page_size]
+
+
+def is_sequential_scan(line):
+    if connection.vendor == "postgresql":
+        return "Seq Scan" in line
+    # SQLite: "SCAN table" without an index, rowid or virtual table to walk
+    return " SCAN " in f" {line} " and not any(
+        via in line for via in ("USING", "VIRTUAL TABLE")
+    )
+
+
+class Command(BaseCommand):
+    help = "EXPLAIN each API endpoint's query and fail on sequential scans"
+
+    def handle(self, *args, **kwargs):
+        offenders = []
+        for label, viewset_class, action, params, user, url_kwargs in QUERY_SHAPES:
+            params = {
+                name: value() if callable(value) else value
+                for name, value in params.items()
+            }
+            if None in params.values():
+                self.stdout.write(f"{label:<36} skipped (no data to filter on)")
+                continue
+            queryset = get_endpoint_queryset(
+                viewset_class, action, params, user, url_kwargs
+            )
+            with transaction.atomic():
+                if connection.vendor == "postgresql":
+                    # Small tables are cheaper to scan; ask whether an index exists
+                    with connection.cursor() as cursor:
+                        cursor.execute("SET LOCAL enable_seqscan = off")
+                plan = queryset.explain()
+
+            scans = [line for line in plan.splitlines() if is_sequential_scan(line)]
+            status = self.style.ERROR("SEQ SCAN") if scans else self.style.SUCCESS("ok")
+            self.stdout.write(f"{label:<36} {status}")
+            if kwargs["verbosity"] > 1 or scans:
+                for line in plan.splitlines():
+                    self.stdout.write(f"    {line}")
+            if scans:
+                offenders.append(label)
+
+        if offenders:
+            raise CommandError(
+                f"Sequential scans in {len(offenders)} queries: {', '.join(offenders)}"
+            )
@@ -0,0 +1,23 @@
+from django.core.management.base import BaseCommand
+
+from products.images import needs_variants, update_variants
+from products.models import Product, ProductImage
+
+
+class Command(BaseCommand):
+    help = "Create missing or outdated resized copies of product images"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--all", action="store_true", help="Regenerate up-to-date variants too"
+        )
+
+    def handle(self, *args, **options):
+        for model in (Product, ProductImage):
+            done = 0
+            for instance in model.objects.only("image", "image_variants").iterator():
+                if options["all"] or needs_variants(instance):
+                    update_variants(model._meta.label_lower, instance.pk)
+                    done += 1
+            self.stdout.write(f"{model._meta.verbose_name_plural}: {done} updated")
+        self.stdout.write(self.style.SUCCESS("Image variants generated"))
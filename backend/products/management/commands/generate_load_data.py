@@ -0,0 +1,218 @@
+import random
+from decimal import Decimal
+
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from analytics.rollups import rebuild as rebuild_analytics
+from orders.models import Order, OrderItem
+from products.cache import bump_generation_on_commit
+from products.models import Category, Product, ProductImage
+from users.models import Address, UserProfile
+
+PREFIX = "load"
+PASSWORD = "load-test-password"
+
+MATERIALS = "sterling silver gold rose-gold leather pearl turquoise crystal".split()
+STYLES = "classic minimal vintage layered engraved beaded braided hammered".split()
+KINDS = "necklace bracelet ring pendant anklet collar charm earrings chain".split()
+CITIES = [
+    ("Portland", "OR", "US"),
+    ("Austin", "TX", "US"),
+    ("Toronto", "ON", "CA"),
+    ("Manchester", "ENG", "GB"),
+    ("Melbourne", "VIC", "AU"),
+    ("Berlin", "BE", "DE"),
+]
+
+
+def batched(objects, size=1000):
+    batch = []
+    for obj in objects:
+        batch.append(obj)
+        if len(batch) == size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+class Command(BaseCommand):
+    help = (
+        "Generate a realistic catalog, customers and order history for load "
+        f"testing. Users are '{PREFIX}-user-N' with password '{PASSWORD}'."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--categories", type=int, default=8)
+        parser.add_argument("--products", type=int, default=2000)
+        parser.add_argument("--images", type=int, default=3, help="per product")
+        parser.add_argument("--users", type=int, default=200)
+        parser.add_argument("--addresses", type=int, default=2, help="per user")
+        parser.add_argument("--orders", type=int, default=3000)
+        parser.add_argument("--max-items", type=int, default=5, help="per order")
+        parser.add_argument("--seed", type=int, default=42)
+        parser.add_argument(
+            "--clear", action="store_true", help="Delete earlier generated data first"
+        )
+
+    def handle(self, *args, **options):
+        rng = random.Random(options["seed"])
+        with transaction.atomic():
+            if options["clear"]:
+                self.clear()
+            categories = self.create_categories(options["categories"])
+            products = self.create_products(
+                rng, categories, options["products"], options["images"]
+            )
+            users = self.create_users(options["users"], options["addresses"], rng)
+            self.create_orders(
+                rng, users, products, options["orders"], options["max_items"]
+            )
+            # bulk_create sends no signals and bypasses the sales rollups
+            bump_generation_on_commit("category", "product", "productimage")
+            rebuild_analytics()
+
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Generated {len(categories)} categories, {len(products)} products, "
+                f"{len(users)} users and {options['orders']} orders"
+            )
+        )
+
+    def clear(self):
+        Order.objects.filter(user__username__startswith=f"{PREFIX}-").delete()
+        User.objects.filter(username__startswith=f"{PREFIX}-").delete()
+        Product.objects.filter(slug__startswith=f"{PREFIX}-").delete()
+        Category.objects.filter(slug__startswith=f"{PREFIX}-").delete()
+
+    def next_index(self, model, field):
+        """First free number after earlier runs, so runs can be stacked."""
+        return model.objects.filter(**{f"{field}__startswith": f"{PREFIX}-"}).count()
+
+    def create_categories(self, count):
+        start = self.next_index(Category, "slug")
+        names = [f"{kind.title()}s" for kind in KINDS]
+        return Category.objects.bulk_create(
+            Category(
+                name=f"{names[i % len(names)]} {i // len(names) + 1}",
+                slug=f"{PREFIX}-category-{i}",
+                description=f"Handmade {names[i % len(names)].lower()}",
+            )
+            for i in range(start, start + count)
+        )
+
+    def create_products(self, rng, categories, count, images):
+        start = self.next_index(Product, "slug")
+        products = []
+        for batch in batched(
+            Product(
+                name=f"{rng.choice(STYLES).title()} {rng.choice(MATERIALS).title()} "
+                f"{rng.choice(KINDS).title()}",
+                slug=f"{PREFIX}-product-{i}",
+                description=" ".join(
+                    rng.choices(MATERIALS + STYLES + KINDS, k=rng.randint(20, 60))
+                ).capitalize(),
+                price=Decimal(rng.randint(900, 49900)) / 100,
+                category=rng.choice(categories),
+                stock=rng.choice([0, 5, 20, 100, 10_000]),
+                is_active=rng.random() > 0.05,
+                image=f"products/{PREFIX}-{i}.jpg",
+            )
+            for i in range(start, start + count)
+        ):
+            products += Product.objects.bulk_create(batch)
+        for batch in batched(
+            ProductImage(
+                product=product,
+                image=f"products/{PREFIX}-{product.slug}-{n}.jpg",
+                alt_text=product.name,
+            )
+            for product in products
+            for n in range(images)
+        ):
+            ProductImage.objects.bulk_create(batch)
+        return products
+
+    def create_users(self, count, addresses, rng):
+        start = self.next_index(User, "username")
+        # One hash for everyone; hashing per user would dominate the runtime
+        password = make_password(PASSWORD)
+        users = []
+        for batch in batched(
+            User(
+                username=f"{PREFIX}-user-{i}",
+                email=f"{PREFIX}-user-{i}@example.com",
+                first_name="Load",
+                last_name=f"User {i}",
+                password=password,
+            )
+            for i in range(start, start + count)
+        ):
+            users += User.objects.bulk_create(batch)
+        UserProfile.objects.bulk_create(
+            UserProfile(user=user, phone=f"555-{user.pk:04d}") for user in users
+        )
+        for batch in batched(
+            Address(
+                user=user,
+                label=["Home", "Work", "Studio"][n % 3],
+                full_name=f"{user.first_name} {user.last_name}",
+                address_line1=f"{rng.randint(1, 999)} Market St",
+                city=city,
+                state=state,
+                country=country,
+                zip_code=f"{rng.randint(10000, 99999)}",
+                is_default=n == 0,
+            )
+            for user in users
+            for n in range(addresses)
+            for city, state, country in [rng.choice(CITIES)]
+        ):
+            Address.objects.bulk_create(batch)
+        return users
+
+    def create_orders(self, rng, users, products, count, max_items):
+        statuses = [status for status, _ in Order.STATUS_CHOICES]
+        for batch in batched(range(count), 500):
+            orders, lines = [], []
+            for _ in batch:
+                user = rng.choice(users)
+                city, state, country = rng.choice(CITIES)
+                status = rng.choice(statuses)
+                items = rng.sample(
+                    products, min(len(products), rng.randint(1, max_items))
+                )
+                quantities = [rng.randint(1, 3) for _ in items]
+                orders.append(
+                    Order(
+                        user=user,
+                        status=status,
+                        total_amount=sum(
+                            product.price * quantity
+                            for product, quantity in zip(items, quantities)
+                        ),
+                        shipping_name=f"{user.first_name} {user.last_name}",
+                        shipping_email=user.email,
+                        shipping_address=f"{rng.randint(1, 999)} Market St",
+                        shipping_city=city,
+                        shipping_state=state,
+                        shipping_zip=f"{rng.randint(10000, 99999)}",
+                        shipping_country=country,
+                        paid=status not in ("pending", "cancelled"),
+                    )
+                )
+                lines.append(list(zip(items, quantities)))
+            Order.objects.bulk_create(orders)
+
+            order_items = []
+            for order, order_lines in zip(orders, lines):
+                for product, quantity in order_lines:
+                    item = OrderItem(
+                        order=order, quantity=quantity, price=product.price
+                    )
+                    item.snapshot_product(product)
+                    order_items.append(item)
+            OrderItem.objects.bulk_create(order_items, batch_size=1000)
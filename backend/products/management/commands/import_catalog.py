@@ -0,0 +1,128 @@
+import sys
+import time
+from collections import defaultdict
+from itertools import islice
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from products.cache import bump_generation_on_commit
+from products.catalog import CatalogError, clean_record, detect_format, read_records
+from products.models import Category, Product
+
+
+class Command(BaseCommand):
+    help = (
+        "Upsert products by slug from a CSV or JSON Lines file ('-' for stdin). "
+        "Each batch commits on its own; an invalid row stops the import and "
+        "re-running the file is safe."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("path")
+        parser.add_argument("--format", choices=["csv", "jsonl"])
+        parser.add_argument("--batch-size", type=int, default=1000)
+
+    def handle(self, *args, **options):
+        path = options["path"]
+        format = detect_format(path, options["format"])
+        # Every category the import can refer to, by slug; grows as we go
+        self.category_ids = dict(Category.objects.values_list("slug", "pk"))
+        self.categories_created = 0
+
+        start = time.perf_counter()
+        rows = 0
+        file = sys.stdin if path == "-" else open(path, newline="", encoding="utf-8")
+        try:
+            records = read_records(file, format)
+            while True:
+                try:
+                    batch = [
+                        (self.get_update_fields(record), clean_record(line, record))
+                        for line, record in islice(records, options["batch_size"])
+                    ]
+                except CatalogError as exc:
+                    raise CommandError(f"{exc} ({rows} rows imported before it)")
+                if not batch:
+                    break
+                self.import_batch(batch)
+                rows += len(batch)
+                if options["verbosity"] > 1:
+                    self.stdout.write(f"{rows} rows...")
+        finally:
+            if file is not sys.stdin:
+                file.close()
+
+        elapsed = time.perf_counter() - start
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Imported {rows} products ({self.categories_created} new categories) "
+                f"in {elapsed:.2f}s, {rows / elapsed if elapsed else 0:.0f} rows/sec"
+            )
+        )
+
+    def get_update_fields(self, record):
+        """
+        Columns an existing product takes from ``record``: the required ones
+        and whichever optional ones the record has. JSON Lines records may
+        each have different keys.
+        """
+        fields = ["name", "price", "updated_at"]
+        return fields + [
+            name
+            for name in ("description", "stock", "is_active", "category", "image")
+            if name in record
+        ]
+
+    def ensure_categories(self, batch):
+        missing = {}
+        for record in batch:
+            slug = record["category"]
+            if slug is not None and slug not in self.category_ids:
+                missing.setdefault(
+                    slug,
+                    Category(
+                        slug=slug,
+                        name=record["category_name"] or slug.replace("-", " ").title(),
+                    ),
+                )
+        if missing:
+            Category.objects.bulk_create(missing.values(), ignore_conflicts=True)
+            self.category_ids.update(
+                Category.objects.filter(slug__in=missing).values_list("slug", "pk")
+            )
+            self.categories_created += len(missing)
+            bump_generation_on_commit("category")
+
+    def import_batch(self, batch):
+        # A slug repeated within one statement is an error on PostgreSQL; the
+        # last occurrence wins, as it would across batches
+        latest = {record["slug"]: (fields, record) for fields, record in batch}
+        # One upsert per set of columns, so a record without, say, stock
+        # leaves the existing product's stock alone
+        groups = defaultdict(list)
+        for fields, record in latest.values():
+            groups[tuple(fields)].append(record)
+        with transaction.atomic():
+            self.ensure_categories([record for _, record in latest.values()])
+            for update_fields, records in groups.items():
+                Product.objects.bulk_create(
+                    [
+                        Product(
+                            slug=record["slug"],
+                            name=record["name"],
+                            description=record["description"],
+                            price=record["price"],
+                            stock=record["stock"],
+                            is_active=record["is_active"],
+                            category_id=self.category_ids.get(record["category"]),
+                            image=record["image"],
+                        )
+                        for record in records
+                    ],
+                    update_conflicts=True,
+                    unique_fields=["slug"],
+                    update_fields=list(update_fields),
+                )
+            # bulk_create sends no signals
+            bump_generation_on_commit("product")
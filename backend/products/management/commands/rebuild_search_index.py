@@ -0,0 +1,17 @@
+from django.core.management.base import BaseCommand
+from django.db import connection
+
+from products.search import install_search_index
+
+
+class Command(BaseCommand):
+    help = "Recreate the SQLite full-text search table and its triggers"
+
+    def handle(self, *args, **kwargs):
+        if connection.vendor != "sqlite":
+            self.stdout.write("Only SQLite needs a rebuild; nothing to do.")
+            return
+
+        with connection.schema_editor() as schema_editor:
+            install_search_index(schema_editor)
+        self.stdout.write(self.style.SUCCESS("Search index rebuilt"))
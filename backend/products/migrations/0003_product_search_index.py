@@ -0,0 +1,56 @@
+# Generated by Django 5.0.14 on 2026-10-18 01:26
+
+import django.db.models.deletion
+import products.models
+import products.search
+from django.db import migrations, models
+
+
+def install_search_index(apps, schema_editor):
+    products.search.install_search_index(
+        schema_editor, apps.get_model("products", "Product")
+    )
+
+
+def uninstall_search_index(apps, schema_editor):
+    products.search.uninstall_search_index(
+        schema_editor, apps.get_model("products", "Product")
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("products", "0002_product_product_active_created_idx_and_more"),
+    ]
+
+    operations = [
+        migrations.RunPython(install_search_index, uninstall_search_index),
+        migrations.CreateModel(
+            name="ProductSearchEntry",
+            fields=[
+                (
+                    "product",
+                    models.OneToOneField(
+                        db_column="rowid",
+                        on_delete=django.db.models.deletion.DO_NOTHING,
+                        primary_key=True,
+                        related_name="search_entry",
+                        serialize=False,
+                        to="products.product",
+                    ),
+                ),
+                (
+                    "document",
+                    products.models.SearchDocumentField(
+                        db_column="products_product_fts"
+                    ),
+                ),
+                ("rank", models.FloatField()),
+            ],
+            options={
+                "db_table": "products_product_fts",
+                "managed": False,
+            },
+        ),
+    ]
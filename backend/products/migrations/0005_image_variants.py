@@ -0,0 +1,35 @@
+# Generated by Django 5.0.14 on 2026-10-18 01:34
+
+import products.search
+from django.db import migrations, models
+
+
+def reinstall_sqlite_search_index(apps, schema_editor):
+    # Adding or removing the column remakes products_product on SQLite,
+    # dropping the search triggers with the old table
+    if schema_editor.connection.vendor == "sqlite":
+        products.search.install_search_index(
+            schema_editor, apps.get_model("products", "Product")
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("products", "0004_catalog_filter_indexes"),
+    ]
+
+    operations = [
+        migrations.RunPython(migrations.RunPython.noop, reinstall_sqlite_search_index),
+        migrations.AddField(
+            model_name="product",
+            name="image_variants",
+            field=models.JSONField(blank=True, default=dict, editable=False),
+        ),
+        migrations.AddField(
+            model_name="productimage",
+            name="image_variants",
+            field=models.JSONField(blank=True, default=dict, editable=False),
+        ),
+        migrations.RunPython(reinstall_sqlite_search_index, migrations.RunPython.noop),
+    ]
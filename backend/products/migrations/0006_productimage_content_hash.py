@@ -0,0 +1,20 @@
+# Generated by Django 5.0.14 on 2026-10-18 01:38
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("products", "0005_image_variants"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="productimage",
+            name="content_hash",
+            field=models.CharField(
+                blank=True, db_index=True, editable=False, max_length=64
+            ),
+        ),
+    ]
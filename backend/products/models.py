@@ -13,6 +13,7 @@ class Category(models.Model):
     class Meta:
         verbose_name_plural = "Categories"
         ordering = ["name"]
+        indexes = [models.Index(fields=["name"], name="category_name_idx")]
 
     def __str__(self):
         return self.name
@@ -28,12 +29,45 @@ class Product(models.Model):
     )
     stock = models.IntegerField(default=0)
     image = models.ImageField(upload_to="products/", blank=True, null=True)
+    # Resized copies of image, see products/images.py
+    image_variants = models.JSONField(default=dict, blank=True, editable=False)
     is_active = models.BooleanField(default=True)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
     class Meta:
         ordering = ["-created_at"]
+        indexes = [
+            # Keyset pagination for each supported ordering; the storefront
+            # only ever reads active products
+            models.Index(
+                fields=["created_at", "id"],
+                condition=models.Q(is_active=True),
+                name="product_active_created_idx",
+            ),
+            models.Index(
+                fields=["price", "id"],
+                condition=models.Q(is_active=True),
+                name="product_active_price_idx",
+            ),
+            models.Index(
+                fields=["name", "id"],
+                condition=models.Q(is_active=True),
+                name="product_active_name_idx",
+            ),
+            # Category pages, newest first or by price
+            models.Index(
+                fields=["category", "created_at", "id"],
+                condition=models.Q(is_active=True),
+                name="product_active_cat_created_idx",
+            ),
+            models.Index(
+                fields=["category", "price", "id"],
+                condition=models.Q(is_active=True),
+                name="product_active_cat_price_idx",
+            ),
+            models.Index(fields=["created_at", "id"], name="product_created_idx"),
+        ]
 
     def __str__(self):
         return self.name
@@ -48,8 +82,50 @@ class ProductImage(models.Model):
         Product, on_delete=models.CASCADE, related_name="images"
     )
     image = models.ImageField(upload_to="products/")
+    image_variants = models.JSONField(default=dict, blank=True, editable=False)
+    # SHA-256 of the uploaded file; identical uploads share one stored file
+    content_hash = models.CharField(
+        max_length=64, blank=True, db_index=True, editable=False
+    )
     alt_text = models.CharField(max_length=200, blank=True)
     created_at = models.DateTimeField(auto_now_add=True)
 
     def __str__(self):
         return f"Image for {self.product.name}"
+
+
+class SearchDocumentField(models.TextField):
+    """The hidden column of an SQLite FTS5 table that ``MATCH`` runs against."""
+
+
+@SearchDocumentField.register_lookup
+class Match(models.Lookup):
+    lookup_name = "match"
+
+    def as_sql(self, compiler, connection):
+        lhs, lhs_params = self.process_lhs(compiler, connection)
+        rhs, rhs_params = self.process_rhs(compiler, connection)
+        return f"{lhs} MATCH {rhs}", lhs_params + rhs_params
+
+
+class ProductSearchEntry(models.Model):
+    """
+    Row of the SQLite FTS5 index over product names and descriptions.
+
+    The table is created and kept in sync by triggers outside the ORM (see
+    ``products/search.py``); it only exists on SQLite.
+    """
+
+    product = models.OneToOneField(
+        Product,
+        on_delete=models.DO_NOTHING,
+        primary_key=True,
+        db_column="rowid",
+        related_name="search_entry",
+    )
+    document = SearchDocumentField(db_column="products_product_fts")
+    rank = models.FloatField()
+
+    class Meta:
+        managed = False
+        db_table = "products_product_fts"
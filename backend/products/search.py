@@ -0,0 +1,252 @@
+"""
+Full-text product search.
+
+``?search=`` on the product list goes through a search backend instead of
+``icontains`` scans:
+
+* ``SQLiteSearchBackend`` queries an FTS5 table, ``products_product_fts``,
+  that indexes product names and descriptions. Triggers on
+  ``products_product`` keep it in sync with every insert, update and delete,
+  including ``bulk_create`` and queryset updates. SQLite drops those
+  triggers when a migration remakes ``products_product``; run
+  ``rebuild_search_index`` after such a migration.
+* ``PostgresSearchBackend`` matches ``to_tsvector`` against a GIN
+  expression index, so there is nothing to keep in sync.
+* ``PythonSearchBackend`` keeps an inverted index in process memory and
+  rebuilds it when the product cache generation changes. It is the fallback
+  when neither of the above is available.
+
+Every search term is a prefix ("neck" finds "necklace") and all terms must
+match. Matches are annotated with ``search_rank`` (higher is better).
+"""
+
+import bisect
+import re
+from collections import defaultdict
+
+from django.conf import settings
+from django.db import OperationalError, connection
+from django.db.models import Case, F, FloatField, Value, When
+from rest_framework import filters
+
+from .cache import get_generations
+from .models import Product
+
+SQLITE_FTS_TABLE = "products_product_fts"
+
+SQLITE_FTS_SQL = [
+    f"""
+    CREATE VIRTUAL TABLE IF NOT EXISTS {SQLITE_FTS_TABLE} USING fts5(
+        name, description,
+        content='products_product', content_rowid='id',
+        tokenize='unicode61 remove_diacritics 2'
+    )
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS {SQLITE_FTS_TABLE}_insert
+    AFTER INSERT ON products_product BEGIN
+        INSERT INTO {SQLITE_FTS_TABLE} (rowid, name, description)
+        VALUES (new.id, new.name, new.description);
+    END
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS {SQLITE_FTS_TABLE}_delete
+    AFTER DELETE ON products_product BEGIN
+        INSERT INTO {SQLITE_FTS_TABLE} ({SQLITE_FTS_TABLE}, rowid, name, description)
+        VALUES ('delete', old.id, old.name, old.description);
+    END
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS {SQLITE_FTS_TABLE}_update
+    AFTER UPDATE OF name, description ON products_product BEGIN
+        INSERT INTO {SQLITE_FTS_TABLE} ({SQLITE_FTS_TABLE}, rowid, name, description)
+        VALUES ('delete', old.id, old.name, old.description);
+        INSERT INTO {SQLITE_FTS_TABLE} (rowid, name, description)
+        VALUES (new.id, new.name, new.description);
+    END
+    """,
+    f"INSERT INTO {SQLITE_FTS_TABLE} ({SQLITE_FTS_TABLE}) VALUES ('rebuild')",
+]
+
+SQLITE_FTS_DROP_SQL = [
+    f"DROP TRIGGER IF EXISTS {SQLITE_FTS_TABLE}_insert",
+    f"DROP TRIGGER IF EXISTS {SQLITE_FTS_TABLE}_delete",
+    f"DROP TRIGGER IF EXISTS {SQLITE_FTS_TABLE}_update",
+    f"DROP TABLE IF EXISTS {SQLITE_FTS_TABLE}",
+]
+
+
+def tokenize(text):
+    return re.findall(r"\w+", text.lower())
+
+
+def get_postgres_search_vector():
+    from django.contrib.postgres.search import SearchVector
+
+    return SearchVector("name", "description", config="english")
+
+
+def get_postgres_search_index():
+    from django.contrib.postgres.indexes import GinIndex
+
+    return GinIndex(get_postgres_search_vector(), name="product_search_gin")
+
+
+def install_search_index(schema_editor, model=Product):
+    """Create the search index for the database behind ``schema_editor``."""
+    vendor = schema_editor.connection.vendor
+    if vendor == "sqlite":
+        with schema_editor.connection.cursor() as cursor:
+            for sql in SQLITE_FTS_DROP_SQL:
+                cursor.execute(sql)
+            try:
+                cursor.execute(SQLITE_FTS_SQL[0])
+            except OperationalError:
+                # SQLite built without FTS5; searches use the Python backend
+                return
+            for sql in SQLITE_FTS_SQL[1:]:
+                cursor.execute(sql)
+    elif vendor == "postgresql":
+        schema_editor.add_index(model, get_postgres_search_index())
+
+
+def uninstall_search_index(schema_editor, model=Product):
+    vendor = schema_editor.connection.vendor
+    if vendor == "sqlite":
+        with schema_editor.connection.cursor() as cursor:
+            for sql in SQLITE_FTS_DROP_SQL:
+                cursor.execute(sql)
+    elif vendor == "postgresql":
+        schema_editor.remove_index(model, get_postgres_search_index())
+
+
+class SQLiteSearchBackend:
+    def search(self, queryset, terms):
+        match = " ".join('"{}"*'.format(term.replace('"', '""')) for term in terms)
+        # bm25 is lower for better matches
+        return queryset.filter(search_entry__document__match=match).annotate(
+            search_rank=-F("search_entry__rank")
+        )
+
+
+class PostgresSearchBackend:
+    def search(self, queryset, terms):
+        from django.contrib.postgres.search import SearchQuery, SearchRank
+
+        query = SearchQuery(
+            " & ".join(f"{term}:*" for term in terms),
+            search_type="raw",
+            config="english",
+        )
+        vector = get_postgres_search_vector()
+        return (
+            queryset.annotate(search_document=vector)
+            .filter(search_document=query)
+            .annotate(search_rank=SearchRank(vector, query))
+        )
+
+
+class PythonSearchBackend:
+    def __init__(self):
+        self.generation = None
+
+    def build(self):
+        postings = defaultdict(dict)
+        for pk, name, description in Product.objects.values_list(
+            "pk", "name", "description"
+        ).iterator(chunk_size=2000):
+            for token in tokenize(f"{name} {description}"):
+                postings[token][pk] = postings[token].get(pk, 0) + 1
+        self.postings = postings
+        self.tokens = sorted(postings)
+
+    def lookup(self, term):
+        """Term frequency per product for every token starting with ``term``."""
+        scores = defaultdict(int)
+        start = bisect.bisect_left(self.tokens, term)
+        for token in self.tokens[start:]:
+            if not token.startswith(term):
+                break
+            for pk, count in self.postings[token].items():
+                scores[pk] += count
+        return scores
+
+    def search(self, queryset, terms):
+        generation = get_generations("product")
+        if generation != self.generation:
+            self.build()
+            self.generation = generation
+
+        scores = None
+        for term in terms:
+            matches = self.lookup(term)
+            if scores is None:
+                scores = matches
+            else:
+                scores = {
+                    pk: scores[pk] + matches[pk] for pk in scores if pk in matches
+                }
+        return queryset.filter(pk__in=list(scores)).annotate(
+            search_rank=Case(
+                *[
+                    When(pk=pk, then=Value(float(score)))
+                    for pk, score in scores.items()
+                ],
+                default=Value(0.0),
+                output_field=FloatField(),
+            )
+        )
+
+
+_python_backend = PythonSearchBackend()
+_sqlite_fts_installed = {}
+
+
+def sqlite_fts_installed():
+    name = connection.settings_dict["NAME"]
+    if name not in _sqlite_fts_installed:
+        _sqlite_fts_installed[name] = (
+            SQLITE_FTS_TABLE in connection.introspection.table_names()
+        )
+    return _sqlite_fts_installed[name]
+
+
+def get_search_backend():
+    name = getattr(settings, "PRODUCT_SEARCH_BACKEND", "auto")
+    if name == "auto":
+        if connection.vendor == "postgresql":
+            name = "postgres"
+        elif connection.vendor == "sqlite" and sqlite_fts_installed():
+            name = "sqlite"
+        else:
+            name = "python"
+    if name == "sqlite":
+        return SQLiteSearchBackend()
+    if name == "postgres":
+        return PostgresSearchBackend()
+    return _python_backend
+
+
+class ProductSearchFilter(filters.SearchFilter):
+    """``SearchFilter`` that uses the full-text search backend."""
+
+    def filter_queryset(self, request, queryset, view):
+        terms = [
+            token for term in self.get_search_terms(request) for token in tokenize(term)
+        ]
+        if not terms:
+            # Nothing indexable, e.g. punctuation only: scan as before
+            return super().filter_queryset(request, queryset, view)
+        return get_search_backend().search(queryset, terms)
+
+
+class ProductOrderingFilter(filters.OrderingFilter):
+    """Orders search results by relevance unless ``?ordering=`` is given."""
+
+    def get_ordering(self, request, queryset, view):
+        if (
+            not request.query_params.get(self.ordering_param)
+            and "search_rank" in queryset.query.annotations
+        ):
+            return ["-search_rank", "-pk"]
+        return super().get_ordering(request, queryset, view)
@@ -1,4 +1,5 @@
 # products/serializers.py
+from django.core.files.storage import default_storage
 from rest_framework import serializers
 from .models import Category, Product, ProductImage
 
@@ -9,14 +10,62 @@ class CategorySerializer(serializers.ModelSerializer):
         fields = ["id", "name", "slug", "description", "created_at", "updated_at"]
 
 
+class ImageVariantsField(serializers.ReadOnlyField):
+    """URLs of an image's resized copies, as ``{size: {format: url}}``."""
+
+    def to_representation(self, variants):
+        request = self.context.get("request")
+        urls = {}
+        for size, formats in variants.items():
+            urls[size] = {}
+            for format, name in formats.items():
+                url = default_storage.url(name)
+                urls[size][format] = request.build_absolute_uri(url) if request else url
+        return urls
+
+
 class ProductImageSerializer(serializers.ModelSerializer):
+    image_variants = ImageVariantsField()
+
     class Meta:
         model = ProductImage
-        fields = ["id", "image", "alt_text", "created_at"]
+        fields = ["id", "image", "image_variants", "alt_text", "created_at"]
+
+
+class ProductReadMixin:
+    """
+    Read-side helpers shared by the product serializers.
+
+    ``fields`` limits the rendered fields to a sparse fieldset, and
+    ``setup_eager_loading`` loads exactly the columns and relations those
+    fields read.
+    """
 
+    def __init__(self, *args, fields=None, **kwargs):
+        super().__init__(*args, **kwargs)
+        if fields is not None:
+            for name in set(self.fields) - set(fields):
+                self.fields.pop(name)
 
-class ProductSerializer(serializers.ModelSerializer):
+    @classmethod
+    def setup_eager_loading(cls, queryset, fields=None):
+        columns = {"id"}
+        for name in fields or cls.Meta.fields:
+            if name == "images":
+                queryset = queryset.prefetch_related("images")
+            elif name == "category_name":
+                queryset = queryset.select_related("category")
+                columns.add("category__name")
+            elif name == "in_stock":
+                columns.add("stock")
+            else:
+                columns.add(name)
+        return queryset.only(*columns)
+
+
+class ProductSerializer(ProductReadMixin, serializers.ModelSerializer):
     category_name = serializers.CharField(source="category.name", read_only=True)
+    image_variants = ImageVariantsField()
     images = ProductImageSerializer(many=True, read_only=True)
 
     class Meta:
@@ -31,6 +80,7 @@ class ProductSerializer(serializers.ModelSerializer):
             "category_name",
             "stock",
             "image",
+            "image_variants",
             "images",
             "is_active",
             "in_stock",
@@ -40,6 +90,26 @@ class ProductSerializer(serializers.ModelSerializer):
         read_only_fields = ["created_at", "updated_at"]
 
 
+class ProductListSerializer(ProductReadMixin, serializers.ModelSerializer):
+    """Compact representation for product cards in the storefront grid."""
+
+    category_name = serializers.CharField(source="category.name", read_only=True)
+    image_variants = ImageVariantsField()
+
+    class Meta:
+        model = Product
+        fields = [
+            "id",
+            "name",
+            "slug",
+            "price",
+            "image",
+            "image_variants",
+            "category_name",
+            "in_stock",
+        ]
+
+
 class ProductCreateUpdateSerializer(serializers.ModelSerializer):
     class Meta:
         model = Product
@@ -0,0 +1,24 @@
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from .cache import bump_generation_on_commit
+from .images import needs_variants, schedule_variants
+from .models import Category, Product, ProductImage
+
+
+@receiver([post_save, post_delete], sender=Category)
+@receiver([post_save, post_delete], sender=Product)
+@receiver([post_save, post_delete], sender=ProductImage)
+def invalidate_catalog_cache(sender, **kwargs):
+    bump_generation_on_commit(sender._meta.model_name)
+
+
+@receiver(post_save, sender=Product)
+@receiver(post_save, sender=ProductImage)
+def create_image_variants(sender, instance, raw=False, **kwargs):
+    if raw or not needs_variants(instance):
+        return
+    if instance.image and not instance.image.storage.exists(instance.image.name):
+        # Nothing to resize for rows pointing at missing files
+        return
+    schedule_variants(instance)
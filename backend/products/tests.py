@@ -1,3 +1,935 @@
-from django.test import TestCase
+import asyncio
+import json
+from asgiref.sync import iscoroutinefunction, sync_to_async
+import tempfile
+import time
+from decimal import Decimal
+from io import BytesIO, StringIO
+from unittest import mock
 
-# Create your tests here.
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.files.storage import default_storage
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import CommandError, call_command
+from django.db import connection
+from django.test import override_settings
+from django.urls import resolve
+from django.test.utils import CaptureQueriesContext
+from PIL import Image
+from auraya_backend.asgi import CatalogASGIHandler
+from auraya_backend.urls import router
+from rest_framework.test import APITestCase
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from .models import Category, Product, ProductImage
+from .search import SQLiteSearchBackend, get_search_backend
+
+
+def create_catalog(products_per_category=6, images_per_product=2):
+    products = []
+    for c in range(2):
+        category = Category.objects.create(name=f"Category {c}", slug=f"category-{c}")
+        for p in range(products_per_category):
+            product = Product.objects.create(
+                name=f"Product {c}-{p}",
+                slug=f"product-{c}-{p}",
+                description="A product",
+                price=Decimal("10.00") + p,
+                category=category,
+                stock=p,
+                image=f"products/product-{c}-{p}.jpg",
+            )
+            for i in range(images_per_product):
+                ProductImage.objects.create(
+                    product=product, image=f"products/product-{c}-{p}-{i}.jpg"
+                )
+            products.append(product)
+    return products
+
+
+class QueryCountMixin:
+    """
+    Asserts that an endpoint runs a fixed number of queries, however many
+    rows it renders.
+    """
+
+    def assertQueryCount(self, url, expected, **params):
+        with self.assertNumQueries(expected):
+            response = self.client.get(url, params)
+        self.assertEqual(response.status_code, 200)
+        return response
+
+
+class ProductQueryCountTests(QueryCountMixin, APITestCase):
+    def setUp(self):
+        cache.clear()
+        self.products = create_catalog()
+
+    def test_product_list(self):
+        # ETag aggregate, COUNT, product cards joined to categories
+        response = self.assertQueryCount("/api/products/", 3)
+        self.assertEqual(len(response.data["results"]), 12)
+        first = response.data["results"][0]
+        self.assertEqual(
+            set(first),
+            {
+                "id",
+                "name",
+                "slug",
+                "price",
+                "image",
+                "image_variants",
+                "category_name",
+                "in_stock",
+            },
+        )
+        self.assertEqual(first["category_name"], "Category 1")
+        self.assertTrue(first["in_stock"])
+
+    def test_sparse_fieldset(self):
+        # The images prefetch only runs when images are asked for
+        response = self.assertQueryCount(
+            "/api/products/", 4, fields="slug,images,bogus"
+        )
+        first = response.data["results"][0]
+        self.assertEqual(set(first), {"slug", "images"})
+        self.assertEqual(len(first["images"]), 2)
+
+        response = self.assertQueryCount("/api/products/", 3, fields="name,stock")
+        self.assertEqual(set(response.data["results"][0]), {"name", "stock"})
+
+        response = self.assertQueryCount(
+            "/api/products/product-0-1/", 2, fields="name,description"
+        )
+        self.assertEqual(set(response.data), {"name", "description"})
+
+    def test_product_list_does_not_grow_with_rows(self):
+        category = Category.objects.get(slug="category-0")
+        for i in range(20):
+            product = Product.objects.create(
+                name=f"Extra {i}",
+                slug=f"extra-{i}",
+                description="",
+                price=1,
+                category=category,
+            )
+            ProductImage.objects.create(product=product, image="products/x.jpg")
+        self.assertQueryCount("/api/products/", 3)
+        self.assertQueryCount("/api/products/", 3, page=2)
+        self.assertQueryCount("/api/products/", 4, page=2, fields="id,images")
+
+    def test_product_list_filtered(self):
+        self.assertQueryCount(
+            "/api/products/", 3, category_slug="category-0", min_price="11"
+        )
+
+    def test_product_detail(self):
+        response = self.assertQueryCount("/api/products/product-0-1/", 3)
+        self.assertEqual(response.data["category_name"], "Category 0")
+        self.assertEqual(len(response.data["images"]), 2)
+
+    def test_product_list_as_staff(self):
+        staff = User.objects.create_user("staff", password="pw", is_staff=True)
+        self.client.force_authenticate(staff)
+        # Staff get full rows for the admin table
+        response = self.assertQueryCount("/api/products/", 4)
+        self.assertIn("stock", response.data["results"][0])
+        self.assertIn("is_active", response.data["results"][0])
+
+    def test_category_list(self):
+        self.assertQueryCount("/api/categories/", 3)
+
+
+class CatalogCacheTests(QueryCountMixin, APITestCase):
+    def setUp(self):
+        cache.clear()
+        # Detecting the search backend takes a one-off query per process
+        get_search_backend()
+        with self.captureOnCommitCallbacks(execute=True):
+            self.products = create_catalog()
+
+    def test_repeated_list_is_served_from_cache(self):
+        first = self.assertQueryCount("/api/products/", 3, search="Product")
+        second = self.assertQueryCount("/api/products/", 1, search="Product")
+        self.assertEqual(first.data, second.data)
+        self.assertQueryCount("/api/categories/", 3)
+        self.assertQueryCount("/api/categories/", 1)
+
+    def test_query_string_is_normalized(self):
+        self.assertQueryCount("/api/products/", 3, category_slug="category-0", page=1)
+        self.assertQueryCount(
+            "/api/products/", 1, page="", category_slug="category-0", utm_source="ad"
+        )
+        self.assertQueryCount("/api/products/", 3, category_slug="category-1")
+
+    def test_product_save_invalidates(self):
+        self.client.get("/api/products/")
+        product = Product.objects.get(slug="product-1-5")
+        with self.captureOnCommitCallbacks(execute=True):
+            product.name = "Renamed"
+            product.save()
+        response = self.assertQueryCount("/api/products/", 3)
+        self.assertEqual(response.data["results"][0]["name"], "Renamed")
+
+    def test_category_and_image_changes_invalidate(self):
+        self.client.get("/api/products/", {"fields": "images"})
+        self.client.get("/api/categories/")
+        category = Category.objects.get(slug="category-1")
+        with self.captureOnCommitCallbacks(execute=True):
+            category.name = "Renamed"
+            category.save()
+        response = self.assertQueryCount("/api/products/", 3)
+        self.assertEqual(response.data["results"][0]["category_name"], "Renamed")
+        response = self.assertQueryCount("/api/categories/", 3)
+        self.assertEqual(response.data["results"][1]["name"], "Renamed")
+
+        with self.captureOnCommitCallbacks(execute=True):
+            ProductImage.objects.filter(product__slug="product-1-5").first().delete()
+        response = self.assertQueryCount("/api/products/", 4, fields="images")
+        self.assertEqual(len(response.data["results"][0]["images"]), 1)
+
+    def test_staff_bypass_cache(self):
+        self.client.get("/api/products/")
+        staff = User.objects.create_user("staff", password="pw", is_staff=True)
+        self.client.force_authenticate(staff)
+        self.assertQueryCount("/api/products/", 4)
+        self.assertQueryCount("/api/products/", 4)
+
+
+class ConditionalGetTests(QueryCountMixin, APITestCase):
+    def setUp(self):
+        cache.clear()
+        with self.captureOnCommitCallbacks(execute=True):
+            self.products = create_catalog()
+
+    def test_detail_not_modified(self):
+        response = self.client.get("/api/products/product-0-1/")
+        etag = response["ETag"]
+        self.assertFalse(etag.startswith("W/"))
+        self.assertIn("Last-Modified", response)
+
+        with self.assertNumQueries(1):
+            response = self.client.get(
+                "/api/products/product-0-1/", HTTP_IF_NONE_MATCH=etag
+            )
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response["ETag"], etag)
+        self.assertEqual(response.content, b"")
+
+        response = self.client.get(
+            "/api/products/product-0-1/",
+            HTTP_IF_MODIFIED_SINCE=response["Last-Modified"],
+        )
+        self.assertEqual(response.status_code, 304)
+
+    def test_list_not_modified_until_edit(self):
+        etag = self.client.get("/api/categories/")["ETag"]
+        response = self.client.get("/api/categories/", HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            Category.objects.create(name="New", slug="new")
+        response = self.client.get("/api/categories/", HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response["ETag"], etag)
+
+    def test_etag_tracks_page_and_images(self):
+        first = self.client.get("/api/products/")["ETag"]
+        self.assertNotEqual(
+            first, self.client.get("/api/products/?ordering=price")["ETag"]
+        )
+
+        with self.captureOnCommitCallbacks(execute=True):
+            ProductImage.objects.create(
+                product=self.products[0], image="products/new.jpg"
+            )
+        response = self.client.get("/api/products/", HTTP_IF_NONE_MATCH=first)
+        self.assertEqual(response.status_code, 200)
+
+    def checkout(self, product):
+        self.client.force_authenticate(User.objects.create_user("buyer"))
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post(
+                "/api/orders/",
+                {
+                    "items": [{"product_id": product.pk, "quantity": 1}],
+                    "shipping_name": "Jane Doe",
+                    "shipping_email": "jane@example.com",
+                    "shipping_address": "1 Main St",
+                    "shipping_city": "Springfield",
+                    "shipping_state": "IL",
+                    "shipping_zip": "62701",
+                    "shipping_country": "US",
+                },
+                format="json",
+            )
+        self.assertEqual(response.status_code, 201)
+        self.client.force_authenticate(None)
+        return response.data["id"]
+
+    def test_checkout_and_cancel_change_the_etag(self):
+        product = self.products[0]
+        Product.objects.filter(pk=product.pk).update(stock=1)
+        url = f"/api/products/{product.slug}/"
+        etag = self.client.get(url)["ETag"]
+
+        order_id = self.checkout(product)
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data["stock"], 0)
+
+        staff = User.objects.create_user("staff", is_staff=True)
+        self.client.force_authenticate(staff)
+        self.client.post(
+            f"/api/orders/{order_id}/update_status/", {"status": "cancelled"}
+        )
+        self.client.force_authenticate(None)
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=response["ETag"])
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data["stock"], 1)
+
+    def test_checkout_refreshes_the_cached_list(self):
+        product = self.products[0]
+        Product.objects.filter(pk=product.pk).update(stock=1)
+
+        def in_stock(response):
+            by_slug = {row["slug"]: row for row in response.data["results"]}
+            return by_slug[product.slug]["in_stock"]
+
+        response = self.client.get("/api/products/")
+        self.assertTrue(in_stock(response))
+        self.checkout(product)
+        response = self.client.get(
+            "/api/products/", HTTP_IF_NONE_MATCH=response["ETag"]
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertFalse(in_stock(response))
+
+        # Once the cached page expires, the ETag still describes what the
+        # client holds
+        expired = time.time() + settings.CATALOG_CACHE_TIMEOUT + 1
+        with mock.patch("django.core.cache.backends.locmem.time.time") as now:
+            now.return_value = expired
+            revalidated = self.client.get(
+                "/api/products/", HTTP_IF_NONE_MATCH=response["ETag"]
+            )
+            self.assertEqual(revalidated.status_code, 304)
+            fresh = self.client.get("/api/products/")
+        self.assertEqual(fresh.content, response.content)
+
+    def test_missing_product_is_404(self):
+        response = self.client.get("/api/products/missing/")
+        self.assertEqual(response.status_code, 404)
+
+
+class KeysetPaginationTests(APITestCase):
+    def setUp(self):
+        cache.clear()
+        create_catalog(products_per_category=13)
+
+    def walk(self, url, link="next"):
+        slugs, pages = [], 0
+        while url:
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, 200)
+            self.assertNotIn("count", response.data)
+            slugs += [product["slug"] for product in response.data["results"]]
+            url, pages = response.data[link], pages + 1
+        return slugs, pages
+
+    def test_walks_every_product_once(self):
+        expected = list(
+            Product.objects.order_by("-created_at", "-id").values_list(
+                "slug", flat=True
+            )
+        )
+        slugs, pages = self.walk("/api/products/?cursor=")
+        self.assertEqual(slugs, expected)
+        self.assertEqual(pages, 3)
+
+    def test_respects_ordering_with_ties(self):
+        for ordering, order_by in [
+            ("price", ["price", "id"]),
+            ("-price", ["-price", "-id"]),
+        ]:
+            expected = list(
+                Product.objects.order_by(*order_by).values_list("slug", flat=True)
+            )
+            slugs, _ = self.walk(f"/api/products/?cursor=&ordering={ordering}")
+            self.assertEqual(slugs, expected)
+
+    def test_previous_returns_to_first_page(self):
+        first = self.client.get("/api/products/?cursor=&ordering=name")
+        second = self.client.get(first.data["next"])
+        back = self.client.get(second.data["previous"])
+        self.assertEqual(back.data["results"], first.data["results"])
+        self.assertIsNone(back.data["previous"])
+        self.assertEqual(
+            self.client.get(back.data["next"]).data["results"],
+            second.data["results"],
+        )
+
+    def test_invalid_cursor(self):
+        self.assertEqual(self.client.get("/api/products/?cursor=nope").status_code, 404)
+        next_url = self.client.get("/api/products/?cursor=&ordering=price").data["next"]
+        mismatched = next_url.replace("ordering=price", "ordering=name")
+        self.assertEqual(self.client.get(mismatched).status_code, 404)
+
+    def test_page_numbers_remain_the_default(self):
+        response = self.client.get("/api/products/?page=2")
+        self.assertEqual(response.data["count"], 26)
+
+
+class ProductSearchTests(APITestCase):
+    def setUp(self):
+        cache.clear()
+        category = Category.objects.create(name="Jewelry", slug="jewelry")
+        for name, description in [
+            ("Silver Necklace", "Sterling silver chain necklace."),
+            ("Gold Necklace", "A gold pendant."),
+            ("Silver Ring", "Simple band."),
+            ("Dog Collar", "Leather collar, silver buckle, fits any necklace size."),
+        ]:
+            Product.objects.create(
+                name=name,
+                slug=name.lower().replace(" ", "-"),
+                description=description,
+                price=10,
+                category=category,
+            )
+
+    def search(self, query, **params):
+        response = self.client.get("/api/products/", {"search": query, **params})
+        self.assertEqual(response.status_code, 200)
+        return [product["name"] for product in response.data["results"]]
+
+    def assertBackendResults(self):
+        self.assertEqual(
+            sorted(self.search("neck")),
+            ["Dog Collar", "Gold Necklace", "Silver Necklace"],
+        )
+        self.assertEqual(
+            sorted(self.search("silver neck")), ["Dog Collar", "Silver Necklace"]
+        )
+        # Repeated matches rank first
+        self.assertEqual(self.search("silver neck")[0], "Silver Necklace")
+        self.assertEqual(
+            self.search("silver", ordering="name"),
+            ["Dog Collar", "Silver Necklace", "Silver Ring"],
+        )
+        self.assertEqual(self.search("platinum"), [])
+
+    def test_sqlite_fts_backend(self):
+        self.assertIsInstance(get_search_backend(), SQLiteSearchBackend)
+        self.assertBackendResults()
+
+    @override_settings(PRODUCT_SEARCH_BACKEND="python")
+    def test_python_backend(self):
+        self.assertBackendResults()
+
+    def test_index_follows_writes(self):
+        product = Product.objects.get(slug="silver-ring")
+        product.name = "Silver Bracelet"
+        product.save()
+        self.assertEqual(self.search("bracelet"), ["Silver Bracelet"])
+        self.assertEqual(self.search("ring"), [])
+
+        Product.objects.filter(slug="gold-necklace").update(description="Heavy chain")
+        self.assertEqual(self.search("pendant"), [])
+        Product.objects.filter(slug="gold-necklace").delete()
+        self.assertEqual(sorted(self.search("chain")), ["Silver Necklace"])
+
+        Product.objects.bulk_create(
+            [Product(name="Anklet", slug="anklet", description="Beaded", price=5)]
+        )
+        self.assertEqual(self.search("bead"), ["Anklet"])
+
+    def test_punctuation_only_falls_back_to_scan(self):
+        self.assertEqual(self.search("!!!"), [])
+
+
+class QueryPlanTests(APITestCase):
+    def test_no_endpoint_query_scans_a_table(self):
+        create_catalog(products_per_category=1, images_per_product=0)
+        output = StringIO()
+        call_command("explain_queries", stdout=output)
+        self.assertNotIn("skipped", output.getvalue())
+
+
+def make_image(size=(800, 600), color="teal", format="JPEG"):
+    buffer = BytesIO()
+    Image.new("RGB", size, color).save(buffer, format=format)
+    return buffer.getvalue()
+
+
+@override_settings(
+    PRODUCT_IMAGE_WORKERS=0,
+    PRODUCT_IMAGE_SIZES={"thumb": (40, 40), "card": (120, 120)},
+    PRODUCT_IMAGE_FORMATS=["jpeg", "webp"],
+)
+class ProductImageTestCase(APITestCase):
+    """A staff client, one product and a throwaway MEDIA_ROOT."""
+
+    def setUp(self):
+        media_root = tempfile.TemporaryDirectory()
+        self.addCleanup(media_root.cleanup)
+        settings = override_settings(MEDIA_ROOT=media_root.name)
+        settings.enable()
+        self.addCleanup(settings.disable)
+
+        category = Category.objects.create(name="Rings", slug="rings")
+        self.product = Product.objects.create(
+            name="Ring", slug="ring", description="", price=10, category=category
+        )
+        staff = User.objects.create_user("staff", is_staff=True)
+        self.client.force_authenticate(staff)
+
+    def upload(self, name="photo.jpg"):
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post(
+                "/api/products/ring/upload_image/",
+                {"image": SimpleUploadedFile(name, make_image())},
+            )
+        self.assertEqual(response.status_code, 200)
+        return ProductImage.objects.get(pk=response.data["id"])
+
+
+class ImageVariantTests(ProductImageTestCase):
+    def test_upload_creates_variants_next_to_original(self):
+        image = self.upload()
+        stem = image.image.name.rsplit(".", 1)[0]
+        self.assertEqual(
+            image.image_variants,
+            {
+                "thumb": {"jpeg": f"{stem}.thumb.jpg", "webp": f"{stem}.thumb.webp"},
+                "card": {"jpeg": f"{stem}.card.jpg", "webp": f"{stem}.card.webp"},
+            },
+        )
+        with default_storage.open(image.image_variants["card"]["webp"]) as file:
+            variant = Image.open(file)
+            self.assertEqual((variant.format, variant.size), ("WEBP", (120, 120)))
+
+        response = self.client.get("/api/products/ring/")
+        urls = response.data["images"][0]["image_variants"]
+        self.assertEqual(
+            urls["thumb"]["webp"], f"http://testserver/media/{stem}.thumb.webp"
+        )
+
+    def test_product_image_variants_follow_replacement(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.product.image = SimpleUploadedFile("first.png", make_image())
+            self.product.save()
+        self.product.refresh_from_db()
+        first = self.product.image_variants["card"]["webp"]
+        self.assertTrue(first.startswith("products/first"))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.product.name = "Renamed"
+            self.product.save()
+        self.assertEqual(self.product.image_variants["card"]["webp"], first)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.product.image = SimpleUploadedFile("second.jpg", make_image())
+            self.product.save()
+        self.product.refresh_from_db()
+        self.assertTrue(
+            self.product.image_variants["card"]["webp"].startswith("products/second")
+        )
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.product.image = None
+            self.product.save()
+        self.product.refresh_from_db()
+        self.assertEqual(self.product.image_variants, {})
+
+    def test_unreadable_image_is_left_without_variants(self):
+        with self.assertLogs("products.images", "WARNING"):
+            with self.captureOnCommitCallbacks(execute=True):
+                self.client.post(
+                    "/api/products/ring/upload_image/",
+                    {"image": SimpleUploadedFile("broken.jpg", make_image()[:200])},
+                )
+        self.assertEqual(ProductImage.objects.get().image_variants, {})
+
+    def test_backfill_command(self):
+        image = self.upload()
+        ProductImage.objects.update(image_variants={})
+        call_command("generate_image_variants", stdout=StringIO())
+        image.refresh_from_db()
+        self.assertEqual(set(image.image_variants), {"thumb", "card"})
+
+
+class ImageUploadTests(ProductImageTestCase):
+    def post(self, *files, slug="ring"):
+        with self.captureOnCommitCallbacks(execute=True) as callbacks:
+            with CaptureQueriesContext(connection) as queries:
+                response = self.client.post(
+                    f"/api/products/{slug}/upload_image/", {"image": list(files)}
+                )
+        self.callbacks = callbacks
+        self.queries = queries
+        return response
+
+    def photo(self, name, color="teal"):
+        return SimpleUploadedFile(name, make_image(color=color))
+
+    def stored_files(self):
+        _, files = default_storage.listdir("products")
+        return sorted(files)
+
+    def test_gallery_upload_is_one_insert(self):
+        colors = [(i * 12, 100, 200) for i in range(20)]
+        response = self.post(
+            *[self.photo(f"photo-{i}.jpg", color) for i, color in enumerate(colors)]
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.data), 20)
+        inserts = [q for q in self.queries if q["sql"].startswith("INSERT")]
+        self.assertEqual(len(inserts), 1)
+        self.assertEqual(self.product.images.count(), 20)
+        self.assertEqual(
+            len({image.content_hash for image in ProductImage.objects.all()}), 20
+        )
+        # Nothing left behind in the staging directory
+        self.assertEqual(default_storage.listdir(".uploads")[1], [])
+
+    def test_identical_content_is_stored_once(self):
+        first = self.post(self.photo("a.jpg"), self.photo("b.jpg")).data
+        self.assertEqual(first[0]["image"], first[1]["image"])
+        self.assertEqual(len(self.stored_files()), 1 + 4)  # original and variants
+
+        Product.objects.create(
+            name="Band",
+            slug="band",
+            description="",
+            price=5,
+            category=self.product.category,
+        )
+        again = self.post(self.photo("c.jpg"), slug="band").data
+        self.assertEqual(again["image"], first[0]["image"])
+        # Variants made for the first copy cover every row sharing the file
+        self.assertEqual(set(again["image_variants"]), {"thumb", "card"})
+        self.assertEqual(
+            len({str(image.image_variants) for image in ProductImage.objects.all()}), 1
+        )
+        self.assertEqual(len(self.stored_files()), 5)
+
+    def test_rejects_non_images_without_storing_anything(self):
+        response = self.post(
+            self.photo("ok.jpg"),
+            SimpleUploadedFile("notes.jpg", b"just some text, not a picture"),
+        )
+        self.assertEqual(response.status_code, 400)
+        self.assertIn("notes.jpg", response.data["error"])
+        self.assertFalse(ProductImage.objects.exists())
+        self.assertFalse(default_storage.exists("products"))
+
+    @override_settings(PRODUCT_IMAGE_MAX_UPLOAD_SIZE=1000)
+    def test_rejects_oversized_images(self):
+        response = self.post(self.photo("big.jpg"))
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.data["error"], {"big.jpg": "Image is too large."})
+
+
+class CatalogImportExportTests(APITestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.directory = directory.name
+        Category.objects.create(name="Rings", slug="rings")
+
+    def write(self, name, text):
+        path = f"{self.directory}/{name}"
+        with open(path, "w") as file:
+            file.write(text)
+        return path
+
+    def run_import(self, path, **options):
+        with self.captureOnCommitCallbacks(execute=True):
+            call_command("import_catalog", path, stdout=StringIO(), **options)
+
+    def test_csv_import_upserts_by_slug(self):
+        path = self.write(
+            "catalog.csv",
+            "slug,name,price,stock,category,category_name\n"
+            "gold-ring,Gold Ring,120.00,3,rings,\n"
+            "silver-chain,Silver Chain,45.50,0,chains,Chains & Links\n"
+            "leather-collar,Leather Collar,30,7,pet-collars,\n",
+        )
+        self.run_import(path, batch_size=2)
+        self.assertEqual(Product.objects.count(), 3)
+        self.assertEqual(
+            dict(Category.objects.values_list("slug", "name")),
+            {
+                "rings": "Rings",
+                "chains": "Chains & Links",
+                "pet-collars": "Pet Collars",
+            },
+        )
+        chain = Product.objects.get(slug="silver-chain")
+        self.assertEqual(
+            (chain.price, chain.stock, chain.category.slug, chain.is_active),
+            (Decimal("45.50"), 0, "chains", True),
+        )
+
+        ring = Product.objects.get(slug="gold-ring")
+        ring.description = "Kept: the file has no description column"
+        ring.save()
+        path = self.write(
+            "update.csv",
+            "slug,name,price,category\ngold-ring,Gold Ring II,99,chains\n",
+        )
+        self.run_import(path)
+        ring.refresh_from_db()
+        self.assertEqual(Product.objects.count(), 3)
+        self.assertEqual((ring.name, ring.price), ("Gold Ring II", Decimal("99.00")))
+        self.assertEqual(ring.category.slug, "chains")
+        self.assertEqual(ring.stock, 3)
+        self.assertEqual(ring.description, "Kept: the file has no description column")
+
+    def test_jsonl_records_only_update_their_own_keys(self):
+        Product.objects.create(
+            slug="gold-ring",
+            name="Gold Ring",
+            description="Kept",
+            price=100,
+            stock=9,
+            is_active=False,
+            category=Category.objects.get(slug="rings"),
+        )
+        path = self.write(
+            "catalog.jsonl",
+            '{"slug": "silver-ring", "name": "Silver Ring", "price": 20, '
+            '"category": "rings", "stock": 4, "description": "New"}\n'
+            '{"slug": "gold-ring", "name": "Gold Ring II", "price": 90, '
+            '"category": "rings"}\n',
+        )
+        self.run_import(path)
+        ring = Product.objects.get(slug="gold-ring")
+        self.assertEqual((ring.name, ring.price), ("Gold Ring II", Decimal("90.00")))
+        self.assertEqual(
+            (ring.stock, ring.is_active, ring.description), (9, False, "Kept")
+        )
+        self.assertEqual(Product.objects.get(slug="silver-ring").stock, 4)
+
+    def test_queries_per_batch_do_not_grow_with_rows(self):
+        lines = "".join(
+            json.dumps(
+                {"slug": f"p-{i}", "name": f"P {i}", "price": 5, "category": "rings"}
+            )
+            + "\n"
+            for i in range(250)
+        )
+        path = self.write("catalog.jsonl", lines)
+        with CaptureQueriesContext(connection) as queries:
+            self.run_import(path, batch_size=50)
+        # One upsert per batch (SQLite's variable limit caps batches at ~90)
+        inserts = [q for q in queries if q["sql"].startswith("INSERT")]
+        self.assertEqual(len(inserts), 5)
+        self.assertEqual(Product.objects.count(), 250)
+
+    def test_import_invalidates_catalog_cache_and_search(self):
+        cache.clear()
+        self.client.get("/api/products/")
+        path = self.write(
+            "catalog.jsonl",
+            '{"slug": "pearl-drop", "name": "Pearl Drop", "price": "12", '
+            '"category": "rings", "description": "Freshwater pearl"}\n',
+        )
+        self.run_import(path)
+        response = self.client.get("/api/products/")
+        self.assertEqual(response.data["count"], 1)
+        response = self.client.get("/api/products/", {"search": "freshwater"})
+        self.assertEqual(response.data["count"], 1)
+
+    def test_invalid_row_stops_the_import(self):
+        path = self.write(
+            "catalog.csv",
+            "slug,name,price,category\nok,Ok,1,rings\nbad,Bad,cheap,rings\n",
+        )
+        with self.assertRaisesMessage(CommandError, "line 3: invalid price 'cheap'"):
+            self.run_import(path)
+        self.assertFalse(Product.objects.exists())
+
+    def test_slugs_and_prices_are_validated(self):
+        for row, error in [
+            ("gold ring,Gold Ring,1,rings", "invalid slug 'gold ring'"),
+            (f"{'x' * 51},Long,1,rings", "slug longer than 50 characters"),
+            ("ring,Ring,1,Rings & Bands", "invalid category 'Rings & Bands'"),
+            ("ring,Ring,NaN,rings", "invalid price 'NaN'"),
+            ("ring,Ring,-Infinity,rings", "invalid price '-Infinity'"),
+        ]:
+            with self.subTest(row=row):
+                path = self.write("catalog.csv", f"slug,name,price,category\n{row}\n")
+                with self.assertRaisesMessage(CommandError, f"line 2: {error}"):
+                    self.run_import(path)
+        self.assertFalse(Product.objects.exists())
+
+    def test_export_round_trips(self):
+        create_catalog(products_per_category=3, images_per_product=0)
+        Product.objects.create(slug="loose-charm", name="Loose Charm", price=5)
+        for format in ("csv", "jsonl"):
+            path = f"{self.directory}/export.{format}"
+            call_command("export_catalog", path, stdout=StringIO())
+            before = list(
+                Product.objects.order_by("slug").values_list(
+                    "slug", "name", "price", "stock", "category__slug", "image"
+                )
+            )
+            Product.objects.all().delete()
+            self.run_import(path)
+            after = list(
+                Product.objects.order_by("slug").values_list(
+                    "slug", "name", "price", "stock", "category__slug", "image"
+                )
+            )
+            self.assertEqual(after, before)
+
+
+@override_settings(ROOT_URLCONF="auraya_backend.urls_asgi")
+class AsyncCatalogTests(APITestCase):
+    """The ASGI URLs serve catalog reads with async views; the sync
+    viewsets behind the default URLs must render the same responses."""
+
+    def setUp(self):
+        cache.clear()
+        with self.captureOnCommitCallbacks(execute=True):
+            create_catalog(products_per_category=8)
+
+    def sync_get(self, url):
+        cache.clear()
+        with override_settings(ROOT_URLCONF="auraya_backend.urls"):
+            return self.client.get(url)
+
+    async def async_get(self, url, **extra):
+        await sync_to_async(cache.clear)()
+        return await self.async_client.get(url, **extra)
+
+    async def test_reads_match_sync_views(self):
+        for url in [
+            "/api/products/",
+            "/api/products/?page=2",
+            "/api/products/?category_slug=category-1&ordering=price",
+            "/api/products/?fields=id,name,images",
+            "/api/products/?search=product",
+            "/api/products/?cursor=&ordering=name",
+            "/api/products/product-0-3/",
+            "/api/categories/",
+            "/api/categories/?page=9",
+            "/api/products/missing/",
+        ]:
+            with self.subTest(url=url):
+                expected = await sync_to_async(self.sync_get)(url)
+                response = await self.async_get(url)
+                self.assertEqual(response.status_code, expected.status_code)
+                self.assertEqual(response.content, expected.content)
+                # Clearing the cache restarts the generations in the ETags
+                self.assertEqual("ETag" in response, "ETag" in expected)
+
+    async def test_queries_run_through_async_orm(self):
+        match = resolve("/api/products/", urlconf="auraya_backend.urls_asgi")
+        self.assertTrue(iscoroutinefunction(match.func))
+        response = await self.async_get("/api/products/")
+        # ETag aggregate, COUNT, page: recorded from the ORM's threads
+        self.assertIn('desc="product-list:list"', response["Server-Timing"])
+        self.assertIn('desc="3 queries"', response["Server-Timing"])
+
+        response = await self.async_client.get(
+            "/api/products/", headers={"If-None-Match": response["ETag"]}
+        )
+        self.assertEqual(response.status_code, 304)
+
+        response = await self.async_get("/api/products/?cursor=")
+        self.assertEqual(len(response.json()["results"]), 12)
+        next_page = await self.async_client.get(response.json()["next"])
+        self.assertEqual(len(next_page.json()["results"]), 4)
+
+    async def test_cache_is_awaited(self):
+        def off_the_loop(method):
+            def call(*args, **kwargs):
+                try:
+                    asyncio.get_running_loop()
+                except RuntimeError:
+                    # A worker thread, as the cache's async methods use
+                    return method(*args, **kwargs)
+                raise AssertionError(f"cache.{method.__name__}() on the event loop")
+
+            return call
+
+        patches = [
+            mock.patch.object(cache, name, off_the_loop(getattr(cache, name)))
+            for name in ["get", "get_many", "set", "set_many", "add"]
+        ]
+        for patch in patches:
+            patch.start()
+            self.addCleanup(patch.stop)
+        for url in ["/api/products/", "/api/products/product-0-3/"]:
+            with self.subTest(url=url):
+                # Empty cache, then cached page and generations
+                for _ in range(2):
+                    response = await self.async_client.get(url)
+                    self.assertEqual(response.status_code, 200)
+
+    async def test_writes_and_tokens_use_sync_views(self):
+        staff = await User.objects.acreate(username="staff", is_staff=True)
+        token = await sync_to_async(
+            lambda: str(RefreshToken.for_user(staff).access_token)
+        )()
+        auth = {"headers": {"Authorization": f"Bearer {token}"}}
+        response = await self.async_client.post(
+            "/api/categories/",
+            {"name": "Charms", "slug": "charms"},
+            content_type="application/json",
+            **auth,
+        )
+        self.assertEqual(response.status_code, 201, response.content)
+
+        # Staff see inactive products and full rows
+        await Product.objects.filter(slug="product-0-0").aupdate(is_active=False)
+        response = await self.async_get("/api/products/", **auth)
+        self.assertEqual(response.json()["count"], 16)
+        self.assertIn("description", response.json()["results"][0])
+        response = await self.async_get("/api/products/")
+        self.assertEqual(response.json()["count"], 15)
+
+    def test_asgi_application_uses_async_urls(self):
+        from auraya_backend.asgi import ASGI_URLCONF, application
+
+        self.assertEqual(ASGI_URLCONF, "auraya_backend.urls_asgi")
+        self.assertIsInstance(application, CatalogASGIHandler)
+
+
+class LoadBenchmarkTests(APITestCase):
+    def test_bench_api_covers_every_route(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        baseline = f"{directory.name}/baseline.json"
+        options = dict(requests=2, products=30, users=3, orders=10, baseline=baseline)
+        call_command("bench_api", save_baseline=True, stdout=StringIO(), **options)
+        # Latency is too noisy to compare here; queries are not
+        call_command(
+            "bench_api",
+            fail_on_regression=True,
+            tolerance=100,
+            stdout=StringIO(),
+            **options,
+        )
+
+        with open(baseline) as file:
+            results = json.load(file)
+        covered = " ".join(results)
+        for prefix, viewset, basename in router.registry:
+            self.assertIn(basename, covered)
+        for label in (
+            "auth login",
+            "auth refresh",
+            "auth register",
+            "auth me",
+            "profile",
+        ):
+            self.assertIn(label, results)
+        # Everything the run wrote was rolled back
+        self.assertFalse(Product.objects.exists())
+        self.assertFalse(User.objects.exists())
@@ -0,0 +1,100 @@
+"""
+Streaming upload handling for product images.
+
+``ImageUploadHandler`` replaces Django's memory/temporary-file handlers for
+``upload_image``. Each file is written chunk by chunk to a staging file
+under ``MEDIA_ROOT`` while it is hashed (SHA-256) and checked: the first
+bytes must be a known image signature and the total may not exceed
+``PRODUCT_IMAGE_MAX_UPLOAD_SIZE``. A rejected file stops being written but
+is still returned, with ``error`` set, so the view can report it.
+
+Because the staging file already lives on the media filesystem, storing an
+accepted upload is a rename rather than a copy.
+"""
+
+import hashlib
+import os
+import tempfile
+
+from django.conf import settings
+from django.core.files.uploadedfile import UploadedFile
+from django.core.files.uploadhandler import FileUploadHandler
+
+STAGING_DIR = ".uploads"
+
+# (offset, signature) pairs that identify the accepted image formats
+IMAGE_SIGNATURES = [
+    (0, b"\xff\xd8\xff"),  # JPEG
+    (0, b"\x89PNG\r\n\x1a\n"),
+    (0, b"GIF87a"),
+    (0, b"GIF89a"),
+    (8, b"WEBP"),
+    (4, b"ftypavif"),
+    (4, b"ftypavis"),
+]
+
+
+def is_image_signature(head):
+    return any(
+        head[offset : offset + len(signature)] == signature
+        for offset, signature in IMAGE_SIGNATURES
+    )
+
+
+class HashedUploadedFile(UploadedFile):
+    """An upload staged under ``MEDIA_ROOT`` with its content hash."""
+
+    def __init__(self, name, content_type, charset, content_type_extra=None):
+        staging_dir = os.path.join(settings.MEDIA_ROOT, STAGING_DIR)
+        os.makedirs(staging_dir, exist_ok=True)
+        file = tempfile.NamedTemporaryFile(suffix=".upload", dir=staging_dir)
+        super().__init__(file, name, content_type, 0, charset, content_type_extra)
+        self.hasher = hashlib.sha256()
+        self.content_hash = None
+        self.error = None
+
+    def temporary_file_path(self):
+        # Lets FileSystemStorage move the file into place instead of copying
+        return self.file.name
+
+    def close(self):
+        try:
+            return self.file.close()
+        except FileNotFoundError:
+            # Already moved into storage
+            pass
+
+
+class ImageUploadHandler(FileUploadHandler):
+    def new_file(self, *args, **kwargs):
+        super().new_file(*args, **kwargs)
+        self.file = HashedUploadedFile(
+            self.file_name, self.content_type, self.charset, self.content_type_extra
+        )
+        self.head = b""
+
+    def receive_data_chunk(self, raw_data, start):
+        file = self.file
+        if file.error:
+            return None
+        if len(self.head) < 16:
+            self.head += raw_data[:16]
+            if len(self.head) >= 16 and not is_image_signature(self.head):
+                file.error = "Not a JPEG, PNG, GIF, WebP or AVIF image."
+                return None
+        if file.size + len(raw_data) > settings.PRODUCT_IMAGE_MAX_UPLOAD_SIZE:
+            file.error = "Image is too large."
+            return None
+        file.hasher.update(raw_data)
+        file.write(raw_data)
+        file.size += len(raw_data)
+        return None
+
+    def file_complete(self, file_size):
+        file = self.file
+        if not file.error and not is_image_signature(self.head):
+            # Shorter than the 16 bytes the signature check waits for
+            file.error = "Not a JPEG, PNG, GIF, WebP or AVIF image."
+        file.content_hash = file.hasher.hexdigest()
+        file.seek(0)
+        return file
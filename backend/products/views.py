@@ -1,12 +1,24 @@
 # products/views.py
-from rest_framework import viewsets, filters, permissions
+from django.core.files.storage import default_storage
+from django.db import transaction
+from rest_framework import viewsets, permissions
 from rest_framework.decorators import action
 from rest_framework.response import Response
 from django_filters.rest_framework import DjangoFilterBackend
+from auraya_backend.replicas import ReplicaReadsMixin
+from auraya_backend.pagination import (
+    AsyncPageNumberPagination,
+    PageNumberOrKeysetPagination,
+)
+from .cache import CachedListMixin, ConditionalGetMixin, bump_generation_on_commit
+from .images import schedule_variants
 from .models import Category, Product, ProductImage
+from .search import ProductOrderingFilter, ProductSearchFilter
+from .uploads import ImageUploadHandler
 from .serializers import (
     CategorySerializer,
     ProductSerializer,
+    ProductListSerializer,
     ProductCreateUpdateSerializer,
     ProductImageSerializer,
 )
@@ -23,32 +35,78 @@ class IsAdminOrReadOnly(permissions.BasePermission):
         return request.user and request.user.is_staff
 
 
-class CategoryViewSet(viewsets.ModelViewSet):
+class CategoryViewSet(
+    ReplicaReadsMixin, ConditionalGetMixin, CachedListMixin, viewsets.ModelViewSet
+):
     queryset = Category.objects.all()
     serializer_class = CategorySerializer
     permission_classes = [IsAdminOrReadOnly]
+    pagination_class = AsyncPageNumberPagination
     lookup_field = "slug"
+    cache_models = ["category"]
+    cache_key_params = ["page"]
+    replica_pin_scopes = ["catalog"]
 
 
-class ProductViewSet(viewsets.ModelViewSet):
+class ProductViewSet(
+    ReplicaReadsMixin, ConditionalGetMixin, CachedListMixin, viewsets.ModelViewSet
+):
     queryset = Product.objects.filter(is_active=True)
     permission_classes = [IsAdminOrReadOnly]
+    pagination_class = PageNumberOrKeysetPagination
     filter_backends = [
         DjangoFilterBackend,
-        filters.SearchFilter,
-        filters.OrderingFilter,
+        ProductSearchFilter,
+        ProductOrderingFilter,
     ]
     filterset_fields = ["category", "is_active"]
     search_fields = ["name", "description"]
     ordering_fields = ["price", "created_at", "name"]
     ordering = ["-created_at"]
     lookup_field = "slug"
+    cache_models = ["product", "category", "productimage"]
+    cache_key_params = [
+        "category",
+        "category_slug",
+        "is_active",
+        "min_price",
+        "max_price",
+        "search",
+        "ordering",
+        "page",
+        "cursor",
+        "fields",
+    ]
+    replica_pin_scopes = ["catalog"]
 
     def get_serializer_class(self):
         if self.action in ["create", "update", "partial_update"]:
             return ProductCreateUpdateSerializer
+        # The storefront grid gets cards; staff keep the full rows for admin
+        if (
+            self.action == "list"
+            and not self.get_sparse_fields()
+            and not (self.request.user and self.request.user.is_staff)
+        ):
+            return ProductListSerializer
         return ProductSerializer
 
+    def get_sparse_fields(self):
+        """Valid field names from ``?fields=``, or None to render them all."""
+        if self.action not in ["list", "retrieve"]:
+            return None
+        requested = self.request.query_params.get("fields", "").split(",")
+        fields = [name.strip() for name in requested]
+        return [
+            name for name in fields if name in ProductSerializer.Meta.fields
+        ] or None
+
+    def get_serializer(self, *args, **kwargs):
+        fields = self.get_sparse_fields()
+        if fields:
+            kwargs.setdefault("fields", fields)
+        return super().get_serializer(*args, **kwargs)
+
     def get_queryset(self):
         queryset = Product.objects.all()
         if not (self.request.user and self.request.user.is_staff):
@@ -67,18 +125,87 @@ class ProductViewSet(viewsets.ModelViewSet):
         if max_price:
             queryset = queryset.filter(price__lte=max_price)
 
+        # Load only what the serializer renders, in a fixed number of queries
+        serializer_class = self.get_serializer_class()
+        if hasattr(serializer_class, "setup_eager_loading"):
+            fields = self.get_sparse_fields() or serializer_class.Meta.fields
+            # Keyset cursors read the ordering column off the last row
+            queryset = serializer_class.setup_eager_loading(
+                queryset, [*fields, *self.ordering_fields]
+            )
+
         return queryset
 
+    def initialize_request(self, request, *args, **kwargs):
+        drf_request = super().initialize_request(request, *args, **kwargs)
+        if self.action == "upload_image":
+            # Stream, hash and check images instead of buffering them
+            request.upload_handlers = [ImageUploadHandler(request)]
+        return drf_request
+
     @action(detail=True, methods=["post"], permission_classes=[permissions.IsAdminUser])
     def upload_image(self, request, slug=None):
+        """
+        Add one or more ``image`` files to the product's gallery.
+
+        Files whose content is already stored, for any product, reuse that
+        file and its variants. Responds with the new image, or a list of them
+        when several were sent.
+        """
         product = self.get_object()
-        image = request.FILES.get("image")
+        files = request.FILES.getlist("image")
         alt_text = request.data.get("alt_text", "")
 
-        if image:
-            product_image = ProductImage.objects.create(
-                product=product, image=image, alt_text=alt_text
+        if not files:
+            return Response({"error": "No image provided"}, status=400)
+        errors = {file.name: file.error for file in files if file.error}
+        if errors:
+            return Response({"error": errors}, status=400)
+
+        stored_names = []
+        try:
+            with transaction.atomic():
+                # One query for every image already stored with the same content
+                existing = {}
+                for image in ProductImage.objects.filter(
+                    content_hash__in={file.content_hash for file in files}
+                ).order_by("pk"):
+                    existing.setdefault(image.content_hash, image)
+
+                product_images, new_images = [], []
+                for file in files:
+                    product_image = ProductImage(
+                        product=product,
+                        alt_text=alt_text,
+                        content_hash=file.content_hash,
+                    )
+                    stored = existing.get(file.content_hash)
+                    if stored:
+                        product_image.image = stored.image.name
+                        product_image.image_variants = stored.image_variants
+                    else:
+                        # Moves the staged file into place
+                        product_image.image.save(file.name, file, save=False)
+                        stored_names.append(product_image.image.name)
+                        existing[file.content_hash] = product_image
+                        new_images.append(product_image)
+                    product_images.append(product_image)
+                ProductImage.objects.bulk_create(product_images)
+
+                # bulk_create sends no signals
+                bump_generation_on_commit("productimage")
+                for product_image in new_images:
+                    schedule_variants(product_image)
+        except Exception:
+            for name in stored_names:
+                default_storage.delete(name)
+            raise
+
+        context = self.get_serializer_context()
+        if len(product_images) == 1:
+            return Response(
+                ProductImageSerializer(product_images[0], context=context).data
             )
-            serializer = ProductImageSerializer(product_image)
-            return Response(serializer.data)
-        return Response({"error": "No image provided"}, status=400)
+        return Response(
+            ProductImageSerializer(product_images, many=True, context=context).data
+        )
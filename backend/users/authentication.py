@@ -0,0 +1,137 @@
+"""
+JWT authentication that does not load the user on every request.
+
+Tokens carry the claims most requests need (``user_id``, ``username``,
+``is_staff``) and, with ``CHECK_REVOKE_TOKEN``, a hash of the password.
+``StatelessJWTAuthentication`` builds the user from those claims instead of
+selecting the row: fields outside the claims are deferred and load on first
+access, so only views that need the full model query for it.
+
+What a token cannot tell is whether the user was deactivated, changed their
+password or lost staff rights since it was issued. Each process keeps the
+answer per user in ``user_statuses`` for ``AUTH_USER_STATUS_TTL`` seconds;
+saving or deleting a user drops their entry at once in the process that
+did it, and the others within the TTL.
+"""
+
+import threading
+import time
+from collections import namedtuple
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.db import DEFAULT_DB_ALIAS
+from django.utils.translation import gettext_lazy as _
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import AuthenticationFailed
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.tokens import RefreshToken
+from rest_framework_simplejwt.utils import get_md5_hash_password
+
+USER_CLAIMS = ('username', 'is_staff')
+
+UserStatus = namedtuple('UserStatus', ['is_active', 'is_staff', 'password_hash'])
+
+
+class UserClaimsRefreshToken(RefreshToken):
+    """Refresh token whose access tokens carry ``USER_CLAIMS``."""
+
+    @classmethod
+    def for_user(cls, user):
+        token = super().for_user(user)
+        for claim in USER_CLAIMS:
+            token[claim] = getattr(user, claim)
+        return token
+
+
+class UserStatusCache:
+    """Per-process ``user id -> UserStatus`` (``None`` if gone), kept briefly."""
+
+    max_entries = 10000
+
+    def __init__(self):
+        self.entries = {}
+        self.lock = threading.Lock()
+
+    def get(self, user_id, refresh=False):
+        # Tokens carry the id as a string
+        user_id = str(user_id)
+        entry = self.entries.get(user_id)
+        if (
+            not refresh
+            and entry is not None
+            and time.monotonic() - entry[0] < settings.AUTH_USER_STATUS_TTL
+        ):
+            return entry[1]
+        row = (
+            get_user_model().objects.filter(pk=user_id)
+            .values_list('is_active', 'is_staff', 'password')
+            .first()
+        )
+        status = None
+        if row is not None:
+            status = UserStatus(row[0], row[1], get_md5_hash_password(row[2]))
+        with self.lock:
+            if len(self.entries) >= self.max_entries:
+                self.entries.clear()
+            self.entries[user_id] = (time.monotonic(), status)
+        return status
+
+    def invalidate(self, user_id):
+        with self.lock:
+            self.entries.pop(str(user_id), None)
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+
+
+user_statuses = UserStatusCache()
+
+
+class StatelessJWTAuthentication(JWTAuthentication):
+    def get_user(self, validated_token):
+        if not all(claim in validated_token for claim in USER_CLAIMS):
+            # Issued before tokens carried the claims
+            return super().get_user(validated_token)
+        user_id = validated_token[api_settings.USER_ID_CLAIM]
+        status = user_statuses.get(user_id)
+        if self.check_status(validated_token, status) is not None:
+            # The token may be newer than what this process last read, as
+            # after signing in again with a new password
+            status = user_statuses.get(user_id, refresh=True)
+        error = self.check_status(validated_token, status)
+        if error is not None:
+            raise error
+        return self.get_claims_user(validated_token, status)
+
+    def check_status(self, validated_token, status):
+        if status is None:
+            return AuthenticationFailed(_('User not found'), code='user_not_found')
+        if api_settings.CHECK_USER_IS_ACTIVE and not status.is_active:
+            return AuthenticationFailed(_('User is inactive'), code='user_inactive')
+        if (
+            api_settings.CHECK_REVOKE_TOKEN
+            and validated_token.get(api_settings.REVOKE_TOKEN_CLAIM) != status.password_hash
+        ):
+            return AuthenticationFailed(
+                _("The user's password has been changed."), code='password_changed'
+            )
+        if validated_token['is_staff'] != status.is_staff:
+            return AuthenticationFailed(
+                _("The user's permissions have changed."), code='permissions_changed'
+            )
+        return None
+
+    def get_claims_user(self, validated_token, status):
+        # The other fields are deferred, as with .only()
+        return self.user_model.from_db(
+            DEFAULT_DB_ALIAS,
+            [api_settings.USER_ID_FIELD, 'username', 'is_staff', 'is_active'],
+            [
+                int(validated_token[api_settings.USER_ID_CLAIM]),
+                validated_token['username'],
+                status.is_staff,
+                status.is_active,
+            ],
+        )
@@ -0,0 +1,61 @@
+"""
+Cached ``/api/auth/me/`` documents.
+
+Each user's document is cached under a per-user generation counter, the
+way catalog pages are (``products.cache``). Saving or deleting the
+``User``, their ``UserProfile`` or one of their ``Address`` rows bumps the
+counter once the transaction commits (see ``signals.py``). A request that
+read the old rows can only store them under the old generation, which is
+never read again.
+
+Writes that bypass signals (queryset ``update()``, ``bulk_create``) must
+call ``invalidate_current_user`` themselves.
+"""
+
+import time
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.db import transaction
+
+from .serializers import UserSerializer
+
+GENERATION_KEY = 'users:me:generation:{}'
+DOCUMENT_KEY = 'users:me:{}:{}'
+
+
+def get_generation(user_id):
+    key = GENERATION_KEY.format(user_id)
+    generation = cache.get(key)
+    if generation is None:
+        # Start from the clock so an evicted counter never repeats a value
+        cache.add(key, time.time_ns(), settings.CURRENT_USER_CACHE_TIMEOUT)
+        generation = cache.get(key)
+    return generation
+
+
+def bump_generation(user_id):
+    key = GENERATION_KEY.format(user_id)
+    try:
+        cache.incr(key)
+    except ValueError:
+        cache.add(key, time.time_ns(), settings.CURRENT_USER_CACHE_TIMEOUT)
+
+
+def invalidate_current_user(user_id):
+    transaction.on_commit(lambda: bump_generation(user_id))
+
+
+def get_current_user_data(user_id):
+    key = DOCUMENT_KEY.format(user_id, get_generation(user_id))
+    data = cache.get(key)
+    if data is None:
+        user = (
+            User.objects.select_related('profile')
+            .prefetch_related('addresses')
+            .get(pk=user_id)
+        )
+        data = UserSerializer(user).data
+        cache.set(key, data, settings.CURRENT_USER_CACHE_TIMEOUT)
+    return data
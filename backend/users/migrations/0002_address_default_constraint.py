@@ -0,0 +1,47 @@
+# Generated by Django 5.0.14 on 2026-10-18 02:30
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+def keep_newest_default(apps, schema_editor):
+    # Concurrent saves may have left several defaults; the newest one wins
+    Address = apps.get_model("users", "Address")
+    seen = set()
+    stale = []
+    for pk, user_id in (
+        Address.objects.filter(is_default=True)
+        .order_by("user_id", "-created_at", "-pk")
+        .values_list("pk", "user_id")
+    ):
+        if user_id in seen:
+            stale.append(pk)
+        seen.add(user_id)
+    Address.objects.filter(pk__in=stale).update(is_default=False)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("users", "0001_initial"),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.RunPython(keep_newest_default, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name="address",
+            index=models.Index(
+                fields=["user", "-is_default", "-created_at"],
+                name="address_user_list_idx",
+            ),
+        ),
+        migrations.AddConstraint(
+            model_name="address",
+            constraint=models.UniqueConstraint(
+                condition=models.Q(("is_default", True)),
+                fields=("user",),
+                name="address_one_default_per_user",
+            ),
+        ),
+    ]
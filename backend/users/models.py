@@ -1,5 +1,6 @@
-from django.db import models
+from django.db import IntegrityError, models, transaction
 from django.contrib.auth.models import User
+from django.utils import timezone
 
 
 class UserProfile(models.Model):
@@ -63,12 +64,71 @@ class Address(models.Model):
     class Meta:
         verbose_name_plural = 'Addresses'
         ordering = ['-is_default', '-created_at']
+        constraints = [
+            models.UniqueConstraint(
+                fields=['user'],
+                condition=models.Q(is_default=True),
+                name='address_one_default_per_user',
+            ),
+        ]
+        indexes = [
+            # A user's addresses in list order, read straight off the index
+            models.Index(
+                fields=['user', '-is_default', '-created_at'],
+                name='address_user_list_idx',
+            ),
+        ]
 
     def __str__(self):
         return f"{self.user.username} - {self.label}"
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # What is_default was when loaded, so save() knows if it flipped
+        instance._loaded_is_default = instance.__dict__.get('is_default')
+        return instance
+
     def save(self, *args, **kwargs):
-        # If this address is set as default, unset other default addresses
-        if self.is_default:
-            Address.objects.filter(user=self.user, is_default=True).exclude(pk=self.pk).update(is_default=False)
-        super().save(*args, **kwargs)
+        if self.is_default and not getattr(self, '_loaded_is_default', False):
+            # Becoming the default: unset the old one first, as the unique
+            # constraint allows only one at any moment
+            with transaction.atomic():
+                unset_default_address(self.user_id, exclude=self.pk)
+                super().save(*args, **kwargs)
+        else:
+            super().save(*args, **kwargs)
+        self._loaded_is_default = self.is_default
+
+
+def unset_default_address(user_id, exclude=None):
+    defaults = Address.objects.filter(user_id=user_id, is_default=True)
+    if exclude is not None:
+        defaults = defaults.exclude(pk=exclude)
+    return defaults.update(is_default=False, updated_at=timezone.now())
+
+
+def set_default_address(user_id, address_id):
+    """
+    Make ``address_id`` the user's only default address, without loading it.
+    Returns False when the user has no such address.
+
+    One ``UPDATE ... SET is_default = CASE WHEN id = %s ...`` cannot do it:
+    SQLite and PostgreSQL check the one-default unique index row by row, so
+    it fails whenever the new default is updated before the old one. The old
+    default is unset first instead, in the same transaction.
+    """
+    for attempt in range(2):
+        try:
+            with transaction.atomic():
+                unset_default_address(user_id, exclude=address_id)
+                updated = Address.objects.filter(pk=address_id, user_id=user_id).update(
+                    is_default=True, updated_at=timezone.now()
+                )
+                if not updated:
+                    transaction.set_rollback(True)
+                return bool(updated)
+        except IntegrityError:
+            # A concurrent switch committed a new default in between
+            if attempt:
+                raise
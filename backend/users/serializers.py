@@ -1,6 +1,78 @@
+from django.db import transaction
+from django.utils import timezone
 from rest_framework import serializers
+from rest_framework_simplejwt.serializers import TokenObtainPairSerializer as BaseTokenObtainPairSerializer
 from django.contrib.auth.models import User
-from .models import UserProfile, Address
+from .authentication import UserClaimsRefreshToken
+from .models import UserProfile, Address, unset_default_address
+
+# Most addresses one bulk request may write
+BULK_MAX_LENGTH = 100
+
+
+class AddressListSerializer(serializers.ListSerializer):
+    """
+    Saves a batch of addresses with one INSERT or one UPDATE.
+
+    To update, pass the user's addresses keyed by id as ``instance``; each
+    item names the address it changes by ``id``. A batch may make at most
+    one address the default, and the old default is unset once for all.
+    """
+
+    def run_child_validation(self, data):
+        if self.instance is None:
+            return super().run_child_validation(data)
+        try:
+            self.child.instance = self.instance[int(data['id'])]
+        except (KeyError, TypeError, ValueError):
+            raise serializers.ValidationError({'id': ['No such address.']})
+        validated = super().run_child_validation(data)
+        validated['id'] = self.child.instance.pk
+        return validated
+
+    def validate(self, attrs):
+        if self.instance is not None:
+            ids = [item['id'] for item in attrs]
+            if len(set(ids)) != len(ids):
+                raise serializers.ValidationError('Each address can only be updated once per batch.')
+        if sum(bool(item.get('is_default')) for item in attrs) > 1:
+            raise serializers.ValidationError('Only one address in a batch can be the default.')
+        return attrs
+
+    def create(self, validated_data):
+        addresses = [Address(**attrs) for attrs in validated_data]
+        default = next((address for address in addresses if address.is_default), None)
+        with transaction.atomic():
+            if default is not None:
+                unset_default_address(default.user_id)
+            Address.objects.bulk_create(addresses)
+        return addresses
+
+    def update(self, instance, validated_data):
+        now = timezone.now()
+        addresses, fields = [], {'updated_at'}
+        for attrs in validated_data:
+            address = instance[attrs.pop('id')]
+            for name, value in attrs.items():
+                setattr(address, name, value)
+            fields.update(attrs)
+            address.updated_at = now
+            addresses.append(address)
+
+        default = next(
+            (a for a in addresses if a.is_default and not a._loaded_is_default), None
+        )
+        with transaction.atomic():
+            if default is not None:
+                unset_default_address(default.user_id, exclude=default.pk)
+                # The batch's own rows are written as unset too
+                for address in addresses:
+                    address.is_default = address is default
+                fields.add('is_default')
+            Address.objects.bulk_update(addresses, sorted(fields))
+        for address in addresses:
+            address._loaded_is_default = address.is_default
+        return addresses
 
 
 class AddressSerializer(serializers.ModelSerializer):
@@ -14,6 +86,13 @@ class AddressSerializer(serializers.ModelSerializer):
             'phone', 'is_default', 'created_at', 'updated_at'
         ]
         read_only_fields = ['created_at', 'updated_at']
+        list_serializer_class = AddressListSerializer
+
+
+class AddressIdsSerializer(serializers.Serializer):
+    ids = serializers.ListField(
+        child=serializers.IntegerField(), allow_empty=False, max_length=BULK_MAX_LENGTH
+    )
 
 
 class UserProfileSerializer(serializers.ModelSerializer):
@@ -65,3 +144,7 @@ class RegisterSerializer(serializers.ModelSerializer):
             password=validated_data["password"],
         )
         return user
+
+
+class TokenObtainPairSerializer(BaseTokenObtainPairSerializer):
+    token_class = UserClaimsRefreshToken
@@ -0,0 +1,19 @@
+from django.contrib.auth.models import User
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from .authentication import user_statuses
+from .cache import invalidate_current_user
+from .models import Address, UserProfile
+
+
+@receiver([post_save, post_delete], sender=User)
+def invalidate_user_status(sender, instance, **kwargs):
+    user_statuses.invalidate(instance.pk)
+
+
+@receiver([post_save, post_delete], sender=User)
+@receiver([post_save, post_delete], sender=UserProfile)
+@receiver([post_save, post_delete], sender=Address)
+def invalidate_current_user_cache(sender, instance, **kwargs):
+    invalidate_current_user(instance.pk if sender is User else instance.user_id)
@@ -1,3 +1,346 @@
-from django.test import TestCase
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.db import IntegrityError, connection, transaction
+from django.test import override_settings
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APITestCase
+from rest_framework_simplejwt.tokens import RefreshToken
 
-# Create your tests here.
+from .authentication import UserClaimsRefreshToken
+from .models import Address, UserProfile
+
+
+def address_data(**overrides):
+    return {
+        'label': 'Home',
+        'full_name': 'Jane Doe',
+        'address_line1': '1 Main St',
+        'city': 'Springfield',
+        'state': 'IL',
+        'zip_code': '62701',
+        'country': 'US',
+        **overrides,
+    }
+
+
+class RegisterTests(APITestCase):
+    def test_register_and_login(self):
+        response = self.client.post('/api/auth/register/', {
+            'username': 'jane',
+            'email': 'jane@example.com',
+            'password': 'correct-horse',
+        })
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.data['user']['username'], 'jane')
+        self.assertNotIn('password', response.data['user'])
+
+        response = self.client.post('/api/auth/login/', {
+            'username': 'jane',
+            'password': 'correct-horse',
+        })
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('access', response.data)
+
+    def test_short_password_is_rejected(self):
+        response = self.client.post('/api/auth/register/', {
+            'username': 'jane',
+            'email': 'jane@example.com',
+            'password': 'short',
+        })
+        self.assertEqual(response.status_code, 400)
+        self.assertFalse(User.objects.exists())
+
+
+class CurrentUserTests(APITestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user('jane', email='jane@example.com')
+        UserProfile.objects.create(user=self.user, phone='555-0100')
+        Address.objects.create(user=self.user, **address_data())
+
+    def test_requires_authentication(self):
+        self.assertEqual(self.client.get('/api/auth/me/').status_code, 401)
+
+    def test_me(self):
+        self.client.force_authenticate(self.user)
+        response = self.client.get('/api/auth/me/')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['email'], 'jane@example.com')
+        self.assertEqual(response.data['profile']['phone'], '555-0100')
+        self.assertEqual(len(response.data['addresses']), 1)
+
+    def test_me_is_served_from_the_cache(self):
+        self.client.force_authenticate(self.user)
+        with self.assertNumQueries(2):
+            self.client.get('/api/auth/me/')
+        with self.assertNumQueries(0):
+            response = self.client.get('/api/auth/me/')
+        self.assertEqual(response.data['profile']['phone'], '555-0100')
+
+    def test_saves_invalidate_me(self):
+        self.client.force_authenticate(self.user)
+        self.client.get('/api/auth/me/')
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.patch('/api/profile/', {'phone': '555-0199', 'first_name': 'Janet'})
+        response = self.client.get('/api/auth/me/')
+        self.assertEqual(response.data['first_name'], 'Janet')
+        self.assertEqual(response.data['profile']['phone'], '555-0199')
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post('/api/addresses/', address_data(label='Work'))
+        response = self.client.get('/api/auth/me/')
+        self.assertEqual(len(response.data['addresses']), 2)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            Address.objects.get(label='Work').delete()
+            self.user.email = 'janet@example.com'
+            self.user.save()
+        response = self.client.get('/api/auth/me/')
+        self.assertEqual(response.data['email'], 'janet@example.com')
+        self.assertEqual(len(response.data['addresses']), 1)
+
+    def test_profile_update(self):
+        self.client.force_authenticate(self.user)
+        response = self.client.patch('/api/profile/', {'phone': '555-0199', 'first_name': 'Janet'})
+        self.assertEqual(response.status_code, 200)
+        self.user.refresh_from_db()
+        self.assertEqual(self.user.first_name, 'Janet')
+        self.assertEqual(self.user.profile.phone, '555-0199')
+
+
+class AddressTests(APITestCase):
+    def setUp(self):
+        self.user = User.objects.create_user('jane')
+        self.client.force_authenticate(self.user)
+
+    def test_addresses_are_private(self):
+        other = User.objects.create_user('other')
+        theirs = Address.objects.create(user=other, **address_data())
+        response = self.client.get('/api/addresses/')
+        self.assertEqual(response.data['count'], 0)
+        self.assertEqual(self.client.get(f'/api/addresses/{theirs.pk}/').status_code, 404)
+
+    def test_create_assigns_user(self):
+        response = self.client.post('/api/addresses/', address_data())
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(Address.objects.get().user, self.user)
+
+    def test_only_one_default(self):
+        home = Address.objects.create(user=self.user, is_default=True, **address_data())
+        work = Address.objects.create(user=self.user, **address_data(label='Work'))
+        response = self.client.post(f'/api/addresses/{work.pk}/set_default/')
+        self.assertEqual(response.status_code, 200)
+        home.refresh_from_db()
+        work.refresh_from_db()
+        self.assertFalse(home.is_default)
+        self.assertTrue(work.is_default)
+
+        response = self.client.get('/api/addresses/')
+        self.assertEqual([a['label'] for a in response.data['results']], ['Work', 'Home'])
+
+    def test_set_default_without_loading(self):
+        older = Address.objects.create(user=self.user, **address_data(label='Older'))
+        Address.objects.create(user=self.user, is_default=True, **address_data())
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.post(f'/api/addresses/{older.pk}/set_default/')
+        self.assertEqual(response.status_code, 200)
+        statements = [q['sql'].split()[0] for q in queries]
+        self.assertEqual([s for s in statements if s in ('SELECT', 'UPDATE')], ['UPDATE', 'UPDATE'])
+        self.assertEqual(
+            list(Address.objects.filter(is_default=True).values_list('label', flat=True)),
+            ['Older'],
+        )
+
+    def test_set_default_of_another_user_is_404(self):
+        home = Address.objects.create(user=self.user, is_default=True, **address_data())
+        other = User.objects.create_user('other')
+        theirs = Address.objects.create(user=other, is_default=True, **address_data())
+        self.assertEqual(self.client.post(f'/api/addresses/{theirs.pk}/set_default/').status_code, 404)
+        self.assertEqual(self.client.post('/api/addresses/x/set_default/').status_code, 404)
+        home.refresh_from_db()
+        theirs.refresh_from_db()
+        self.assertTrue(home.is_default)
+        self.assertTrue(theirs.is_default)
+
+    def test_one_default_per_user_is_enforced(self):
+        Address.objects.create(user=self.user, is_default=True, **address_data())
+        work = Address.objects.create(user=self.user, **address_data(label='Work'))
+        with self.assertRaises(IntegrityError), transaction.atomic():
+            Address.objects.filter(pk=work.pk).update(is_default=True)
+
+    def test_saving_the_default_does_not_touch_others(self):
+        home = Address.objects.create(user=self.user, is_default=True, **address_data())
+        home = Address.objects.get(pk=home.pk)
+        home.city = 'Shelbyville'
+        with CaptureQueriesContext(connection) as queries:
+            home.save()
+        self.assertEqual(len([q for q in queries if q['sql'].startswith('UPDATE')]), 1)
+
+    def test_list_reads_the_ordering_index(self):
+        plan = Address.objects.filter(user=self.user).explain()
+        self.assertIn('address_user_list_idx', plan)
+        self.assertNotIn('TEMP B-TREE', plan)
+
+    def test_bulk_create(self):
+        Address.objects.create(user=self.user, is_default=True, **address_data())
+        data = [address_data(label=f'Shop {i}', is_default=i == 1) for i in range(3)]
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.post('/api/addresses/bulk/', data, format='json')
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual([a['label'] for a in response.data], ['Shop 0', 'Shop 1', 'Shop 2'])
+        self.assertTrue(all(a['id'] for a in response.data))
+        statements = [q['sql'].split()[0] for q in queries]
+        self.assertEqual([s for s in statements if s in ('INSERT', 'UPDATE')], ['UPDATE', 'INSERT'])
+        self.assertEqual(
+            list(Address.objects.filter(is_default=True).values_list('label', flat=True)),
+            ['Shop 1'],
+        )
+
+    def test_bulk_create_is_all_or_nothing(self):
+        data = [address_data(), address_data(city='')]
+        response = self.client.post('/api/addresses/bulk/', data, format='json')
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.data[0], {})
+        self.assertIn('city', response.data[1])
+
+        data = [address_data(is_default=True), address_data(is_default=True)]
+        response = self.client.post('/api/addresses/bulk/', data, format='json')
+        self.assertEqual(response.status_code, 400)
+        self.assertFalse(Address.objects.exists())
+
+    def test_bulk_update(self):
+        home = Address.objects.create(user=self.user, is_default=True, **address_data())
+        work = Address.objects.create(user=self.user, **address_data(label='Work'))
+        data = [{'id': home.pk, 'city': 'Shelbyville'}, {'id': work.pk, 'is_default': True}]
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.patch('/api/addresses/bulk/', data, format='json')
+        self.assertEqual(response.status_code, 200)
+        statements = [q['sql'].split()[0] for q in queries]
+        self.assertEqual([s for s in statements if s in ('SELECT', 'UPDATE')], ['SELECT', 'UPDATE', 'UPDATE'])
+        home.refresh_from_db()
+        work.refresh_from_db()
+        self.assertEqual((home.city, home.is_default), ('Shelbyville', False))
+        self.assertTrue(work.is_default)
+
+    def test_bulk_update_only_touches_own_addresses(self):
+        home = Address.objects.create(user=self.user, **address_data())
+        theirs = Address.objects.create(user=User.objects.create_user('other'), **address_data())
+        data = [{'id': home.pk, 'city': 'Shelbyville'}, {'id': theirs.pk, 'city': 'Shelbyville'}]
+        response = self.client.patch('/api/addresses/bulk/', data, format='json')
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('id', response.data[1])
+        self.assertFalse(Address.objects.filter(city='Shelbyville').exists())
+
+        data = [{'id': home.pk, 'city': 'Shelbyville'}, {'id': home.pk, 'city': 'Ogdenville'}]
+        response = self.client.patch('/api/addresses/bulk/', data, format='json')
+        self.assertEqual(response.status_code, 400)
+
+    def test_bulk_delete(self):
+        home = Address.objects.create(user=self.user, **address_data())
+        work = Address.objects.create(user=self.user, **address_data(label='Work'))
+        theirs = Address.objects.create(user=User.objects.create_user('other'), **address_data())
+        data = {'ids': [home.pk, work.pk, theirs.pk]}
+        response = self.client.delete('/api/addresses/bulk/', data, format='json')
+        self.assertEqual(response.status_code, 204)
+        self.assertEqual(list(Address.objects.all()), [theirs])
+
+    def test_bulk_writes_invalidate_me(self):
+        cache.clear()
+        self.client.get('/api/auth/me/')
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post('/api/addresses/bulk/', [address_data(), address_data()], format='json')
+        self.assertEqual(len(self.client.get('/api/auth/me/').data['addresses']), 2)
+
+        ids = list(Address.objects.values_list('pk', flat=True))
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.patch('/api/addresses/bulk/', [{'id': ids[0], 'label': 'Work'}], format='json')
+        labels = {a['label'] for a in self.client.get('/api/auth/me/').data['addresses']}
+        self.assertEqual(labels, {'Home', 'Work'})
+
+
+class StatelessAuthenticationTests(APITestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user('jane', email='jane@example.com', password='correct-horse')
+        Address.objects.create(user=self.user, **address_data())
+
+    def login(self):
+        response = self.client.post('/api/auth/login/', {
+            'username': 'jane',
+            'password': 'correct-horse',
+        })
+        self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {response.data['access']}")
+
+    def user_queries(self, path):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(path)
+        self.assertEqual(response.status_code, 200)
+        return [q['sql'] for q in queries if '"auth_user"' in q['sql']]
+
+    def test_user_is_built_from_claims(self):
+        self.login()
+        # The first request checks the user's status, later ones trust it
+        self.assertEqual(len(self.user_queries('/api/addresses/')), 1)
+        self.assertEqual(self.user_queries('/api/addresses/'), [])
+        self.assertEqual(self.user_queries('/api/orders/'), [])
+
+    def test_other_fields_load_when_needed(self):
+        self.login()
+        response = self.client.get('/api/auth/me/')
+        self.assertEqual(response.data['email'], 'jane@example.com')
+        response = self.client.patch('/api/profile/', {'first_name': 'Janet'})
+        self.assertEqual(response.status_code, 200)
+        self.user.refresh_from_db()
+        self.assertEqual(self.user.first_name, 'Janet')
+        self.assertEqual(self.user.email, 'jane@example.com')
+
+    def test_deactivated_user_is_rejected(self):
+        self.login()
+        self.client.get('/api/addresses/')
+        self.user.is_active = False
+        self.user.save()
+        self.assertEqual(self.client.get('/api/addresses/').status_code, 401)
+
+    def test_password_change_revokes_tokens(self):
+        self.login()
+        self.user.set_password('new-horse-battery')
+        self.user.save()
+        response = self.client.get('/api/addresses/')
+        self.assertEqual(response.status_code, 401)
+        self.assertEqual(response.data['code'], 'password_changed')
+
+    def test_lost_staff_rights_revoke_tokens(self):
+        staff = User.objects.create_user('staff', is_staff=True)
+        token = UserClaimsRefreshToken.for_user(staff).access_token
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {token}')
+        self.assertEqual(self.client.get('/api/addresses/').status_code, 200)
+        staff.is_staff = False
+        staff.save()
+        self.assertEqual(self.client.get('/api/addresses/').status_code, 401)
+
+    def test_changes_without_signals_apply_after_ttl(self):
+        self.login()
+        self.client.get('/api/addresses/')
+        User.objects.filter(pk=self.user.pk).update(is_active=False)
+        self.assertEqual(self.client.get('/api/addresses/').status_code, 200)
+        with override_settings(AUTH_USER_STATUS_TTL=0):
+            self.assertEqual(self.client.get('/api/addresses/').status_code, 401)
+
+    def test_newer_token_is_checked_again(self):
+        self.login()
+        self.client.get('/api/addresses/')
+        # Changed in another process: this one still has the old status
+        User.objects.filter(pk=self.user.pk).update(password=make_password('new-horse-battery'))
+        response = self.client.post('/api/auth/login/', {
+            'username': 'jane',
+            'password': 'new-horse-battery',
+        })
+        self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {response.data['access']}")
+        self.assertEqual(self.client.get('/api/addresses/').status_code, 200)
+
+    def test_tokens_without_claims_load_the_user(self):
+        token = RefreshToken.for_user(self.user).access_token
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {token}')
+        self.assertEqual(len(self.user_queries('/api/addresses/')), 1)
+        self.assertEqual(len(self.user_queries('/api/addresses/')), 1)
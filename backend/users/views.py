@@ -2,8 +2,14 @@ from rest_framework import generics, permissions, status, viewsets
 from rest_framework.response import Response
 from rest_framework.decorators import action
 from django.contrib.auth.models import User
-from .models import Address, UserProfile
-from .serializers import RegisterSerializer, UserSerializer, AddressSerializer, UserProfileSerializer
+from django.db import transaction
+from django.http import Http404
+from .cache import get_current_user_data, invalidate_current_user
+from .models import Address, UserProfile, set_default_address
+from .serializers import (
+    BULK_MAX_LENGTH, RegisterSerializer, UserSerializer, AddressSerializer, AddressIdsSerializer,
+    UserProfileSerializer,
+)
 
 
 class RegisterView(generics.CreateAPIView):
@@ -28,8 +34,8 @@ class CurrentUserView(generics.RetrieveAPIView):
     permission_classes = [permissions.IsAuthenticated]
     serializer_class = UserSerializer
 
-    def get_object(self):
-        return self.request.user
+    def retrieve(self, request, *args, **kwargs):
+        return Response(get_current_user_data(request.user.pk))
 
 
 class AddressViewSet(viewsets.ModelViewSet):
@@ -39,16 +45,63 @@ class AddressViewSet(viewsets.ModelViewSet):
     def get_queryset(self):
         return Address.objects.filter(user=self.request.user)
 
+    def get_bulk_serializer(self, *args, **kwargs):
+        return self.get_serializer(
+            *args, many=True, allow_empty=False, max_length=BULK_MAX_LENGTH, **kwargs
+        )
+
     def perform_create(self, serializer):
         serializer.save(user=self.request.user)
 
     @action(detail=True, methods=['post'])
     def set_default(self, request, pk=None):
-        address = self.get_object()
-        address.is_default = True
-        address.save()
+        try:
+            address_id = int(pk)
+        except ValueError:
+            raise Http404
+        if not set_default_address(request.user.pk, address_id):
+            raise Http404
+        # A queryset update sends no signals
+        invalidate_current_user(request.user.pk)
         return Response({'status': 'address set as default'})
 
+    @action(detail=False, methods=['post'], url_path='bulk')
+    def bulk_create(self, request):
+        """Create a list of addresses with one INSERT."""
+        serializer = self.get_bulk_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        serializer.save(user=request.user)
+        # bulk_create sends no signals
+        invalidate_current_user(request.user.pk)
+        return Response(serializer.data, status=status.HTTP_201_CREATED)
+
+    @bulk_create.mapping.patch
+    def bulk_update(self, request):
+        """Update a list of addresses, each named by ``id``, with one UPDATE."""
+        ids = []
+        if isinstance(request.data, list):
+            for item in request.data[:BULK_MAX_LENGTH]:
+                try:
+                    ids.append(int(item['id']))
+                except (KeyError, TypeError, ValueError):
+                    pass  # Reported by the serializer
+        addresses = self.get_queryset().in_bulk(ids)
+        serializer = self.get_bulk_serializer(addresses, data=request.data, partial=True)
+        serializer.is_valid(raise_exception=True)
+        serializer.save()
+        # bulk_update sends no signals
+        invalidate_current_user(request.user.pk)
+        return Response(serializer.data)
+
+    @bulk_create.mapping.delete
+    def bulk_destroy(self, request):
+        """Delete the addresses listed in ``ids``; ids of no address of the user are ignored."""
+        serializer = AddressIdsSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        with transaction.atomic():
+            self.get_queryset().filter(pk__in=serializer.validated_data['ids']).delete()
+        return Response(status=status.HTTP_204_NO_CONTENT)
+
 
 class UserProfileView(generics.RetrieveUpdateAPIView):
     serializer_class = UserProfileSerializer
@@ -11,6 +11,7 @@ interface Product {
   slug: string;
   price: number;
   image?: string;
+  image_variants?: Record<string, Record<string, string>>;
   category_name?: string;
 }
 
@@ -30,10 +31,12 @@ export function ProductCard({ product }: { product: Product }) {
     addToast(`${product.name} added to cart!`, 'success');
   };
 
-  const imageUrl = product.image
-    ? product.image.startsWith('http')
-      ? product.image
-      : `http://localhost:8000${product.image}`
+  // Resized card image once the backend has generated it, else the original
+  const cardImage = product.image_variants?.card?.webp || product.image;
+  const imageUrl = cardImage
+    ? cardImage.startsWith('http')
+      ? cardImage
+      : `http://localhost:8000${cardImage}`
     : '/placeholder-product.jpg';
 
   const price = typeof product.price === 'string' ? parseFloat(product.price) : product.price;